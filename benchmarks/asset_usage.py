@@ -0,0 +1,41 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Shows the number of files and inodes and the disk usage of the given
+directories, e.g. the source and output tree of a build.
+
+    python3 benchmarks/asset_usage.py _docs _docs/_build
+"""
+
+import os
+import sys
+
+
+def get_usage(path):
+    files = 0
+    inodes = set()
+    disk = 0
+    for root, dirs, names in os.walk(path):
+        for name in dirs + names:
+            st = os.lstat(os.path.join(root, name))
+            if name in names:
+                files += 1
+            key = (st.st_dev, st.st_ino)
+            if key not in inodes:
+                inodes.add(key)
+                disk += st.st_blocks * 512
+    return files, len(inodes), disk
+
+
+def main(argv):
+    for path in argv[1:]:
+        files, inodes, disk = get_usage(path)
+        print("%s: %d files, %d inodes, %.1f MiB on disk" % (path, files, inodes, disk / 1024**2))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,45 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Helpers shared by the benchmarks"""
+
+import importlib.util
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pgidocgen
+
+
+def load_module(path, name):
+    """Loads pgidocgen/<name>.py from another checkout, for comparing
+    against it. path is either the checkout or the file itself.
+
+    The module becomes part of the current pgidocgen package, so its
+    relative imports use the current modules.
+    """
+
+    if os.path.isdir(path):
+        path = os.path.join(path, "pgidocgen", name + ".py")
+    spec = importlib.util.spec_from_file_location("%s._compare_%s" % (pgidocgen.__name__, name), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench(func, repeat=3):
+    """Returns the best time of calling func() and its last result"""
+
+    best = None
+    for i in range(repeat):
+        t = time.perf_counter()
+        result = func()
+        t = time.perf_counter() - t
+        best = t if best is None else min(best, t)
+    return best, result
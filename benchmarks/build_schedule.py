@@ -0,0 +1,107 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Simulates the wall-clock time of ``build`` for a source dir created by
+``create``, using the rst size of each package as its build time.
+
+    python3 benchmarks/build_schedule.py [--jobs N] [--serial 0.1] _docs
+
+Compares the BuildScheduler against starting every package as soon as
+its dependencies are done with one sphinx process each (the old
+behaviour, 1.5 processes per core sharing the cores), and shows the lower
+bound given by the critical path and the total work. --serial is the
+part of a sphinx build which doesn't get faster with more workers.
+"""
+
+import argparse
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pgidocgen.build import BuildScheduler, Package, get_package_weight
+
+
+def load_packages(source):
+    packages = {}
+    for entry in sorted(os.listdir(source)):
+        path = os.path.join(source, entry)
+        if entry.startswith(("_", ".")) or entry == "cairo-1.0" or not os.path.isdir(path):
+            continue
+        with io.open(os.path.join(path, "conf_data.py"), "r", encoding="utf-8") as h:
+            exec_env = {}
+            exec(h.read(), exec_env)
+        package = Package(entry, exec_env["LIB_VERSION"], path, None, set(exec_env["DEPS"]))
+        packages[entry] = (get_package_weight(package), package.deps & set(os.listdir(source)))
+    return packages
+
+
+def get_duration(weight, workers, serial):
+    return weight * (serial + (1 - serial) / workers)
+
+
+def simulate_scheduler(packages, jobs, serial):
+    scheduler = BuildScheduler(packages, jobs)
+    now = 0.0
+    running = {}
+    while True:
+        for name, workers in scheduler.get_next():
+            running[name] = now + get_duration(packages[name][0], workers, serial)
+        if not running:
+            return now
+        name = min(running, key=lambda n: (running[n], n))
+        now = running.pop(name)
+        scheduler.finish(name)
+
+
+def simulate_old(packages, jobs, serial):
+    # a pool of 1.5 * cores threads, each package a single sphinx process,
+    # all running processes share the cores
+    pool_size = int(jobs * 1.5)
+    remaining = {}
+    finished = set()
+    waiting = list(packages)
+    now = 0.0
+    while True:
+        for name in list(waiting):
+            if len(remaining) < pool_size and packages[name][1] <= finished:
+                waiting.remove(name)
+                remaining[name] = get_duration(packages[name][0], 1, serial)
+        if not remaining:
+            return now
+        rate = min(1.0, jobs / len(remaining))
+        name = min(remaining, key=lambda n: (remaining[n], n))
+        step = remaining[name] / rate
+        now += step
+        for other in remaining:
+            remaining[other] -= step * rate
+        del remaining[name]
+        finished.add(name)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--serial", type=float, default=0.1)
+    parser.add_argument("source")
+    args = parser.parse_args(argv[1:])
+
+    packages = load_packages(args.source)
+    scheduler = BuildScheduler(packages, args.jobs)
+    total = sum(w for w, d in packages.values())
+    bound = max(get_duration(scheduler.get_critical_path(), args.jobs, args.serial), total / args.jobs)
+
+    print("%d packages, %.1f MiB of rst, %d jobs" % (len(packages), total / 1024**2, args.jobs))
+    print("lower bound: %.2f" % (bound / 1024**2))
+    for name, func in [("old", simulate_old), ("scheduler", simulate_scheduler)]:
+        duration = func(packages, args.jobs, args.serial)
+        print("%s: %.2f (%.2fx the lower bound)" % (name, duration / 1024**2, duration / bound))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,79 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Measures the ConvertMarkDown() throughput in lines per second on the
+docstrings of all installed gir files, or the given ones.
+
+    python3 benchmarks/convert_markdown.py [--compare OLD] [Gtk-3.0 | /path/to/Foo-1.0.gir ...]
+
+With --compare the results of the gtkdoc.py of another checkout (or the
+file itself) are checked for equality and its throughput is shown as
+well.
+"""
+
+import argparse
+import os
+import sys
+
+from benchutil import bench, load_module
+
+from pgidocgen import gtkdoc, util
+from pgidocgen.namespace import _parse_docs, _parse_gir
+
+
+def get_docstrings(paths):
+    docstrings = []
+    for path in paths:
+        for result in _parse_docs(_parse_gir(path)).values():
+            for entry in result.values():
+                for text in [entry.docs, entry.deprecated]:
+                    if text:
+                        docstrings.append(text)
+    return docstrings
+
+
+def convert_all(convert, docstrings):
+    return [convert("", d) for d in docstrings]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compare", help="path to another checkout or gtkdoc.py")
+    parser.add_argument("names", nargs="*")
+    args = parser.parse_args(argv[1:])
+
+    gir_files = util.get_gir_files()
+    if args.names:
+        paths = []
+        for name in args.names:
+            path = name if os.path.exists(name) else gir_files.get(name)
+            if path is None:
+                print("%s: gir file not found, skipping" % name)
+                continue
+            paths.append(path)
+    else:
+        paths = sorted(gir_files.values())
+
+    docstrings = get_docstrings(paths)
+    num_lines = sum(d.count("\n") + 1 for d in docstrings)
+    print("%d gir files, %d docstrings, %d lines" % (len(paths), len(docstrings), num_lines))
+
+    new_time, new = bench(lambda: convert_all(gtkdoc.ConvertMarkDown, docstrings))
+    print("current: %.3fs, %.0f lines/s" % (new_time, num_lines / new_time))
+
+    if args.compare:
+        other = load_module(args.compare, "gtkdoc")
+        old_time, old = bench(lambda: convert_all(other.ConvertMarkDown, docstrings))
+        assert old == new, "results differ"
+        print(
+            "%s: %.3fs, %.0f lines/s (current is %.1fx faster)"
+            % (args.compare, old_time, num_lines / old_time, old_time / new_time)
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv)
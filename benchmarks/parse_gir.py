@@ -0,0 +1,67 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Measures the time for parsing the docs of GIR files.
+
+    python3 benchmarks/parse_gir.py [--compare OLD] [Gtk-3.0 GLib-2.0 | /path/to/Foo-1.0.gir ...]
+
+With --compare the results of the namespace.py of another checkout (or
+the file itself), for example the minidom based one from before the
+single pass parsing, are checked for equality and its time is shown as
+well.
+"""
+
+import argparse
+import os
+import sys
+
+from benchutil import bench, load_module
+
+from pgidocgen import namespace, util
+
+
+def get_parse_docs(module):
+    """Returns a function parsing the docs of a gir file with the passed
+    namespace module
+    """
+
+    if hasattr(module, "_parse_gir"):
+        return lambda path: module._parse_docs(module._parse_gir(path))
+    # the minidom based one only has a caching loader, so pass a new cache
+    return lambda path: module._parse_docs(module._get_dom(path, {}))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compare", help="path to another checkout or namespace.py")
+    parser.add_argument("names", nargs="*", default=["Gtk-3.0", "GLib-2.0"])
+    args = parser.parse_args(argv[1:])
+
+    other = load_module(args.compare, "namespace") if args.compare else None
+    gir_files = util.get_gir_files()
+
+    for name in args.names:
+        path = name if os.path.exists(name) else gir_files.get(name)
+        if path is None:
+            print("%s: gir file not found, skipping" % name)
+            continue
+
+        parse_docs = get_parse_docs(namespace)
+        new_time, new = bench(lambda: parse_docs(path))
+        line = "%s: %.3fs" % (os.path.basename(path), new_time)
+
+        if other is not None:
+            parse_docs = get_parse_docs(other)
+            old_time, old = bench(lambda: parse_docs(path))
+            assert old == new, "%s: results differ" % name
+            line += ", %s %.3fs (current is %.1fx faster)" % (args.compare, old_time, old_time / new_time)
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,85 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Measures the memory used by Repository.parse() with tracemalloc: the
+peak while parsing, what stays alive afterwards (including the docstring
+cache) and the part of it allocated in docobj.py.
+
+    python3 benchmarks/parse_memory.py [Gtk-3.0 ...]
+"""
+
+import collections
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pgidocgen import docobj
+from pgidocgen.repo import Repository
+
+
+def count_objects(module):
+    """Returns a Counter of the docobj types in the tree"""
+
+    counts = collections.Counter()
+    seen = set()
+    pending = [module]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, (list, tuple)):
+            pending.extend(obj)
+            continue
+        if type(obj).__module__ != docobj.__name__:
+            continue
+        counts[type(obj).__name__] += 1
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                pending.append(getattr(obj, name, None))
+        pending.extend(getattr(obj, "__dict__", {}).values())
+    return counts
+
+
+def measure(namespace, version):
+    # load the namespaces first, so only the docobj tree gets measured
+    repo = Repository(namespace, version)
+    repo.import_module()
+    gc.collect()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    module = repo.parse()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    docobj_filter = tracemalloc.Filter(True, docobj.__file__)
+    in_docobj = sum(s.size for s in snapshot.filter_traces([docobj_filter]).statistics("filename"))
+    return module, current - base, peak - base, in_docobj
+
+
+def main(argv):
+    names = argv[1:] or ["Gtk-3.0"]
+    for name in names:
+        namespace, version = name.split("-", 1)
+        module, retained, peak, in_docobj = measure(namespace, version)
+        counts = count_objects(module)
+        print(
+            "%s: peak %.1f MiB, retained %.1f MiB (%.1f MiB in docobj), %d docobj instances"
+            % (name, peak / 1024**2, retained / 1024**2, in_docobj / 1024**2, sum(counts.values()))
+        )
+        for type_name, count in counts.most_common(8):
+            print("    %s: %d" % (type_name, count))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,62 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Measures the markdown span parsing for growing docstrings full of
+references, to show it scales linearly.
+
+    python3 benchmarks/span_elements.py [--compare OLD] [max_size]
+
+With --compare the results of the gtkdoc.py of another checkout (or the
+file itself), for example the quadratic one from before, are checked for
+equality and its time is shown as well.
+"""
+
+import argparse
+import sys
+
+from benchutil import bench, load_module
+
+from pgidocgen import gtkdoc
+
+MARKERS = ("\\", "<", "![", "[", "`", "%", "#", "@")
+
+CHUNK = (
+    "Returns %TRUE if @widget is a #GtkWidget, see `gtk_widget_show()` "
+    "and [the docs](https://developer.gnome.org/) or <literal>foo</literal>. "
+)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compare", help="path to another checkout or gtkdoc.py")
+    parser.add_argument("max_size", nargs="?", type=int, default=256 * 1024)
+    args = parser.parse_args(argv[1:])
+
+    other = load_module(args.compare, "gtkdoc") if args.compare else None
+
+    size = 4 * 1024
+    while size <= args.max_size:
+        text = (CHUNK * (size // len(CHUNK) + 1))[:size]
+        new_time, new = bench(lambda: gtkdoc.MarkDownParseSpanElementsInner(text, MARKERS))
+        line = "%4d KiB: %.4fs (%.2f us/char)" % (size // 1024, new_time, new_time * 1e6 / size)
+
+        if other is not None:
+            old_time, old = bench(lambda: other.MarkDownParseSpanElementsInner(text, MARKERS))
+            assert old == new, "results differ"
+            line += ", %s %.4fs (%.2f us/char), %.1fx" % (
+                args.compare,
+                old_time,
+                old_time * 1e6 / size,
+                old_time / new_time,
+            )
+
+        print(line)
+        size *= 2
+
+
+if __name__ == "__main__":
+    main(sys.argv)
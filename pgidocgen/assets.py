@@ -0,0 +1,95 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Content addressed storage for the theme, extension and _static files,
+which are the same for most namespaces.
+"""
+
+import hashlib
+import os
+import shutil
+
+
+def get_file_hash(path):
+    """Returns the sha256 hex digest of the file content"""
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # other file system, or no hardlink support
+        shutil.copy2(src, dst)
+
+
+class AssetStore(object):
+    """A directory containing each file content once, named by its hash.
+
+    Files get added by hardlinking them to the stored copy, so identical
+    files share one inode. Don't modify the added files in place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _get_path(self, digest):
+        return os.path.join(self.path, digest[:2], digest)
+
+    def copy(self, src, dst):
+        """Like shutil.copy2, but dst shares the stored copy"""
+
+        stored = self._get_path(get_file_hash(src))
+        if not os.path.exists(stored):
+            os.makedirs(os.path.dirname(stored), exist_ok=True)
+            temp_path = "%s.%d.tmp" % (stored, os.getpid())
+            shutil.copy2(src, temp_path)
+            os.replace(temp_path, stored)
+        _link_or_copy(stored, dst)
+        return dst
+
+    def copytree(self, src, dst):
+        """Like shutil.copytree, skipping Python caches"""
+
+        shutil.copytree(src, dst, ignore=shutil.ignore_patterns("__pycache__"), copy_function=self.copy)
+
+
+def link_duplicates(paths):
+    """Replaces files with the same relative path and content in the given
+    directories by hardlinks to the first one.
+
+    Returns a list of (path, relpath) for files which differ from the
+    first one with that relative path.
+    """
+
+    first = {}
+    differing = []
+    for base in paths:
+        for root, dirs, files in os.walk(base):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, base)
+                if rel not in first:
+                    first[rel] = (path, get_file_hash(path))
+                    continue
+
+                first_path, digest = first[rel]
+                if os.path.samefile(first_path, path):
+                    continue
+                if get_file_hash(path) != digest:
+                    differing.append((base, rel))
+                    continue
+                temp_path = path + ".tmp"
+                _link_or_copy(first_path, temp_path)
+                os.replace(temp_path, path)
+    return differing
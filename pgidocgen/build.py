@@ -7,24 +7,34 @@
 
 import glob
 import io
+import json
 import multiprocessing
 import os
-import re
+import queue
 import shutil
 import subprocess
 import sys
-import threading
+import time
 from multiprocessing.pool import ThreadPool
 
 import jinja2
 import sphinx
 
+from .assets import get_file_hash, link_duplicates
 from .gen.genutil import get_data_dir
 from .mergeindex import mergeindex
 from .util import rest2html
 
 DEVHELP_PREFIX = "python-"
 
+# the minimum amount of rst (in bytes) per sphinx worker, smaller
+# packages don't gain anything from building in parallel
+MIN_WEIGHT_PER_WORKER = 512 * 1024
+
+# records what an incremental build was made from, see do_build()
+BUILD_STAMP = ".pgidocgen-build.json"
+BUILD_STAMP_VERSION = 1
+
 
 def get_cpu_count():
     try:
@@ -33,78 +43,204 @@ def get_cpu_count():
         return 2
 
 
-def rewrite_static_links(main):
-    """Rerites the html <link> tags to reference the shared static dir.
+def _get_namespace_dirs(main):
+    roots = []
+    for entry in os.listdir(main):
+        if entry.startswith(("_", ".")) or "-" not in entry:
+            continue
+        path = os.path.join(main, entry)
+        if not os.path.isdir(path):
+            continue
+        roots.append(path)
+    return sorted(roots)
+
 
-    This helps to reduce http requests in the online case.
+def share_static(main):
+    """Makes the sphinx _static folder shared.
+
+    The pages already reference the shared one, see the shared_static
+    sphinx extension, so this only has to move the files there and remove
+    the copies. Files which differ from the shared one are kept and
+    reported.
+    Can be run multiple times to dedup newly added modules.
+
+    Returns a list of (namespace dir, relpath) for the differing files.
     """
 
-    def rewrite(path, depth):
-        with io.open(path, "r", encoding="utf-8") as h:
-            data = h.read()
+    shared = os.path.join(main, "_static")
+    shared_hashes = {}
+    differing = []
 
-        def repl(match):
-            href = match.group(2)
-            if href.startswith("_static/"):
-                start = 0
-            elif "/_static/" in href:
-                start = href.index("/_static/") + 1
-            else:
-                return "".join(match.groups())
+    for root in _get_namespace_dirs(main):
+        static = os.path.join(root, "_static")
+        for dirpath, dirs, files in os.walk(static, topdown=False):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, static)
+                shared_path = os.path.join(shared, rel)
+                if not os.path.exists(shared_path):
+                    os.makedirs(os.path.dirname(shared_path), exist_ok=True)
+                    os.replace(path, shared_path)
+                    continue
+
+                if rel not in shared_hashes:
+                    shared_hashes[rel] = get_file_hash(shared_path)
+                if get_file_hash(path) != shared_hashes[rel]:
+                    differing.append((root, rel))
+                    continue
+                os.remove(path)
+
+            if not os.listdir(dirpath):
+                os.rmdir(dirpath)
+
+    for root, rel in differing:
+        print("%s: _static/%s differs from the shared one, keeping it" % (os.path.basename(root), rel))
+    return differing
+
+
+def get_source_files(path):
+    """Returns a dict mapping the relative paths of all files in a sphinx
+    source dir to their sha256 hash.
+
+    Python caches created by importing conf.py and the extensions are
+    ignored.
+    """
 
-            href = "../" * depth + href[start:]
-            return match.group(1) + href
+    files = {}
+    for root, dirs, names in os.walk(path):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for name in names:
+            full_path = os.path.join(root, name)
+            files[os.path.relpath(full_path, path)] = get_file_hash(full_path)
+    return files
 
-        new_data = re.sub("(<link .*? href=[\"'])([^\"']+)", repl, data)
-        if data != new_data:
-            with io.open(path, "w", encoding="utf-8") as h:
-                h.write(new_data)
 
-    for root, dirs, files in os.walk(main):
-        if root == main:
-            # ignore anything in the toplevel path
-            continue
-        for name in files:
-            path = os.path.join(root, name)
-            ext = os.path.splitext(path)[1]
-            if ext != ".html":
-                continue
-            depth = os.path.relpath(main, path).count(os.sep)
-            rewrite(path, depth)
+def get_inventory_hashes(package):
+    """Returns a dict mapping the dependencies of a package to the sha256
+    hash of their objects.inv or None if it doesn't exist.
+    """
 
+    hashes = {}
+    for name, path in package.dep_inventories.items():
+        hashes[name] = get_file_hash(path) if os.path.exists(path) else None
+    return hashes
 
-def share_static(main):
-    """Makes the sphinx _static folder shared.
 
-    Can be run multiple times to dedup newly added modules.
+def read_build_stamp(build_path):
+    """Returns the stamp written by write_build_stamp() or None"""
+
+    try:
+        with io.open(os.path.join(build_path, BUILD_STAMP), "r", encoding="utf-8") as h:
+            stamp = json.load(h)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(stamp, dict) or stamp.get("version") != BUILD_STAMP_VERSION:
+        return None
+    files = stamp.get("files")
+    if not isinstance(files, dict) or not isinstance(stamp.get("inventories"), dict):
+        return None
+    for entry in files.values():
+        if not (isinstance(entry, list) and len(entry) == 2 and isinstance(entry[1], int)):
+            return None
+    return stamp
+
+
+def write_build_stamp(build_path, source_path, files, inventories):
+    """Records the hashes of the source files and dependency inventories a
+    build was made from, together with the source mtimes sphinx has seen.
     """
 
-    rewrite_static_links(main)
+    stamp = {
+        "version": BUILD_STAMP_VERSION,
+        "files": {
+            rel: [sha, os.stat(os.path.join(source_path, rel)).st_mtime_ns]
+            for rel, sha in files.items()
+        },
+        "inventories": inventories,
+    }
+    path = os.path.join(build_path, BUILD_STAMP)
+    with io.open(path + ".tmp", "w", encoding="utf-8") as h:
+        json.dump(stamp, h, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def remove_build_stamp(build_path):
+    try:
+        os.remove(os.path.join(build_path, BUILD_STAMP))
+    except FileNotFoundError:
+        pass
 
-    roots = []
-    for entry in os.listdir(main):
-        if entry.startswith(("_", ".")) or "-" not in entry:
-            continue
-        path = os.path.join(main, entry)
-        if not os.path.isdir(path):
-            continue
-        roots.append(path)
 
-    shared = os.path.join(main, "_static")
+def get_build_flags(stamp, files, inventories):
+    """Returns the sphinx flags needed to bring a build up to date or None
+    if it is current.
 
-    if not os.path.exists(shared):
-        # copy one to the root
-        shutil.rmtree(shared, ignore_errors=True)
-        shutil.copytree(os.path.join(roots[0], "_static"), shared)
+    Without a stamp everything gets rebuilt. If an upstream inventory has
+    changed all pages get written again (-a), since sphinx resolves the
+    references to it while writing, but the doctrees stay valid.
+    Otherwise sphinx only reads and writes the changed documents.
+    """
 
-    # remove all others
-    for root in roots:
-        static = os.path.join(root, "_static")
-        shutil.rmtree(static, ignore_errors=True)
+    if stamp is None:
+        return ["-a", "-E"]
+
+    old_files = {rel: entry[0] for rel, entry in stamp["files"].items()}
+    if stamp["inventories"] != inventories:
+        return ["-a"]
+    elif old_files != files:
+        return []
+    return None
+
+
+def restore_mtimes(source_path, stamp, files):
+    """Resets the mtimes of files which haven't changed since the last
+    build, so sphinx doesn't consider them outdated. ``create`` writes
+    all files again, even if only a few of them change.
 
+    Returns the number of changed files.
+    """
+
+    changed = 0
+    for rel, sha in files.items():
+        entry = stamp["files"].get(rel)
+        if entry is None or entry[0] != sha:
+            changed += 1
+            continue
+        path = os.path.join(source_path, rel)
+        if os.stat(path).st_mtime_ns != entry[1]:
+            os.utime(path, ns=(entry[1], entry[1]))
+    return changed
+
+
+def do_build(package, incremental=False, jobs=1):
+    """Builds a package with sphinx, using jobs sphinx worker processes.
+
+    If incremental is True the sphinx caches are kept and a stamp of the
+    source and the dependency inventories is written, so the next
+    incremental build only rebuilds what has changed, or nothing.
+    """
 
-def do_build(package):
-    print("Build started for %s" % package.name)
+    flags = ["-a", "-E"]
+    if incremental:
+        files = get_source_files(package.path)
+        inventories = get_inventory_hashes(package)
+        stamp = read_build_stamp(package.build_path)
+        flags = get_build_flags(stamp, files, inventories)
+        if flags is None:
+            print("%s is up to date" % package.name)
+            return package
+        if stamp is not None:
+            changed = restore_mtimes(package.path, stamp, files)
+            print(
+                "Build started for %s (%d source files changed, upstream inventories %s)"
+                % (package.name, changed, "changed" if "-a" in flags else "unchanged")
+            )
+        else:
+            print("Build started for %s (no previous build)" % package.name)
+        # in case the build fails
+        remove_build_stamp(package.build_path)
+    else:
+        print("Build started for %s" % package.name)
 
     sphinx_args = [package.path, package.build_path]
     copy_env = os.environ.copy()
@@ -112,20 +248,28 @@ def do_build(package):
     if package.devhelp:
         sphinx_args = ["-b", "devhelpfork"] + sphinx_args
         copy_env["PGIDOCGEN_TARGET_PREFIX"] = DEVHELP_PREFIX
+        copy_env["PGIDOCGEN_SHARED_STATIC"] = ""
     else:
         sphinx_args = ["-b", "html"] + sphinx_args
         copy_env["PGIDOCGEN_TARGET_PREFIX"] = ""
+        copy_env["PGIDOCGEN_SHARED_STATIC"] = "1"
 
     copy_env["PGIDOCGEN_TARGET_BASE_PATH"] = os.path.dirname(package.build_path)
 
+    if jobs > 1:
+        flags = flags + ["-j", str(jobs)]
+
     subprocess.check_call(
-        [sys.executable, "-m", "sphinx", "-n", "-q", "-a", "-E"] + sphinx_args,
+        [sys.executable, "-m", "sphinx", "-n", "-q"] + flags + sphinx_args,
         env=copy_env,
     )
 
-    # we don't rebuild, remove all caches
-    shutil.rmtree(os.path.join(package.build_path, ".doctrees"))
-    os.remove(os.path.join(package.build_path, ".buildinfo"))
+    if incremental:
+        write_build_stamp(package.build_path, package.path, files, inventories)
+    else:
+        # we don't rebuild, remove all caches
+        shutil.rmtree(os.path.join(package.build_path, ".doctrees"))
+        os.remove(os.path.join(package.build_path, ".buildinfo"))
 
     # remove some pages we don't need
     os.remove(os.path.join(package.build_path, "genindex.html"))
@@ -133,11 +277,119 @@ def do_build(package):
 
     if os.name != "nt":
         for d in ["structs", "unions", "interfaces", "iface-structs", "class-structs"]:
-            os.symlink("classes", os.path.join(package.build_path, d))
+            link = os.path.join(package.build_path, d)
+            if not os.path.lexists(link):
+                os.symlink("classes", link)
 
     return package
 
 
+def get_package_weight(package):
+    """Returns the size of all rst files of a package in bytes, as an
+    estimate for how long it takes to build.
+    """
+
+    weight = 0
+    for root, dirs, files in os.walk(package.path):
+        for name in files:
+            if name.endswith(".rst"):
+                weight += os.path.getsize(os.path.join(root, name))
+    return weight
+
+
+class BuildScheduler(object):
+    """Decides in which order packages get built and how many sphinx
+    workers each of them gets, while using at most `jobs` cores.
+
+    Ready packages are started by the weight of the longest chain of
+    packages depending on them (the critical path), so the package
+    everything else waits for doesn't start last. The free cores go to the
+    started packages with the longest chain left, so the large ones and
+    the ones on the critical path build in parallel, but with at most one
+    worker per MIN_WEIGHT_PER_WORKER.
+
+    packages is a dict mapping the package name to a (weight, deps) tuple,
+    deps not in packages are considered done.
+    """
+
+    def __init__(self, packages, jobs):
+        self.jobs = max(1, jobs)
+        self._weights = {name: weight for name, (weight, deps) in packages.items()}
+        self._deps = {name: set(deps) & set(packages) for name, (weight, deps) in packages.items()}
+        self._waiting = set(packages)
+        self._running = {}
+        self._finished = set()
+        self.priorities = self._get_priorities()
+
+    def _get_priorities(self):
+        dependents = {name: [] for name in self._deps}
+        for name, deps in self._deps.items():
+            for dep in deps:
+                dependents[dep].append(name)
+
+        priorities = {}
+
+        def visit(name, path):
+            if name in path:
+                raise ValueError("circular dependency: %s" % " -> ".join(path + [name]))
+            if name not in priorities:
+                longest = max([visit(d, path + [name]) for d in dependents[name]], default=0)
+                priorities[name] = self._weights[name] + longest
+            return priorities[name]
+
+        for name in sorted(self._deps):
+            visit(name, [])
+        return priorities
+
+    def get_critical_path(self):
+        """The total weight of the longest dependency chain"""
+
+        return max(self.priorities.values(), default=0)
+
+    def _get_remaining(self, name, workers):
+        weight = self._weights[name]
+        return weight / workers + self.priorities[name] - weight
+
+    def _get_max_workers(self, name):
+        return max(1, min(self.jobs, self._weights[name] // MIN_WEIGHT_PER_WORKER))
+
+    def get_next(self):
+        """Returns a list of (name, workers) tuples for packages which can
+        be started now. The cores are in use until finish() gets called.
+        """
+
+        free = self.jobs - sum(self._running.values())
+        ready = [n for n in self._waiting if self._deps[n] <= self._finished]
+        ready.sort(key=lambda n: (-self.priorities[n], n))
+        started = ready[: max(free, 0)]
+        if not started:
+            return []
+
+        workers = {name: 1 for name in started}
+        free -= len(started)
+        while free > 0:
+            # give the next core to the one with the longest chain left:
+            # its own build time and everything waiting for it afterwards
+            candidates = [n for n in started if workers[n] < self._get_max_workers(n)]
+            if not candidates:
+                break
+            name = max(candidates, key=lambda n: (self._get_remaining(n, workers[n]), self.priorities[n]))
+            workers[name] += 1
+            free -= 1
+
+        for name in started:
+            self._waiting.remove(name)
+            self._running[name] = workers[name]
+        return [(name, workers[name]) for name in started]
+
+    def finish(self, name):
+        del self._running[name]
+        self._finished.add(name)
+
+    def has_running(self):
+        return bool(self._running)
+
+
 class Package(object):
     def __init__(self, name, lib_version, path, build_path, deps, devhelp=False):
         self.name = name
@@ -146,9 +398,8 @@ class Package(object):
         self.build_path = build_path
         self.deps = deps
         self.devhelp = devhelp
-
-    def can_build(self, done_deps):
-        return not (self.deps - set([p.name for p in done_deps]))
+        # dependency name -> path of its objects.inv
+        self.dep_inventories = {}
 
     def __repr__(self):
         return "<%s name=%s>" % (type(self).__name__, self.name)
@@ -159,9 +410,83 @@ def add_parser(subparsers):
     parser.add_argument("source", help="path to the sphinx environ base dir")
     parser.add_argument("target", help="path to where the resulting build should be")
     parser.add_argument("--devhelp", action="store_true")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=get_cpu_count(),
+        help="number of cores to use, shared between the sphinx processes (default: all)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep the sphinx caches and only rebuild namespaces whose "
+        "source or upstream inventories have changed since the last "
+        "incremental build",
+    )
     parser.set_defaults(func=main)
 
 
+def _build_packages(to_build, jobs, incremental):
+    """Builds the packages bottom up using the BuildScheduler"""
+
+    weights = {name: get_package_weight(p) for name, p in to_build.items()}
+    try:
+        scheduler = BuildScheduler({name: (weights[name], p.deps) for name, p in to_build.items()}, jobs)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(
+        "Building %d packages using %d jobs, critical path is %.1f of %.1f MiB of rst"
+        % (
+            len(to_build),
+            scheduler.jobs,
+            scheduler.get_critical_path() / 1024**2,
+            sum(weights.values()) / 1024**2,
+        )
+    )
+
+    results = queue.Queue()
+    failed = []
+    start = time.time()
+
+    def run(package, workers):
+        # anything raised has to end up in results, or the loop below
+        # waits forever
+        try:
+            do_build(package, incremental, workers)
+        except Exception as e:
+            return package, e
+        return package, None
+
+    def queue_ready():
+        for name, workers in scheduler.get_next():
+            print("Queue build for %s (%d sphinx jobs)" % (name, workers))
+            pool.apply_async(run, [to_build[name], workers], callback=results.put)
+
+    with ThreadPool(scheduler.jobs) as pool:
+        queue_ready()
+        num_done = 0
+        while scheduler.has_running():
+            package, error = results.get()
+            scheduler.finish(package.name)
+            if error is not None:
+                # don't start anything new, but let the running ones finish
+                print("%s failed: %s" % (package.name, error))
+                failed.append(package.name)
+                continue
+            num_done += 1
+            print(
+                "%s finished: %d/%d done, elapsed %.1fs"
+                % (package.name, num_done, len(to_build), time.time() - start)
+            )
+            if not failed:
+                queue_ready()
+
+    if failed:
+        raise SystemExit("Build failed: %s" % ", ".join(failed))
+    print("All done")
+
+
 def main(args):
     if sphinx.version_info < (1, 5, 0):
         raise SystemExit("Needs sphinx 1.5.0+")
@@ -196,57 +521,33 @@ def main(args):
     if not to_build:
         raise SystemExit("Nothing to build")
 
+    # the same paths conf.py passes to intersphinx
+    for package in to_build.values():
+        for dep in sorted(package.deps):
+            if dep == "cairo-1.0":
+                inv_path = os.path.join(args.source, "_intersphinx", "cairo.inv")
+            else:
+                inv_path = os.path.join(os.path.dirname(package.build_path), prefix + dep, "objects.inv")
+            package.dep_inventories[dep] = inv_path
+
     # don't build cairo-1.0, we reference the external one
-    to_ignore = set([])
-    for ignore in ["cairo-1.0"]:
-        p = to_build.pop(ignore, None)
-        if p:
-            to_ignore.add(p)
+    to_build.pop("cairo-1.0", None)
 
     try:
         os.mkdir(target_path)
     except OSError:
         pass
 
-    # build bottom up
+    # without --incremental existing builds are kept as is
     done = set()
-    num_to_build = len(to_build)
-    pool = ThreadPool(int(get_cpu_count() * 1.5))
-    event = threading.Event()
-
-    def job_cb(package=None):
-        if package is not None:
-            done.add(package)
-            print("%s finished: %d/%d done" % (package.name, len(done), num_to_build))
-
-        for package in get_new_jobs():
-            print("Queue build for %s" % package.name)
-            pool.apply_async(do_build, [package], callback=job_cb)
-
-        if len(done) == num_to_build:
-            print("All done")
-            event.set()
-
-    def get_new_jobs():
-        jobs = []
-
-        done_deps = done | to_ignore
-        for name, package in list(to_build.items()):
-            if package.can_build(done_deps):
-                del to_build[name]
-                jobs.append(package)
-
-        return jobs
-
     for name, package in list(to_build.items()):
-        if os.path.exists(package.build_path):
+        if not args.incremental and os.path.exists(package.build_path):
             del to_build[name]
             done.add(package)
 
-    job_cb()
-    event.wait()
-    pool.close()
-    pool.join()
+    if to_build:
+        _build_packages(to_build, args.jobs, args.incremental)
+        done.update(to_build.values())
 
     if not devhelp:
         mergeindex(target_path)
@@ -295,6 +596,11 @@ def main(args):
 
         share_static(target_path)
     else:
+        # every book needs its own _static, but they can share the files
+        static_dirs = [os.path.join(p, "_static") for p in _get_namespace_dirs(target_path)]
+        for path, rel in link_duplicates([p for p in static_dirs if os.path.isdir(p)]):
+            print("%s: _static/%s differs from the other books" % (os.path.basename(os.path.dirname(path)), rel))
+
         # for devhelp to pick things up the dir name has to match the
         # devhelp file name (without the extension)
         for package in done:
@@ -0,0 +1,218 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+import contextlib
+import fcntl
+import os
+import pickle
+import tempfile
+
+# 512 MiB, Gtk-3.0 takes around 10 MiB
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+_SUFFIX = ".pickle"
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser("cache", help="Inspect or prune the namespace cache")
+    parser.add_argument("action", choices=["stats", "prune"])
+    parser.add_argument("target", help="path passed to create/stubs before")
+    parser.add_argument(
+        "--max-size",
+        type=parse_size,
+        default=DEFAULT_MAX_SIZE,
+        help="size limit for prune e.g. 100M or 2G (default: %(default)s bytes)",
+    )
+    parser.set_defaults(func=main)
+
+
+def parse_size(text):
+    """Parses "100", "100K", "100M" or "100G" into a number of bytes"""
+
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    text = text.strip().upper().rstrip("B")
+    factor = 1
+    if text and text[-1] in units:
+        factor = units[text[-1]]
+        text = text[:-1]
+    try:
+        return int(float(text) * factor)
+    except ValueError:
+        raise ValueError("invalid size: %r" % text)
+
+
+def format_size(size):
+    for unit in ["B", "KiB", "MiB"]:
+        if size < 1024:
+            return "%.1f %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f GiB" % size
+
+
+class Cache(object):
+    """A directory of pickled values addressed by keys which are derived
+    from the content of everything the value depends on. Changed inputs
+    result in a new key, so outdated entries never get returned and are
+    removed once the cache grows too large.
+
+    Entries are removed least recently used first, which is tracked through
+    the file modification time.
+
+    Multiple processes can use the same cache at the same time. Entries get
+    written to a temporary file first and then renamed, so readers never
+    see partial data, and get_or_create() makes sure only one process
+    creates a missing entry.
+    """
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+
+    def _get_path(self, key):
+        assert os.sep not in key
+        return os.path.join(self.path, key + _SUFFIX)
+
+    def get(self, key):
+        """Returns the value for key or raises KeyError"""
+
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as h:
+                value = pickle.load(h)
+            os.utime(path)
+        except FileNotFoundError:
+            raise KeyError(key)
+        except (EOFError, pickle.UnpicklingError):
+            # not written by us, treat it like a missing entry
+            raise KeyError(key)
+        return value
+
+    def set(self, key, value):
+        """Stores value and evicts old entries if the size limit is hit"""
+
+        os.makedirs(self.path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.path, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as h:
+                pickle.dump(value, h, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._get_path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.prune()
+
+    @contextlib.contextmanager
+    def lock(self, name):
+        """Context manager holding an exclusive lock for name across
+        processes. The lock files are never removed, so name should come
+        from a small set, like the namespace name and not the full key.
+        """
+
+        lock_dir = os.path.join(self.path, "locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, name + ".lock"), "wb") as h:
+            fcntl.flock(h.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(h.fileno(), fcntl.LOCK_UN)
+
+    def get_or_create(self, key, create, lock_name=None):
+        """Returns the value for key. If missing, create() is called
+        to create it and the result is stored.
+
+        While one process creates the value for lock_name (defaults to
+        key), others wait and then use the stored result.
+        """
+
+        try:
+            return self.get(key)
+        except KeyError:
+            pass
+
+        with self.lock(lock_name or key):
+            # someone else might have created it while we were waiting
+            try:
+                return self.get(key)
+            except KeyError:
+                pass
+            value = create()
+            self.set(key, value)
+        return value
+
+    def keys(self):
+        """Returns all keys, least recently used first"""
+
+        return [key for key, size, mtime in self._entries()]
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return entries
+
+        for name in names:
+            if not name.endswith(_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:
+                continue
+            entries.append((name[: -len(_SUFFIX)], stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda e: e[2])
+        return entries
+
+    def size(self):
+        return sum(size for key, size, mtime in self._entries())
+
+    def remove(self, key):
+        try:
+            os.remove(self._get_path(key))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, max_size=None, keep=lambda key: True):
+        """Removes all entries for which keep(key) returns False and then
+        the least recently used ones until the cache is smaller than
+        max_size.
+
+        Returns a list of removed keys.
+        """
+
+        if max_size is None:
+            max_size = self.max_size
+
+        removed = []
+        entries = self._entries()
+        total = sum(size for key, size, mtime in entries)
+        for key, size, mtime in entries:
+            if keep(key) and total <= max_size:
+                continue
+            self.remove(key)
+            removed.append(key)
+            total -= size
+        return removed
+
+
+def main(args):
+    from .repo import is_current_cache_key
+
+    cache = Cache(os.path.join(args.target, ".pgidocgen.cache", "namespace"))
+
+    if args.action == "stats":
+        entries = cache._entries()
+        stale = [key for key, size, mtime in entries if not is_current_cache_key(key)]
+        print("Path: %s" % cache.path)
+        print("Entries: %d (%d outdated)" % (len(entries), len(stale)))
+        print("Size: %s (limit %s)" % (format_size(cache.size()), format_size(args.max_size)))
+    elif args.action == "prune":
+        before = cache.size()
+        removed = cache.prune(args.max_size, is_current_cache_key)
+        for key in removed:
+            print("Removed %s" % key)
+        print("Freed %s" % format_size(before - cache.size()))
@@ -5,14 +5,18 @@
 # License as published by the Free Software Foundation; either
 # version 2.1 of the License, or (at your option) any later version.
 
+import argparse
 import os
+import queue
 import subprocess
 import sys
+import time
+from multiprocessing.pool import ThreadPool
 
 import pgi
 
 from .gen import ModuleGenerator
-from .namespace import set_cache_prefix_path
+from .namespace import get_dependencies, set_cache_prefix_path
 from .util import get_gir_files
 
 
@@ -20,20 +24,162 @@ def add_parser(subparsers):
     parser = subparsers.add_parser("create", help="Create a sphinx environ")
     parser.add_argument("target", help="path to where the resulting source should be")
     parser.add_argument("namespace", nargs="+", help="namespace including version e.g. Gtk-3.0")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="number of processes to use, shared between the namespaces created in parallel",
+    )
+    parser.add_argument(
+        "--convert-jobs",
+        type=positive_int,
+        default=1,
+        help="number of processes for converting the docstrings of one namespace",
+    )
+    parser.add_argument(
+        "--ir",
+        help="directory for storing the parsed namespaces, which get reused "
+        "if still current, e.g. for re-rendering after template changes",
+    )
     parser.set_defaults(func=main)
 
 
-def _main_many(target, namespaces):
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError("must be at least 1: %r" % text)
+    return value
+
+
+def get_create_graph(target, namespaces):
+    """Returns a dict mapping each namespace that needs to be created to a
+    set of namespaces it depends on and which need to be created first.
+
+    Includes all dependencies, but stops at namespaces which already
+    exist in target, like ModuleGenerator.write() does.
+
+    e.g. {"Gtk-3.0": {"Gdk-3.0", ...}, "GLib-2.0": set(), ...}
+    """
+
+    graph = {}
+    pending = list(namespaces)
+    while pending:
+        nick = pending.pop()
+        if nick in graph or os.path.exists(os.path.join(target, nick)):
+            continue
+        graph[nick] = set("%s-%s" % dep for dep in get_dependencies(*nick.split("-", 1)))
+        pending.extend(graph[nick])
+
+    for deps in graph.values():
+        deps.intersection_update(graph)
+
+    return graph
+
+
+def _format_duration(seconds):
+    return "%d:%02d" % divmod(int(seconds), 60)
+
+
+def _create_one(target, nick, convert_jobs=1, ir_dir=None):
+    start = time.time()
+    args = [sys.executable, sys.argv[0], "create", target, nick, "--convert-jobs", str(convert_jobs)]
+    if ir_dir is not None:
+        args += ["--ir", ir_dir]
+    try:
+        returncode = subprocess.call(args)
+    except Exception as e:
+        # the result has to reach the queue, or _main_many waits forever
+        print("%s: %s" % (nick, e))
+        returncode = 1
+    return nick, returncode, time.time() - start
+
+
+def _main_many(target, namespaces, jobs, ir_dir=None):
+    girs = get_gir_files()
     for namespace in namespaces:
-        subprocess.check_call([sys.executable, sys.argv[0], "create", target, namespace])
+        if namespace not in girs:
+            print("GIR file for %s not found, aborting." % namespace)
+            raise SystemExit(1)
+
+    graph = get_create_graph(target, namespaces)
+    total = len(graph)
+    if not total:
+        print("Nothing to create")
+        return
+
+    print("Creating %d namespaces using %d jobs" % (total, jobs))
+
+    # each namespace gets created in its own process once all its
+    # dependencies are done, so it only writes itself
+    waiting = dict(graph)
+    finished = set()
+    failed = set()
+    results = queue.Queue()
+    # running namespace -> number of processes it got
+    running = {}
+    start = time.time()
+
+    def queue_ready():
+        # share the free jobs between the ready namespaces, so the last ones,
+        # which are usually the large ones, can convert in parallel. Ready
+        # ones which don't fit wait for the next one to finish.
+        free = jobs - sum(running.values())
+        ready = [nick for nick in sorted(waiting) if waiting[nick] <= finished][:free]
+        for i, nick in enumerate(ready):
+            del waiting[nick]
+            running[nick] = convert_jobs = free // len(ready) + (i < free % len(ready))
+            pool.apply_async(_create_one, [target, nick, convert_jobs, ir_dir], callback=results.put)
+
+        if waiting and not running:
+            # only possible with circular dependencies
+            for nick in sorted(waiting):
+                failed.add(nick)
+                print("%s: skipping, circular dependencies" % nick)
+            waiting.clear()
+
+    def skip_failed():
+        while True:
+            skipped = [nick for nick, deps in waiting.items() if deps & failed]
+            if not skipped:
+                break
+            for nick in skipped:
+                del waiting[nick]
+                failed.add(nick)
+                print("%s: skipping, dependencies failed" % nick)
+
+    with ThreadPool(jobs) as pool:
+        queue_ready()
+        while len(finished) + len(failed) < total:
+            nick, returncode, duration = results.get()
+            del running[nick]
+            if returncode == 0:
+                finished.add(nick)
+            else:
+                failed.add(nick)
+                print("%s: failed" % nick)
+                skip_failed()
+
+            done = len(finished) + len(failed)
+            elapsed = time.time() - start
+            eta = elapsed / done * (total - done)
+            print(
+                "[%d/%d] %s finished in %.1fs, elapsed %s, ETA %s"
+                % (done, total, nick, duration, _format_duration(elapsed), _format_duration(eta))
+            )
+            queue_ready()
+
+    if failed:
+        print("Failed: %s" % ", ".join(sorted(failed)))
+        raise SystemExit(1)
 
 
 def main(args):
     if not args.namespace:
         print("No namespace given")
         raise SystemExit(1)
-    elif len(args.namespace) > 1:
-        return _main_many(args.target, args.namespace)
+    elif len(args.namespace) > 1 or args.jobs > 1:
+        return _main_many(args.target, args.namespace, args.jobs, args.ir)
     else:
         namespace = args.namespace[0]
 
@@ -53,5 +199,5 @@ def main(args):
     set_cache_prefix_path(cache_prefix)
 
     namespace, version = namespace.split("-", 1)
-    gen = ModuleGenerator(namespace, version)
+    gen = ModuleGenerator(namespace, version, args.convert_jobs, args.ir)
     gen.write(args.target)
@@ -12,16 +12,13 @@ import copy
 import inspect
 import os
 import re
+import sys
 import types
 import warnings
 
-import gi
-from gi.repository import GObject
-
 from . import util
 from .funcsig import FuncSignature, get_type_name, py_type_to_class_ref
 from .girdata import Project, get_class_image_path, get_project_summary
-from .parser import docstring_to_rest
 from .util import escape_parameter, get_signature_string
 
 
@@ -66,10 +63,19 @@ def to_short_desc(docs):
         return docs
 
 
+def _intern(text):
+    """Interns strings which repeat a lot, like names and type descriptions"""
+
+    if type(text) is str:
+        return sys.intern(text)
+    return text
+
+
 class BaseDocObject(object):
+    # All doc objects use __slots__, as large namespaces create hundreds of
+    # thousands of them. See benchmarks/parse_memory.py
 
-    name = None
-    fullname = None
+    __slots__ = ("name",)
 
     def __repr__(self):
         return "<%s fullname=%s name=%s>" % (
@@ -79,7 +85,21 @@ class BaseDocObject(object):
         )
 
 
+class ChildDocObject(BaseDocObject):
+    """A doc object which is part of another one. Only the interned
+    fullname of the parent gets stored, which all siblings share.
+    """
+
+    __slots__ = ("parent_fullname",)
+
+    @property
+    def fullname(self):
+        return self.parent_fullname + "." + self.name
+
+
 class SignalsMixin(object):
+    __slots__ = ()
+
     def _parse_signals(self, repo, obj):
         if not hasattr(obj, "signals"):
             self.signals = []
@@ -93,6 +113,8 @@ class SignalsMixin(object):
 
 
 class MethodsMixin(object):
+    __slots__ = ()
+
     def get_methods(self, static=False):
         methods = []
         for m in self.methods:
@@ -104,14 +126,11 @@ class MethodsMixin(object):
     def _parse_methods(self, repo, obj):
         methods = []
         vfuncs = []
-        for attr, attr_obj in util.iter_public_attr(obj):
-            if not callable(attr_obj):
-                continue
-
-            if not util.is_method_owner(obj, attr):
+        for attr in util.get_attr_snapshot(obj):
+            if attr.kind != "method" or not attr.is_owner:
                 continue
 
-            func = Function.from_object(self.fullname, attr, attr_obj, repo, obj)
+            func = Function.from_object(self.fullname, attr.name, attr.obj, repo, obj)
             if func.is_vfunc:
                 vfuncs.append(func)
             else:
@@ -124,6 +143,8 @@ class MethodsMixin(object):
 
 
 class PropertiesMixin(object):
+    __slots__ = ()
+
     def _parse_properties(self, repo, obj):
         if not hasattr(obj, "props"):
             self.properties = []
@@ -144,6 +165,8 @@ class PropertiesMixin(object):
 
 
 class ChildPropertiesMixin(object):
+    __slots__ = ()
+
     def _parse_child_properties(self, repo, obj):
         props = []
         for spec in util.get_child_properties(obj):
@@ -154,6 +177,8 @@ class ChildPropertiesMixin(object):
 
 
 class StylePropertiesMixin(object):
+    __slots__ = ()
+
     def _parse_style_properties(self, repo, obj):
         props = []
         for spec in util.get_style_properties(obj):
@@ -164,14 +189,15 @@ class StylePropertiesMixin(object):
 
 
 class FieldsMixin(object):
+    __slots__ = ()
+
     def _parse_fields(self, repo, obj):
         fields = []
-        for attr, field_info in util.iter_public_attr(obj):
-            if not util.is_field(field_info):
-                continue
-            if not util.is_field_owner(obj, attr):
+        for attr in util.get_attr_snapshot(obj):
+            if attr.kind != "field" or not attr.is_owner:
                 continue
 
+            field_info = attr.obj
             py_type = field_info.py_type
             type_name = get_type_name(py_type)
             if "." in type_name and repo.is_private(type_name):
@@ -183,22 +209,13 @@ class FieldsMixin(object):
         self.fields = fields
 
 
-class Property(BaseDocObject):
-    def __init__(self, parent_fullname, name, prop_name, flags, type_desc, value_desc):
-        self.fullname = parent_fullname + "." + name
-        self.name = name
-        self.info = None
+def _get_param_flags(_cache=[]):
+    """A sorted list of (flag, name) for the documented GObject.ParamFlags"""
 
-        self.prop_name = prop_name
-        self.flags = flags
-        self.type_desc = type_desc
-        self.value_desc = value_desc
-        self.short_desc = None
+    if not _cache:
+        from gi.repository import GObject
 
-    @property
-    def flags_short(self):
-        flags = []
-        for key in sorted(dir(GObject.ParamFlags)):
+        for key in dir(GObject.ParamFlags):
             if key != key.upper():
                 continue
             flag = getattr(GObject.ParamFlags, key)
@@ -206,34 +223,59 @@ class Property(BaseDocObject):
                 continue
             if key.startswith(("PRIVATE", "STATIC")):
                 continue
+            _cache.append((int(flag), key))
+        _cache.sort()
+    return _cache
 
-            if self.flags & flag:
-                flags.append((flag, "".join([p[:1] for p in key.split("_")]).lower()))
-        return "/".join([x[1] for x in sorted(flags)])
 
-    @property
-    def flags_string(self):
-        descs = []
+def _get_signal_flags(_cache=[]):
+    """A sorted list of (flag, name) for all GObject.SignalFlags"""
 
-        for key in sorted(dir(GObject.ParamFlags)):
+    if not _cache:
+        from gi.repository import GObject
+
+        for key in dir(GObject.SignalFlags):
             if key != key.upper():
                 continue
-            flag = getattr(GObject.ParamFlags, key)
-            if bin(flag).count("1") != 1:
-                continue
-            if key.startswith(("PRIVATE", "STATIC")):
-                continue
+            _cache.append((int(getattr(GObject.SignalFlags, key)), key))
+        _cache.sort()
+    return _cache
+
+
+class Property(ChildDocObject):
+    __slots__ = (
+        "info",
+        "prop_name",
+        "flags",
+        "type_desc",
+        "value_desc",
+        "short_desc",
+        "flags_short",
+        "flags_string",
+    )
 
-            if self.flags & flag:
-                d = ":obj:`%s <GObject.ParamFlags.%s>`" % (key, key)
-                descs.append((flag, d))
+    def __init__(self, parent_fullname, name, prop_name, flags, type_desc, value_desc):
+        self.parent_fullname = _intern(parent_fullname)
+        self.name = _intern(name)
+        self.info = None
+
+        self.prop_name = _intern(prop_name)
+        self.flags = int(flags)
+        self.type_desc = _intern(type_desc)
+        self.value_desc = _intern(value_desc)
+        self.short_desc = None
 
-        return ", ".join([x[1] for x in sorted(descs)])
+        # computed here, so instances don't need gi once created
+        flags = [(f, k) for (f, k) in _get_param_flags() if self.flags & f]
+        self.flags_short = _intern("/".join(["".join([p[:1] for p in k.split("_")]).lower() for (f, k) in flags]))
+        self.flags_string = _intern(", ".join([":obj:`%s <GObject.ParamFlags.%s>`" % (k, k) for (f, k) in flags]))
 
     @classmethod
     def from_child_pspec(cls, repo, parent_fullname, spec):
         """Returns a Property for a ParamSpec"""
 
+        from gi.repository import GObject
+
         # WARNING: the ParamSpecs classes here aren't the same as for
         # properties, they come from the GIR not pgi internals..
         name = spec.get_name()
@@ -252,16 +294,16 @@ class Property(BaseDocObject):
             value_desc,
         )
 
-        prop.info = DocInfo(prop.fullname, prop.name)
+        prop.info = DocInfo.EMPTY
 
         if spec.flags & GObject.ParamFlags.DEPRECATED:
-            prop.info.deprecated = True
+            prop.info = prop.info.replace(deprecated=True)
 
         blurb = spec.get_blurb()
         if blurb is not None:
             if isinstance(blurb, bytes):
                 blurb = blurb.decode("utf-8")
-            short_desc = docstring_to_rest(repo, blurb, current_type=parent_fullname)
+            short_desc = repo.docstring_to_rest(blurb, current_type=parent_fullname)
         else:
             short_desc = ""
 
@@ -270,6 +312,8 @@ class Property(BaseDocObject):
 
     @classmethod
     def from_prop_spec(cls, repo, parent_fullname, attr_name, spec):
+        from gi.repository import GObject
+
         name = spec.name
         value_desc = util.instance_to_rest(spec.value_type.pytype, spec.default_value)
         type_desc = py_type_to_class_ref(spec.value_type.pytype)
@@ -287,33 +331,40 @@ class Property(BaseDocObject):
             blurb = spec.blurb
             if isinstance(blurb, bytes):
                 blurb = blurb.decode("utf-8")
-            short_desc = docstring_to_rest(repo, blurb, current_type=parent_fullname)
+            short_desc = repo.docstring_to_rest(blurb, current_type=parent_fullname)
         else:
             short_desc = ""
 
-        prop.info = DocInfo.from_object(repo, "properties", prop, current_type=parent_fullname)
+        prop.info = DocInfo.from_object(
+            repo, "properties", prop, current_type=parent_fullname, default_desc=short_desc
+        )
         if spec.flags & GObject.ParamFlags.DEPRECATED:
-            prop.info.deprecated = True
-        if not prop.info.desc:
-            prop.info.desc = short_desc
+            prop.info = prop.info.replace(deprecated=True)
         prop.short_desc = short_desc
 
         return prop
 
 
-class Signal(BaseDocObject):
+class Signal(ChildDocObject):
+    __slots__ = ("info", "sig_name", "flags", "signature", "signature_desc", "flags_string")
+
     def __init__(self, parent_fullname, name, sig_name, flags):
-        self.fullname = parent_fullname + "." + name
-        self.name = name
+        self.parent_fullname = _intern(parent_fullname)
+        self.name = _intern(name)
         self.info = None
 
-        self.sig_name = sig_name
-        self.flags = flags
+        self.sig_name = _intern(sig_name)
+        self.flags = int(flags)
+        self.signature = None
         self.signature_desc = None
-        self.short_desc = None
+
+        flags = [k for (f, k) in _get_signal_flags() if self.flags & f]
+        self.flags_string = _intern(", ".join([":obj:`%s <GObject.SignalFlags.%s>`" % (k, k) for k in flags]))
 
     @classmethod
     def from_object(cls, repo, parent_fullname, sig):
+        from gi.repository import GObject
+
         name = escape_parameter(sig.name)
         inst = cls(parent_fullname, name, sig.name, sig.flags)
 
@@ -326,7 +377,7 @@ class Signal(BaseDocObject):
         else:
             ssig = fsig.to_simple_signature()
 
-        inst.signature = ssig
+        inst.signature = _intern(ssig)
 
         if fsig:
             signature_desc = fsig.to_rest_listing(repo, inst.fullname, signal=True)
@@ -338,30 +389,21 @@ class Signal(BaseDocObject):
         inst.signature_desc = signature_desc
         inst.info = DocInfo.from_object(repo, "signals", inst, current_type=parent_fullname)
         if sig.flags & GObject.SignalFlags.DEPRECATED:
-            inst.info.deprecated = True
-        inst.short_desc = to_short_desc(inst.info.desc)
+            inst.info = inst.info.replace(deprecated=True)
         return inst
 
     @property
-    def flags_string(self):
-        descs = []
+    def short_desc(self):
+        return to_short_desc(self.info.desc)
 
-        for key in sorted(dir(GObject.SignalFlags)):
-            if key != key.upper():
-                continue
-            flag = getattr(GObject.SignalFlags, key)
-            if self.flags & flag:
-                d = ":obj:`%s <GObject.SignalFlags.%s>`" % (key, key)
-                descs.append((flag, d))
-
-        return ", ".join([x[1] for x in sorted(descs)])
 
+class PyProperty(ChildDocObject):
+    __slots__ = ("info",)
 
-class PyProperty(BaseDocObject):
     def __init__(self, parent_fullname, name):
-        self.fullname = parent_fullname + "." + name
-        self.name = name
-        self.info = DocInfo(self.fullname, self.name)
+        self.parent_fullname = _intern(parent_fullname)
+        self.name = _intern(name)
+        self.info = DocInfo.EMPTY
 
     @classmethod
     def from_object(cls, repo, parent_fullname, name, obj):
@@ -375,19 +417,24 @@ class PyProperty(BaseDocObject):
         # override docs
         docs = repo.lookup_override_docs(klass.fullname) or obj_doc
         if docs:
-            klass.info.desc = repo.render_override_docs(util.unindent(docs, True), all="", docs="")
+            klass.info = klass.info.replace(
+                desc=repo.render_override_docs(util.unindent(docs, True), all="", docs="")
+            )
 
         return klass
 
 
 class PyClass(BaseDocObject, MethodsMixin):
+    __slots__ = ("fullname", "signature", "info", "methods", "vfuncs", "pyprops")
+
     def __init__(self, namespace, name):
         self.fullname = namespace + "." + name
-        self.name = name
+        self.name = _intern(name)
 
         self.signature = "()"
-        self.info = DocInfo(self.fullname, self.name)
+        self.info = DocInfo.EMPTY
         self.methods = []
+        self.vfuncs = []
         self.pyprops = []
 
     @classmethod
@@ -397,23 +444,27 @@ class PyClass(BaseDocObject, MethodsMixin):
 
         klass = cls(namespace, name)
         klass._parse_methods(repo, obj)
-        klass.signature = get_signature_string(obj.__init__)
+        klass.signature = _intern(get_signature_string(obj.__init__))
 
-        for attr, attr_obj in util.iter_public_attr(obj):
-            if util.is_property(attr_obj) or not callable(attr_obj):
-                klass.pyprops.append(PyProperty.from_object(repo, klass.fullname, attr, attr_obj))
+        for attr in util.get_attr_snapshot(obj):
+            if attr.kind != "method":
+                klass.pyprops.append(PyProperty.from_object(repo, klass.fullname, attr.name, attr.obj))
         klass.pyprops.sort(key=lambda p: p.name)
 
         # override docs
         if obj.__doc__:
-            klass.info.desc = repo.render_override_docs(util.unindent(obj.__doc__, True), all="", docs="")
+            klass.info = klass.info.replace(
+                desc=repo.render_override_docs(util.unindent(obj.__doc__, True), all="", docs="")
+            )
 
         return klass
 
 
 class ClassNode(object):
+    __slots__ = ("name", "is_interface", "is_abstract")
+
     def __init__(self, name, is_interface, is_abstract):
-        self.name = name
+        self.name = _intern(name)
         self.is_interface = is_interface
         self.is_abstract = is_abstract
 
@@ -451,9 +502,38 @@ class Class(
     StylePropertiesMixin,
     FieldsMixin,
 ):
+    __slots__ = (
+        "fullname",
+        "info",
+        "is_interface",
+        "is_abstract",
+        "is_gobject",
+        "signature",
+        "image_path",
+        "gtype_struct",
+        "_gtype_struct_methods",
+        "gtype_struct_methods_inherited",
+        "methods",
+        "methods_inherited",
+        "vfuncs",
+        "vfuncs_inherited",
+        "properties",
+        "properties_inherited",
+        "signals",
+        "signals_inherited",
+        "fields",
+        "fields_inherited",
+        "child_properties",
+        "child_properties_inherited",
+        "style_properties",
+        "style_properties_inherited",
+        "base_tree",
+        "subclasses",
+    )
+
     def __init__(self, namespace, name):
         self.fullname = namespace + "." + name
-        self.name = name
+        self.name = _intern(name)
         self.info = None
 
         self.is_interface = False
@@ -463,6 +543,8 @@ class Class(
         self.image_path = None
 
         self.gtype_struct = ""
+        # (fullname, method count) of the gtype struct
+        self._gtype_struct_methods = None
         self.gtype_struct_methods_inherited = []
 
         self.methods = []
@@ -493,8 +575,30 @@ class Class(
     def bases(self):
         return [c[0] for c in self.base_tree[0][1]]
 
+    # the member lists subclasses show the counts of
+    INHERIT_TYPES = [
+        "vfuncs",
+        "methods",
+        "properties",
+        "signals",
+        "fields",
+        "child_properties",
+        "style_properties",
+    ]
+
     _cache: dict[str, type[Class]] = {}
-    _inspected: set[type] = set()
+
+    def get_manifest(self):
+        """Returns a summary of the members subclasses need, which can be
+        stored and used instead of the instance, see
+        Repository.lookup_class_manifest()
+        """
+
+        manifest = {}
+        for type_ in self.INHERIT_TYPES:
+            manifest[type_] = [m.name for m in getattr(self, type_)]
+        manifest["gtype_struct"] = self._gtype_struct_methods
+        return manifest
 
     @classmethod
     def from_object(cls, repo, obj):
@@ -503,6 +607,8 @@ class Class(
         if cache_key in cls._cache:
             return cls._cache[cache_key]
 
+        import gi
+
         warnings.filterwarnings("ignore", category=gi.PyGIDeprecationWarning)
 
         namespace = util.get_namespace(obj)
@@ -552,6 +658,7 @@ class Class(
         if gtype_struct is not None:
             klass.gtype_struct = class_name(gtype_struct)
             cs_obj = Structure.from_object(repo, gtype_struct)
+            klass._gtype_struct_methods = (cs_obj.fullname, len(cs_obj.methods))
             for method in cs_obj.methods:
                 new = method.copy_for_new(klass.fullname)
                 new.is_static = True
@@ -559,23 +666,33 @@ class Class(
 
         klass.is_gobject = util.is_object(obj) or util.is_iface(obj)
 
+        # Bases of other namespaces come from their manifests if available,
+        # so they don't have to be parsed again, see Class.get_manifest()
+
         def iter_gtype_structs(obj):
             for base in util.fake_mro(obj):
                 if base is object:
                     continue
+                if base is obj:
+                    yield klass._gtype_struct_methods
+                    continue
+                manifest = repo.lookup_class_manifest(class_name(base))
+                if manifest is not None:
+                    yield manifest["gtype_struct"]
+                    continue
                 if util.is_iface(base):
                     struct = base._get_iface_struct()
                 else:
                     struct = base._get_class_struct()
                 if not struct:
                     continue
-                yield Structure.from_object(repo, type(struct))
+                struct = Structure.from_object(repo, type(struct))
+                yield (struct.fullname, len(struct.methods))
 
-        for struct in iter_gtype_structs(obj):
-            method_count = len(struct.methods)
-            if not method_count:
+        for struct_methods in iter_gtype_structs(obj):
+            if struct_methods is None or not struct_methods[1]:
                 continue
-            klass.gtype_struct_methods_inherited.append((struct.fullname, method_count))
+            klass.gtype_struct_methods_inherited.append(tuple(struct_methods))
 
         klass.base_tree = get_base_tree(obj)
 
@@ -583,37 +700,23 @@ class Class(
             for base in util.fake_mro(obj):
                 if base is object or base is obj:
                     continue
-                yield Class.from_object(repo, base)
+                fullname = class_name(base)
+                manifest = repo.lookup_class_manifest(fullname)
+                if manifest is None:
+                    manifest = Class.from_object(repo, base).get_manifest()
+                yield fullname, manifest
 
         inherited = {}
-        inherit_types = [
-            "vfuncs",
-            "methods",
-            "properties",
-            "signals",
-            "fields",
-            "child_properties",
-            "style_properties",
-        ]
-        for base in iter_bases(obj):
-            for type_ in inherit_types:
-                attr = getattr(base, type_)
-                if len(attr):
-                    inherited.setdefault(type_, []).append((base.fullname, len(attr)))
-        for type_ in inherit_types:
+        for fullname, manifest in iter_bases(obj):
+            for type_ in cls.INHERIT_TYPES:
+                count = len(manifest[type_])
+                if count:
+                    inherited.setdefault(type_, []).append((fullname, count))
+        for type_ in cls.INHERIT_TYPES:
             setattr(klass, type_ + "_inherited", inherited.get(type_, []))
 
-        # ensure all subclasses are created first
-        if module not in cls._inspected:
-            for name in dir(module):
-                getattr(module, name, None)
-            cls._inspected.add(module)
-
-        subclasses = set()
-        for subc in util.fake_subclasses(obj):
-            if util.get_namespace(subc) == namespace:
-                subclasses.add(class_name(subc))
-        subclasses = sorted(subclasses)
+        graph = util.get_class_graph(namespace)
+        subclasses = sorted({class_name(s) for s in graph.get_namespace_subclasses(obj)})
 
         klass.subclasses = subclasses
         klass.signature = get_signature_string(obj.__init__)
@@ -622,16 +725,20 @@ class Class(
         # override docs
         if obj.__doc__:
             all_ = docs = klass.info.desc
-            klass.info.desc = repo.render_override_docs(util.unindent(obj.__doc__, True), all=all_, docs=docs)
+            klass.info = klass.info.replace(
+                desc=repo.render_override_docs(util.unindent(obj.__doc__, True), all=all_, docs=docs)
+            )
 
         cls._cache[cache_key] = klass
         return klass
 
 
-class Field(BaseDocObject):
+class Field(ChildDocObject):
+    __slots__ = ("info", "readable", "writable", "type_desc")
+
     def __init__(self, parent_fullname, name):
-        self.fullname = parent_fullname + "." + name
-        self.name = name
+        self.parent_fullname = _intern(parent_fullname)
+        self.name = _intern(name)
         self.info = None
 
         self.readable = False
@@ -652,7 +759,7 @@ class Field(BaseDocObject):
         name = field_info.name
         field = cls(parent_fullname, name)
 
-        field.type_desc = py_type_to_class_ref(field_info.py_type)
+        field.type_desc = _intern(py_type_to_class_ref(field_info.py_type))
         field.readable = field_info.readable
         field.writable = field_info.writeable
 
@@ -661,10 +768,12 @@ class Field(BaseDocObject):
         return field
 
 
-class Function(BaseDocObject):
+class Function(ChildDocObject):
+    __slots__ = ("info", "is_method", "is_static", "is_vfunc", "signature", "signature_desc")
+
     def __init__(self, parent_fullname, name, is_method, is_static, is_vfunc):
-        self.fullname = parent_fullname + "." + name
-        self.name = name
+        self.parent_fullname = _intern(parent_fullname)
+        self.name = _intern(name)
         self.info = None
 
         self.is_method = is_method
@@ -675,9 +784,9 @@ class Function(BaseDocObject):
         self.signature_desc = ""
 
     def copy_for_new(self, parent_fullname):
+        # DocInfo instances are never modified, so they can be shared
         new = copy.copy(self)
-        new.fullname = parent_fullname + "." + new.name
-        new.info = new.info.copy()
+        new.parent_fullname = _intern(parent_fullname)
         return new
 
     @classmethod
@@ -748,10 +857,11 @@ class Function(BaseDocObject):
 
         instance = get_instance()
 
-        # adjust according to the overrides
+        # adjust according to the overrides, only touch the docs if
+        # needed so they don't get converted for nothing
         signature_desc = instance.signature_desc
         signature = instance.signature
-        desc = instance.info.desc
+        desc = None
 
         # get the gir one
         func_sig = None
@@ -764,6 +874,7 @@ class Function(BaseDocObject):
                 break
 
         def render(docs):
+            desc = instance.info.desc
             all_ = signature_desc + "\n\n" + desc
             return repo.render_override_docs(docs, all=all_, docs=desc)
 
@@ -794,20 +905,24 @@ class Function(BaseDocObject):
 
         assert signature
         instance.signature_desc = signature_desc
-        instance.signature = signature
-        instance.info.desc = desc
+        instance.signature = _intern(signature)
+        if desc is not None:
+            instance.info = instance.info.replace(desc=desc)
 
         return instance
 
 
 class Structure(BaseDocObject, MethodsMixin, FieldsMixin):
+    __slots__ = ("fullname", "info", "signature", "methods", "vfuncs", "fields")
+
     def __init__(self, namespace, name, signature):
         self.fullname = namespace + "." + name
-        self.name = name
+        self.name = _intern(name)
         self.info = None
 
-        self.signature = signature
+        self.signature = _intern(signature)
         self.methods = []
+        self.vfuncs = []
         self.fields = []
 
     _cache: dict[str, Structure] = {}
@@ -832,19 +947,23 @@ class Structure(BaseDocObject, MethodsMixin, FieldsMixin):
 
 
 class Union(Structure):
-    pass
+    __slots__ = ()
 
 
 class Flags(BaseDocObject, MethodsMixin):
+    __slots__ = ("fullname", "info", "base", "desc", "signature", "values", "methods", "vfuncs")
+
     def __init__(self, namespace, name):
         self.fullname = namespace + "." + name
-        self.name = name
+        self.name = _intern(name)
         self.info = None
 
         self.base = None
         self.desc = None
+        self.signature = None
         self.values = []
         self.methods = []
+        self.vfuncs = []
 
     def _parse_values(self, repo, obj):
         values = []
@@ -870,25 +989,30 @@ class Flags(BaseDocObject, MethodsMixin):
         if obj.__bases__[0] is not int:
             instance.base = class_name(obj.__bases__[0])
 
-        instance.signature = get_signature_string(obj.__init__)
+        instance.signature = _intern(get_signature_string(obj.__init__))
 
         # override docs
         if obj.__doc__:
-            instance.info.desc = repo.render_override_docs(util.unindent(obj.__doc__, True), all="", docs="")
+            instance.info = instance.info.replace(
+                desc=repo.render_override_docs(util.unindent(obj.__doc__, True), all="", docs="")
+            )
 
         return instance
 
 
-class Constant(BaseDocObject):
+class Constant(ChildDocObject):
+    __slots__ = ("info", "value")
+
     def __init__(self, parent_fullname, name, value):
-        self.fullname = parent_fullname + "." + name
-        self.name = name
+        self.parent_fullname = _intern(parent_fullname)
+        self.name = _intern(name)
         self.info = None
 
-        self.value = value
+        self.value = _intern(value)
 
     @classmethod
     def from_object(cls, repo, parent_fullname, name, obj):
+        from gi.repository import GObject
 
         # the repr also contains the gtype value which changes between runs
         # and just adds noise to the diff
@@ -903,6 +1027,8 @@ class Constant(BaseDocObject):
 
 
 class SymbolMapping(object):
+    __slots__ = ("symbol_map", "source_map")
+
     def __init__(self, symbol_map, source_map):
         self.symbol_map = symbol_map  # [(c sym, url, py sym, is_shadowed)]
         self.source_map = source_map  # {py sym: git url}
@@ -935,6 +1061,26 @@ class SymbolMapping(object):
 
 
 class Module(BaseDocObject):
+    __slots__ = (
+        "fullname",
+        "classes",
+        "pyclasses",
+        "constants",
+        "functions",
+        "callbacks",
+        "flags",
+        "enums",
+        "structures",
+        "class_structures",
+        "iface_structures",
+        "unions",
+        "symbol_mapping",
+        "hierarchy",
+        "project_summary",
+        "library_version",
+        "dependencies",
+    )
+
     def __init__(self, namespace):
         self.fullname = namespace
         self.name = namespace
@@ -959,6 +1105,8 @@ class Module(BaseDocObject):
 
     @classmethod
     def from_repo(cls, repo):
+        import gi
+
         warnings.filterwarnings("ignore", category=gi.PyGIDeprecationWarning)
 
         mod = Module(repo.namespace)
@@ -1047,38 +1195,135 @@ class Module(BaseDocObject):
         mod.project_summary = get_project_summary(repo.namespace, repo.version)
         mod.project_summary.dependencies = repo.get_dependencies()
 
-        print("%s-%s: unresolved links: %d" % (repo.namespace, repo.version, repo.missed_links))
+        repo.save_class_manifests(mod.classes)
 
         return mod
 
 
-class DocInfo(BaseDocObject):
-    def __init__(self, fullname, name):
-        self.fullname = fullname
-        self.name = name
+class _LazyRest(object):
+    """A docstring which gets converted on first use, see DocInfo"""
+
+    __slots__ = ("repo", "docstring", "current_type", "current_func", "default")
+
+    def __init__(self, repo, docstring, current_type, current_func, default):
+        self.repo = repo
+        self.docstring = docstring
+        self.current_type = current_type
+        self.current_func = current_func
+        self.default = default
+
+    def convert(self):
+        self.repo.lazy_docs_converted += 1
+        rst = self.repo.docstring_to_rest(self.docstring, self.current_type, self.current_func)
+        return rst or self.default
+
+
+def _lazy_rest_property(attr):
+    def getter(self):
+        value = getattr(self, attr)
+        if type(value) is _LazyRest:
+            value = value.convert()
+            setattr(self, attr, value)
+        return value
+
+    def setter(self, value):
+        setattr(self, attr, value)
+
+    return property(getter, setter)
+
+
+class DocInfo(object):
+    """The documentation of a doc object.
+
+    Instances are shared and must not be changed, use replace() instead.
+    Objects without any documentation share DocInfo.EMPTY.
+
+    The texts get converted to reST on first access, so docs which never
+    end up in the output don't get converted at all.
+    """
 
-        self.desc = ""
-        self.shadowed_desc = ""
+    __slots__ = (
+        "_desc",
+        "_shadowed_desc",
+        "version_added",
+        "_deprecated",
+        "version_deprecated",
+        "_deprecation_desc",
+    )
+
+    # the public attributes
+    FIELDS = (
+        "desc",
+        "shadowed_desc",
+        "version_added",
+        "deprecated",
+        "version_deprecated",
+        "deprecation_desc",
+    )
+
+    EMPTY: DocInfo
+
+    def __init__(self):
+        self._desc = ""
+        self._shadowed_desc = ""
 
         self.version_added = ""
 
-        self.deprecated = False
+        # None means derived from the deprecation info
+        self._deprecated = None
         self.version_deprecated = ""
-        self.deprecation_desc = ""
+        self._deprecation_desc = ""
 
-    def copy(self):
-        return copy.copy(self)
+    desc = _lazy_rest_property("_desc")
+    shadowed_desc = _lazy_rest_property("_shadowed_desc")
+    deprecation_desc = _lazy_rest_property("_deprecation_desc")
+
+    @property
+    def deprecated(self):
+        if self._deprecated is not None:
+            return self._deprecated
+        return bool(self.version_deprecated or self.deprecation_desc)
+
+    @deprecated.setter
+    def deprecated(self, value):
+        self._deprecated = value
+
+    def __repr__(self):
+        return "<%s desc=%r>" % (type(self).__name__, self._desc)
+
+    def replace(self, **kwargs):
+        """Returns a copy with the given attributes changed"""
+
+        new = copy.copy(self)
+        for key, value in kwargs.items():
+            setattr(new, key, value)
+        return new
 
     @classmethod
-    def from_object(cls, repo, type_, doc_object, current_type=None, current_func=None):
-        info = cls(doc_object.fullname, doc_object.name)
-        info.desc, info.shadowed_desc = repo.lookup_docs(
-            type_, info.fullname, current_type=current_type, current_func=current_func
-        )
-        (
-            info.version_added,
-            info.version_deprecated,
-            info.deprecation_desc,
-        ) = repo.lookup_meta(type_, info.fullname)
-        info.deprecated = bool(info.version_deprecated or info.deprecation_desc)
+    def from_object(cls, repo, type_, doc_object, current_type=None, current_func=None, default_desc=""):
+        """If the converted description is empty default_desc is used"""
+
+        fullname = doc_object.fullname
+        docs, shadowed_docs = repo.lookup_raw_docs(type_, fullname)
+        version_added, version_deprecated, deprecation_docs = repo.lookup_raw_meta(type_, fullname)
+        if not (docs or shadowed_docs or version_added or version_deprecated or deprecation_docs or default_desc):
+            return cls.EMPTY
+
+        def lazy(docstring, current_type=None, current_func=None, default=""):
+            if not docstring:
+                return default
+            repo.lazy_docs += 1
+            return _LazyRest(repo, docstring, current_type, current_func, default)
+
+        info = cls()
+        info.desc = lazy(docs, current_type, current_func, default_desc)
+        info.shadowed_desc = lazy(shadowed_docs, current_type, current_func)
+        info.version_added = _intern(version_added)
+        # from the raw texts, so checking it doesn't convert anything
+        info.deprecated = bool(version_deprecated or deprecation_docs)
+        info.version_deprecated = _intern(version_deprecated)
+        info.deprecation_desc = lazy(deprecation_docs)
         return info
+
+
+DocInfo.EMPTY = DocInfo()
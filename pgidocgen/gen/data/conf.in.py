@@ -9,6 +9,8 @@ from conf_data import DEPS, SOURCEURLS
 
 TARGET = os.environ["PGIDOCGEN_TARGET_BASE_PATH"]
 TARGET_PREFIX = os.environ.get("PGIDOCGEN_TARGET_PREFIX", "")
+# reference the _static dir shared by all namespaces in TARGET
+pgi_shared_static = os.environ.get("PGIDOCGEN_SHARED_STATIC", "") == "1"
 mname, mversion = os.path.basename(os.getcwd()).split("-", 1)
 
 extensions = [
@@ -17,6 +19,7 @@ extensions = [
     "_ext.inheritance_graph",
     "_ext.devhelp_fork",
     "_ext.current_path",
+    "_ext.shared_static",
 ]
 source_suffix = ".rst"
 master_doc = "index"
@@ -44,6 +47,9 @@ for dep_name in DEPS:
         raise SystemExit("Dependency %r not found" % dep)
     intersphinx_mapping[intersph_name] = (os.path.join("..", dep_name), inv)
 
+# shared between all namespaces and builds
+inheritance_graph_cache = "../_inheritance_graphs"
+
 html_theme_path = ["."]
 html_theme = "_theme"
 html_copy_source = False
@@ -1,11 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import glob
+import hashlib
 import io
 import os
+import re
+import subprocess
+import tempfile
 
 from docutils import nodes
 from docutils.parsers.rst import Directive
-from sphinx.ext.graphviz import GraphvizError, render_dot
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+# the number of graphs passed to one dot process
+BATCH_SIZE = 500
+
+# graphs not in the cache get rendered at the end of the build, until then
+# the page contains the dot code, which also is the fallback if that fails
+PENDING_START = "<!-- inheritance-graph:%s -->"
+PENDING_END = "<!-- /inheritance-graph -->"
+PENDING_RE = re.compile(r"<!-- inheritance-graph:(\w+) -->.*?<!-- /inheritance-graph -->", re.DOTALL)
 
 
 def generate_dot(graph, colors, urls={}):
@@ -104,12 +120,51 @@ class InheritanceGraph(Directive):
         return [node]
 
 
-def render_dot_html(self, node, code, options, prefix="graphviz", imgcls=None, alt=None):
+def get_cache_dir(app):
+    """The SVG cache, shared between builds and, through the config, between
+    namespaces.
+    """
+
+    if app.config.inheritance_graph_cache:
+        return os.path.join(app.confdir, app.config.inheritance_graph_cache)
+    return os.path.join(app.doctreedir, "inheritance_graphs")
+
+
+def get_pending_dir(app):
+    return os.path.join(app.doctreedir, "inheritance_pending")
+
+
+def get_graph_key(config, code):
+    data = code + str(config.graphviz_dot) + str(config.graphviz_dot_args)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def get_cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key + ".svg")
+
+
+def write_atomic(path, data):
+    # builds of other namespaces might write the same file at the same time
+    dir_ = os.path.dirname(path)
+    os.makedirs(dir_, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dir_, suffix=".tmp")
+    with io.open(fd, "w", encoding="utf-8") as h:
+        h.write(data)
+    os.replace(temp_path, path)
+
+
+def read_cached_svg(cache_dir, key):
     try:
-        fname, outfn = render_dot(self, code, options, "svg", prefix)
-    except GraphvizError as exc:
-        self.builder.warn("dot code %r: " % code + str(exc))
-        raise nodes.SkipNode
+        with io.open(get_cache_path(cache_dir, key), "r", encoding="utf-8") as h:
+            return h.read()
+    except OSError:
+        return None
+
+
+def render_dot_html(self, node, code):
+    app = self.builder.app
+    key = get_graph_key(app.config, code)
+    svg = read_cached_svg(get_cache_dir(app), key)
 
     inline = node.get("inline", False)
     if inline:
@@ -118,23 +173,117 @@ def render_dot_html(self, node, code, options, prefix="graphviz", imgcls=None, a
         wrapper = "p"
 
     self.body.append(self.starttag(node, wrapper, CLASS="graphviz"))
-    if fname is None:
-        self.body.append(self.encode(code))
+    if svg is not None:
+        self.body.append(svg)
     else:
-        # inline the svg
-        with io.open(outfn, "r", encoding="utf-8") as h:
-            data = h.read()
-            data = data[data.find("<svg") :]
-        os.remove(outfn)
-        self.body.append(data)
+        pending_path = os.path.join(get_pending_dir(app), key + ".dot")
+        if not os.path.exists(pending_path):
+            write_atomic(pending_path, code)
+        # so only the pages containing it have to be updated, appending a
+        # line is atomic with parallel writers
+        page = os.path.relpath(self.builder.get_outfilename(self.builder.current_docname), app.outdir)
+        with io.open(os.path.join(get_pending_dir(app), key + ".pages"), "a", encoding="utf-8") as h:
+            h.write(page + "\n")
+        self.body.append(PENDING_START % key + self.encode(code) + PENDING_END)
 
     self.body.append("</%s>\n" % wrapper)
     raise nodes.SkipNode
 
 
+def render_batch(config, dot_paths):
+    """Renders all dot files using one dot process per BATCH_SIZE files.
+
+    Returns a dict mapping the paths to the SVG, missing the ones which
+    failed.
+    """
+
+    svgs = {}
+    for i in range(0, len(dot_paths), BATCH_SIZE):
+        batch = dot_paths[i : i + BATCH_SIZE]
+        args = [config.graphviz_dot] + list(config.graphviz_dot_args) + ["-Tsvg", "-O"] + batch
+        try:
+            result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError:
+            logger.warning(
+                "dot command %r cannot be run (needed for graphviz output), check the graphviz_dot setting"
+                % config.graphviz_dot
+            )
+            return svgs
+
+        for path in batch:
+            try:
+                with io.open(path + ".svg", "r", encoding="utf-8") as h:
+                    data = h.read()
+            except OSError:
+                logger.warning("dot did not produce an output file for %s:\n%r" % (path, result.stderr))
+                continue
+            svgs[path] = data[data.find("<svg") :]
+    return svgs
+
+
+def read_pending_pages(pending_dir, key):
+    """Returns the set of output files, relative to the output dir, which
+    contain the pending graph.
+    """
+
+    try:
+        with io.open(os.path.join(pending_dir, key + ".pages"), "r", encoding="utf-8") as h:
+            return set(line for line in h.read().splitlines() if line)
+    except OSError:
+        return set()
+
+
+def render_pending(app, exception):
+    """Renders the graphs missing in the cache in batch and puts them into
+    the pages written by this build.
+    """
+
+    if exception is not None:
+        return
+
+    pending_dir = get_pending_dir(app)
+    dot_paths = sorted(glob.glob(os.path.join(pending_dir, "*.dot")))
+    if not dot_paths:
+        return
+
+    cache_dir = get_cache_dir(app)
+    svgs = {}
+    pages = set()
+    for path, svg in render_batch(app.config, dot_paths).items():
+        key = os.path.splitext(os.path.basename(path))[0]
+        write_atomic(get_cache_path(cache_dir, key), svg)
+        svgs[key] = svg
+        pages.update(read_pending_pages(pending_dir, key))
+
+    def replace(match):
+        key = match.group(1)
+        if key in svgs:
+            return svgs[key]
+        return match.group(0)
+
+    for page in sorted(pages):
+        path = os.path.join(app.outdir, page)
+        try:
+            with io.open(path, "r", encoding="utf-8") as h:
+                data = h.read()
+        except OSError:
+            continue
+        new_data = PENDING_RE.sub(replace, data)
+        if new_data != data:
+            with io.open(path, "w", encoding="utf-8") as h:
+                h.write(new_data)
+
+    # keep the failed ones, so the next build tries again, also for pages
+    # an incremental build doesn't write again
+    for key in svgs:
+        for ext in [".dot", ".pages"]:
+            os.remove(os.path.join(pending_dir, key + ext))
+    for path in glob.glob(os.path.join(pending_dir, "*.dot.svg")):
+        os.remove(path)
+
+
 def html_visit_inheritance_graph(self, node):
     graph = node["graph"]
-    class_name = node["content"]
     classes = node["graph_classes"]
     colors = node["graph_colors"]
 
@@ -147,16 +296,7 @@ def html_visit_inheritance_graph(self, node):
         urls[fullname] = url
 
     dotcode = generate_dot(graph, colors, urls)
-    render_dot_html(
-        self,
-        node,
-        dotcode,
-        {},
-        "inheritance",
-        "inheritance",
-        alt="Inheritance diagram of " + class_name,
-    )
-    raise nodes.SkipNode
+    render_dot_html(self, node, dotcode)
 
 
 def skip(self, node):
@@ -174,5 +314,7 @@ def setup(app):
         texinfo=(skip, None),
     )
     app.add_directive("inheritance-graph", InheritanceGraph)
+    app.add_config_value("inheritance_graph_cache", "", "html")
+    app.connect("build-finished", render_pending)
 
     return {"parallel_read_safe": True}
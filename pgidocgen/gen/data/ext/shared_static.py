@@ -0,0 +1,38 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""Makes pages reference the _static dir shared by all namespaces in the
+parent directory, see build.share_static().
+"""
+
+
+def get_shared_static_path(pagename, path):
+    """Returns the path of a _static file in the shared dir, relative to
+    the page.
+    """
+
+    return "../" * (pagename.count("/") + 1) + path
+
+
+def shared_static_pathto(app, pagename, templatename, context, doctree):
+    if not app.config.pgi_shared_static or "pathto" not in context:
+        return
+
+    pathto = context["pathto"]
+
+    def shared_pathto(otheruri, resource=False, *args, **kwargs):
+        if resource and otheruri.startswith("_static/"):
+            return get_shared_static_path(pagename, otheruri)
+        return pathto(otheruri, resource, *args, **kwargs)
+
+    context["pathto"] = shared_pathto
+
+
+def setup(app):
+    app.add_config_value("pgi_shared_static", False, "html")
+    app.connect("html-page-context", shared_static_pathto)
+    return {"parallel_read_safe": True}
@@ -7,12 +7,12 @@
 
 import io
 import os
-import shutil
 
 import requests
 
-from ..namespace import get_namespace
-from ..repo import Repository
+from ..assets import AssetStore
+from ..ir import open_module
+from ..namespace import get_dependencies
 from . import genutil
 from .callback import CallbackGenerator
 from .constants import ConstantsGenerator
@@ -84,9 +84,16 @@ API
 
 
 class ModuleGenerator(object):
-    def __init__(self, namespace, version):
+    def __init__(self, namespace, version, jobs=1, ir_dir=None):
+        """jobs is the number of processes used for converting docstrings.
+        If ir_dir is given the parsed modules get stored there and are
+        reused if still current, see ir.open_module().
+        """
+
         self._namespace = namespace
         self._version = version
+        self._jobs = jobs
+        self._ir_dir = ir_dir
 
     def write(self, dir_):
         try:
@@ -114,8 +121,7 @@ class ModuleGenerator(object):
 
             add_mod(namespace, version)
 
-            ns = get_namespace(namespace, version)
-            for dep in ns.dependencies:
+            for dep in get_dependencies(namespace, version):
                 for res in get_to_write(dir_, *dep):
                     add_mod(*res)
 
@@ -133,8 +139,10 @@ class ModuleGenerator(object):
             return
 
         print("%s-%s: building..." % (namespace, version))
-        module = Repository(namespace, version).parse()
+        with open_module(namespace, version, self._ir_dir, self._jobs) as module:
+            self._write_module(sub_dir, namespace, version, module)
 
+    def _write_module(self, sub_dir, namespace, version, module):
         class_gen = ClassGenerator()
         for klass in module.classes:
             class_gen.add_class(klass)
@@ -266,12 +274,14 @@ class ModuleGenerator(object):
 
         data_dir = genutil.get_data_dir()
 
-        # copy the theme, conf.py
+        # copy the theme, conf.py, shared with all namespaces through
+        # hardlinks in SOURCE/_assets
+        store = AssetStore(os.path.join(os.path.dirname(sub_dir), "_assets"))
         dest_conf = os.path.join(dir_, "conf.py")
-        shutil.copy(os.path.join(data_dir, "conf.in.py"), dest_conf)
+        store.copy(os.path.join(data_dir, "conf.in.py"), dest_conf)
 
         theme_dest = os.path.join(dir_, "_theme")
-        shutil.copytree(os.path.join(data_dir, "theme"), theme_dest)
+        store.copytree(os.path.join(data_dir, "theme"), theme_dest)
 
         ext_dest = os.path.join(dir_, "_ext")
-        shutil.copytree(os.path.join(data_dir, "ext"), ext_dest)
+        store.copytree(os.path.join(data_dir, "ext"), ext_dest)
@@ -40,8 +40,7 @@ def ConvertMarkDown(symbol, text):
 
 
 def MarkDownParse(text, symbol):
-    text = re.sub(r"\r\n", r"\n", text)
-    text = re.sub(r"\r", r"\n", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
 
     lines = text.split("\n")
     text = MarkDownParseLines(lines, symbol, "")
@@ -58,241 +57,311 @@ def MarkDownParseLines(linesref, symbol, context):
     return output
 
 
+class _Block(object):
+    """A markdown block. Fields not used by a block type are None"""
+
+    __slots__ = (
+        "type",
+        "text",
+        "lines",
+        "level",
+        "id",
+        "interrupted",
+        "language",
+        "ordered",
+        "indentation",
+        "marker",
+        "first",
+        "last",
+        "start",
+        "end",
+        "closed",
+        "depth",
+    )
+
+    def __init__(self, type_, text=None, lines=None, **kwargs):
+        self.type = type_
+        self.text = text
+        self.lines = lines
+        self.level = None
+        self.id = None
+        self.interrupted = 0
+        self.language = None
+        self.ordered = None
+        self.indentation = None
+        self.marker = None
+        self.first = None
+        self.last = None
+        self.start = None
+        self.end = None
+        self.closed = None
+        self.depth = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def copy(self):
+        new = _Block.__new__(_Block)
+        for key in _Block.__slots__:
+            setattr(new, key, getattr(self, key))
+        return new
+
+
+_HEADING_RE = re.compile(r"([#]{1,2})[ \t]+(.+?)[ \t]*[#]*[ \t]*(?:{#([^}]+)})?[ \t]*$")
+_HEADING1_RE = re.compile(r"[#][ \t]+(.+?)[ \t]*[#]*[ \t]*(?:{#([^}]+)})?[ \t]*$")
+_SETEXT1_RE = re.compile(r"={4,}[ \t]*$")
+_SETEXT2_RE = re.compile(r"-{4,}[ \t]*$")
+_CODE_START_RE = re.compile(r'[ \t]*\|\[[ ]*(?:<!-- language="([^"]+?)" -->)?')
+_CODE_END_RE = re.compile(r"[ \t]*\]\|(.*)")
+_DOCTYPE_RE = re.compile(r"[ ]*<!DOCTYPE")
+_MARKUP_RE = re.compile(r"[ ]*<\??(\w+)[^>]*([\/\?])?[ \t]*>")
+_LI_RE = re.compile(r"([ ]*)[*+-][ ](.*)")
+_QUOTE_RE = re.compile(r"[ ]*>[ ]?(.*)")
+_QUOTE_PREFIX_RE = re.compile(r"^[ ]*>[ ]?")
+_ORDERED_LI_RE = re.compile(r"([ ]{0,4})\d+[.][ ]+(.*)")
+_INDENT_RE = re.compile(r"^[ ]{0,4}")
+_LI_MARKER_RES = {
+    "[*+-]": re.compile(r"([ ]{0,3})([*+-])[ ](.*)"),
+    "\\d+[.]": re.compile(r"([ ]{0,3})(\d+[.])[ ](.*)"),
+}
+
+# The line types in the order they are checked, for lines which don't
+# continue a code, markup, quote or list block
+_LINE_TYPES = [
+    ("heading", _HEADING_RE),
+    ("setext1", _SETEXT1_RE),
+    ("setext2", _SETEXT2_RE),
+    ("code", _CODE_START_RE),
+    ("doctype", _DOCTYPE_RE),
+    ("markup", _MARKUP_RE),
+    ("li", _LI_RE),
+    ("quote", _QUOTE_RE),
+]
+
+# Lines not starting with one of these (after spaces/tabs) or a digit
+# can't match any of the above
+_LINE_TYPE_START_CHARS = frozenset("#=-|<*+>")
+
+
+def _classify_line(line):
+    """Returns (line type, match) or (None, None) for a paragraph line"""
+
+    first = line.lstrip(" \t")[:1]
+    if first not in _LINE_TYPE_START_CHARS:
+        return None, None
+    for line_type, regex in _LINE_TYPES:
+        match = regex.match(line)
+        if match is not None:
+            return line_type, match
+    return None, None
+
+
+def _remove_indent(line):
+    return _INDENT_RE.sub("", line)
+
+
 def MarkDownParseBlocks(linesref, symbol, context):
     md_blocks = []
-    md_block = {"type": ""}
+    md_block = _Block("")
 
     for line in linesref:
         first_char = line[:1]
 
-        if md_block["type"] == "markup":
-            if not md_block["closed"]:
-                if line.find(md_block["start"]) != -1:
-                    md_block["depth"] += 1
-                if line.find(md_block["end"]) != -1:
-                    if md_block["depth"] > 0:
-                        md_block["depth"] -= 1
+        if md_block.type == "markup":
+            if not md_block.closed:
+                if line.find(md_block.start) != -1:
+                    md_block.depth += 1
+                if line.find(md_block.end) != -1:
+                    if md_block.depth > 0:
+                        md_block.depth -= 1
                     else:
                         # ("closing tag '$line'");
-                        md_block["closed"] = 1
+                        md_block.closed = 1
                         # TODO(ensonic): reparse inner text with MarkDownParseLines?
-                md_block["text"] += "\n" + line
+                md_block.text += "\n" + line
                 # ("add to markup");
                 continue
 
-        deindented_line = line
-        deindented_line = re.sub(r"^\s+", "", deindented_line)
+        deindented_line = line.lstrip()
 
-        if md_block["type"] == "heading":
-            heading_match = re.search(r"^[#][ \t]+(.+?)[ \t]*[#]*[ \t]*(?:{#([^}]+)})?[ \t]*$", line)
+        if md_block.type == "heading":
             # a heading is ended by any level less than or equal
-            if md_block["level"] == 1:
-                if re.search(r"^={4,}[ \t]*$", line):
-                    text = md_block["lines"].pop()
-                    md_block["interrupted"] = 0
+            if md_block.level == 1:
+                heading_match = _HEADING1_RE.match(line)
+                if _SETEXT1_RE.match(line):
+                    text = md_block.lines.pop()
+                    md_block.interrupted = 0
                     md_blocks.append(md_block)
 
-                    md_block = {
-                        "type": "heading",
-                        "text": text,
-                        "lines": [],
-                        "level": 1,
-                    }
+                    md_block = _Block("heading", text, [], level=1)
                     continue
                 elif heading_match:
-                    md_block["interrupted"] = 0
+                    md_block.interrupted = 0
                     md_blocks.append(md_block)
-                    md_block = {
-                        "type": "heading",
-                        "text": heading_match.group(1),
-                        "id": heading_match.group(2),
-                        "lines": [],
-                        "level": 1,
-                    }
+                    md_block = _Block(
+                        "heading",
+                        heading_match.group(1),
+                        [],
+                        id=heading_match.group(2),
+                        level=1,
+                    )
                     continue
                 else:
                     # push lines into the block until the end is reached
-                    md_block["lines"].append(line)
+                    md_block.lines.append(line)
                     continue
             else:
-                heading_match = re.search(
-                    r"^([#]{1,2})[ \t]+(.+?)[ \t]*[#]*[ \t]*(?:{#([^}]+)})?[ \t]*$",
-                    line,
-                )
-                if re.search(r"^[=]{4,}[ \t]*$", line):
-                    text = md_block["lines"].pop()
-                    md_block["interrupted"] = 0
+                heading_match = _HEADING_RE.match(line)
+                if _SETEXT1_RE.match(line):
+                    text = md_block.lines.pop()
+                    md_block.interrupted = 0
                     md_blocks.append(md_block)
 
-                    md_block = {
-                        "type": "heading",
-                        "text": text,
-                        "lines": [],
-                        "level": 1,
-                    }
+                    md_block = _Block("heading", text, [], level=1)
                     continue
-                elif re.search(r"^[-]{4,}[ \t]*$", line):
-                    text = md_block["lines"].pop()
-                    md_block["interrupted"] = 0
+                elif _SETEXT2_RE.match(line):
+                    text = md_block.lines.pop()
+                    md_block.interrupted = 0
                     md_blocks.append(md_block)
-                    md_block = {
-                        "type": "heading",
-                        "text": text,
-                        "lines": [],
-                        "level": 2,
-                    }
+                    md_block = _Block("heading", text, [], level=2)
                     continue
                 elif heading_match:
-                    md_block["interrupted"] = 0
+                    md_block.interrupted = 0
                     md_blocks.append(md_block)
 
-                    md_block = {
-                        "type": "heading",
-                        "text": heading_match.group(2),
-                        "id": heading_match.group(3),
-                        "lines": [],
-                        "level": len(heading_match.group(1)),
-                    }
+                    md_block = _Block(
+                        "heading",
+                        heading_match.group(2),
+                        [],
+                        id=heading_match.group(3),
+                        level=len(heading_match.group(1)),
+                    )
                     continue
                 else:
                     # push lines into the block until the end is reached
-                    md_block["lines"].append(line)
+                    md_block.lines.append(line)
                     continue
-        elif md_block["type"] == "code":
-            match = re.search(r"^[ \t]*\]\|(.*)", line)
+        elif md_block.type == "code":
+            match = _CODE_END_RE.match(line)
             if match:
                 md_blocks.append(md_block)
-                md_block = {
-                    "type": "paragraph",
-                    "text": match.group(1),
-                    "lines": [],
-                }
+                md_block = _Block("paragraph", match.group(1), [])
             else:
-                md_block["lines"].append(line)
+                md_block.lines.append(line)
             continue
 
         if deindented_line == "":
-            md_block["interrupted"] = 1
+            md_block.interrupted = 1
             continue
 
-        if md_block["type"] == "quote":
-            if not md_block.get("interrupted"):
-                line = re.sub(r"^[ ]*>[ ]?", "", line)
-                md_block["lines"].append(line)
+        if md_block.type == "quote":
+            if not md_block.interrupted:
+                line = _QUOTE_PREFIX_RE.sub("", line)
+                md_block.lines.append(line)
                 continue
-        elif md_block["type"] == "li":
-            marker = md_block["marker"]
-            marker_match = re.search(r"^([ ]{0,3})(%s)[ ](.*)" % marker, line)
+        elif md_block.type == "li":
+            marker = md_block.marker
+            marker_match = _LI_MARKER_RES[marker].match(line)
             if marker_match:
                 indentation = marker_match.group(1)
-                if md_block["indentation"] != indentation:
-                    md_block["lines"].append(line)
+                if md_block.indentation != indentation:
+                    md_block.lines.append(line)
                 else:
                     lines = marker_match.group(3)
-                    ordered = md_block["ordered"]
-                    lines = re.sub(r"^[ ]{0,4}", "", lines)
-                    md_block["last"] = 0
+                    ordered = md_block.ordered
+                    lines = _remove_indent(lines)
+                    md_block.last = 0
                     md_blocks.append(md_block)
-                    md_block = {
-                        "type": "li",
-                        "ordered": ordered,
-                        "indentation": indentation,
-                        "marker": marker,
-                        "first": 0,
-                        "last": 1,
-                        "lines": [lines],
-                    }
+                    md_block = _Block(
+                        "li",
+                        lines=[lines],
+                        ordered=ordered,
+                        indentation=indentation,
+                        marker=marker,
+                        first=0,
+                        last=1,
+                    )
                 continue
 
-            if md_block.get("interrupted"):
+            if md_block.interrupted:
                 if first_char == " ":
-                    md_block["lines"].append("")
-                    line = re.sub(r"^[ ]{0,4}", "", line)
-                    md_block["lines"].append(line)
-                    md_block["interrupted"] = 0
+                    md_block.lines.append("")
+                    line = _remove_indent(line)
+                    md_block.lines.append(line)
+                    md_block.interrupted = 0
                     continue
             else:
-                line = re.sub(r"^[ ]{0,4}", "", line)
-                md_block["lines"].append(line)
+                line = _remove_indent(line)
+                md_block.lines.append(line)
                 continue
 
         # indentation sensitive types
         # ("parsing '$line'");
 
-        heading_match = re.search(r"^([#]{1,2})[ \t]+(.+?)[ \t]*[#]*[ \t]*(?:{#([^}]+)})?[ \t]*$", line)
-        code_match = re.search(r'^[ \t]*\|\[[ ]*(?:<!-- language="([^"]+?)" -->)?', line)
+        line_type, match = _classify_line(line)
 
-        if heading_match:
+        if line_type == "heading":
             # atx heading (#)
             md_blocks.append(md_block)
 
-            md_block = {
-                "type": "heading",
-                "text": heading_match.group(2),
-                "id": heading_match.group(3),
-                "lines": [],
-                "level": len(heading_match.group(1)),
-            }
+            md_block = _Block(
+                "heading",
+                match.group(2),
+                [],
+                id=match.group(3),
+                level=len(match.group(1)),
+            )
             continue
-        elif re.search(r"^={4,}[ \t]*$", line):
+        elif line_type == "setext1":
             # setext heading (====)
 
-            if md_block["type"] == "paragraph" and md_block.get("interrupted"):
+            if md_block.type == "paragraph" and md_block.interrupted:
                 md_blocks.append(md_block.copy())
-                md_block["type"] = "heading"
-                md_block["lines"] = []
-                md_block["level"] = 1
+                md_block.type = "heading"
+                md_block.lines = []
+                md_block.level = 1
             continue
-        elif re.search(r"^-{4,}[ \t]*$", line):
+        elif line_type == "setext2":
             # setext heading (-----)
 
-            if md_block["type"] == "paragraph" and md_block.get("interrupted"):
+            if md_block.type == "paragraph" and md_block.interrupted:
                 md_blocks.append(md_block.copy())
-                md_block["type"] = "heading"
-                md_block["lines"] = []
-                md_block["level"] = 2
+                md_block.type = "heading"
+                md_block.lines = []
+                md_block.level = 2
             continue
-        elif code_match:
+        elif line_type == "code":
             # code
-            md_block["interrupted"] = 1
+            md_block.interrupted = 1
             md_blocks.append(md_block)
-            md_block = {
-                "type": "code",
-                "language": code_match.group(1),
-                "lines": [],
-            }
+            md_block = _Block("code", lines=[], language=match.group(1))
             continue
 
-        markup_match = re.search(r"^[ ]*<\??(\w+)[^>]*([\/\?])?[ \t]*>", line)
-        li_match = re.search(r"^([ ]*)[*+-][ ](.*)", line)
-        quote_match = re.search(r"^[ ]*>[ ]?(.*)", line)
-
         # indentation insensitive types
-        if re.search(r"^[ ]*<!DOCTYPE", line):
+        if line_type == "doctype":
             md_blocks.append(md_block)
-            md_block = {
-                "type": "markup",
-                "text": deindented_line,
-                "start": "<",
-                "end": ">",
-                "closed": 0,
-                "depth": 0,
-            }
-        elif markup_match:
+            md_block = _Block(
+                "markup",
+                deindented_line,
+                start="<",
+                end=">",
+                closed=0,
+                depth=0,
+            )
+        elif line_type == "markup":
             # markup, including <?xml version="1.0"?>
-            tag = markup_match.group(1)
-            is_self_closing = markup_match.group(2) is not None
+            tag = match.group(1)
+            is_self_closing = match.group(2) is not None
 
             # skip link markdown
             # TODO(ensonic): consider adding more uri schemes (ftp, ...)
-            if re.search(r"^https?", tag):
+            if tag.startswith("http"):
                 # ("skipping link '$tag'");
                 pass
             else:
                 # for TEXT_LEVEL_ELEMENTS, we want to keep them as-is in the
                 # paragraph instead of creation a markdown block.
                 scanning_for_end_of_text_level_tag = (
-                    md_block["type"] == "paragraph" and "start" in md_block and not md_block.get("closed")
+                    md_block.type == "paragraph" and md_block.start is not None and not md_block.closed
                 )
                 # ("markup found '$tag', scanning $scanning_for_end_of_text_level_tag ?");
                 if tag not in MD_TEXT_LEVEL_ELEMENTS and not scanning_for_end_of_text_level_tag:
@@ -300,103 +369,90 @@ def MarkDownParseBlocks(linesref, symbol, context):
 
                     if is_self_closing:
                         # ("self-closing docbook '$tag'");
-                        md_block = {
-                            "type": "self-closing tag",
-                            "text": deindented_line,
-                        }
+                        md_block = _Block("self-closing tag", deindented_line)
                         is_self_closing = 0
                         continue
 
                     # ("new markup '$tag'");
-                    md_block = {
-                        "type": "markup",
-                        "text": deindented_line,
-                        "start": "<" + tag + ">",
-                        "end": "</" + tag + ">",
-                        "closed": 0,
-                        "depth": 0,
-                    }
-                    if re.search(r"<\/%s>" % tag, deindented_line):
-                        md_block["closed"] = 1
+                    md_block = _Block(
+                        "markup",
+                        deindented_line,
+                        start="<" + tag + ">",
+                        end="</" + tag + ">",
+                        closed=0,
+                        depth=0,
+                    )
+                    if "</%s>" % tag in deindented_line:
+                        md_block.closed = 1
                     continue
                 else:
                     if tag in MD_TEXT_LEVEL_ELEMENTS:
                         # ("text level docbook '$tag' in '".$md_block->{"type"}."' state");
                         # TODO(ensonic): handle nesting
                         if not scanning_for_end_of_text_level_tag:
-                            if re.search(r"<\/%s>" % tag, deindented_line):
+                            if "</%s>" % tag in deindented_line:
                                 # ("new text level markup '$tag'");
-                                md_block["start"] = "<" + tag + ">"
-                                md_block["end"] = "</" + tag + ">"
-                                md_block["closed"] = 0
+                                md_block.start = "<" + tag + ">"
+                                md_block.end = "</" + tag + ">"
+                                md_block.closed = 0
                                 # ("scanning for end of '$tag'");
                         else:
-                            if md_block["end"] in deindented_line:
-                                md_block["closed"] = 1
+                            if md_block.end in deindented_line:
+                                md_block.closed = 1
                                 # ("found end of '$tag'");
-        elif li_match:
+        elif line_type == "li":
             # li
             md_blocks.append(md_block)
-            lines = li_match.group(2)
-            indentation = li_match.group(1)
-            lines = re.sub(r"^[ ]{0,4}", "", lines)
-
-            md_block = {
-                "type": "li",
-                "ordered": 0,
-                "indentation": indentation,
-                "marker": "[*+-]",
-                "first": 1,
-                "last": 1,
-                "lines": [lines],
-            }
+            lines = match.group(2)
+            indentation = match.group(1)
+            lines = _remove_indent(lines)
+
+            md_block = _Block(
+                "li",
+                lines=[lines],
+                ordered=0,
+                indentation=indentation,
+                marker="[*+-]",
+                first=1,
+                last=1,
+            )
             continue
-        elif quote_match:
+        elif line_type == "quote":
             md_blocks.append(md_block)
-            md_block = {
-                "type": "quote",
-                "lines": [quote_match.group(1)],
-            }
+            md_block = _Block("quote", lines=[match.group(1)])
             continue
 
         # list item
-        list_item_match = re.search(r"^([ ]{0,4})\d+[.][ ]+(.*)", line)
+        list_item_match = _ORDERED_LI_RE.match(line)
         if list_item_match:
             md_blocks.append(md_block)
             lines = list_item_match.group(2)
             indentation = list_item_match.group(1)
-            lines = re.sub("^[ ]{0,4}", "", lines)
-
-            md_block = {
-                "type": "li",
-                "ordered": 1,
-                "indentation": indentation,
-                "marker": "\\d+[.]",
-                "first": 1,
-                "last": 1,
-                "lines": [lines],
-            }
+            lines = _remove_indent(lines)
+
+            md_block = _Block(
+                "li",
+                lines=[lines],
+                ordered=1,
+                indentation=indentation,
+                marker="\\d+[.]",
+                first=1,
+                last=1,
+            )
             continue
 
         # paragraph
-        if md_block["type"] == "paragraph":
-            if md_block.get("interrupted"):
+        if md_block.type == "paragraph":
+            if md_block.interrupted:
                 md_blocks.append(md_block)
-                md_block = {
-                    "type": "paragraph",
-                    "interrupted": 0,
-                    "text": line,
-                }
+                md_block = _Block("paragraph", line)
                 # ("new paragraph due to interrupted");
             else:
-                md_block["text"] += "\n" + line
+                md_block.text += "\n" + line
                 # ("add to paragraph");
         else:
             md_blocks.append(md_block)
-            md_block = {
-                "type": "paragraph",
-                "text": line,
-            }
+            md_block = _Block("paragraph", line)
             # ("new paragraph due to different block type");
 
     md_blocks.append(md_block)
@@ -427,77 +483,76 @@ def ReplaceEntities(text, symbol):
     return text
 
 
-def MarkDownParseSpanElementsInner(text, markersref):
-    markup = ""
-    markers = dict.fromkeys(markersref, 1)
-
-    while text != "":
-        closest_marker = ""
-        closest_marker_index = 0
-        closest_marker_position = -1
-        text_marker = ""
-        i = 0
-        offset = 0
-
-        for marker, use in markers.items():
-            if not use:
-                continue
-
-            try:
-                marker_position = text.index(marker)
-            except ValueError:
-                marker_position = -1
-
-            if marker_position < 0:
-                markers[marker] = 0
-                continue
+_SPAN_MARKER_RES = {}
+_LINK_TEXT_RE = re.compile(r"\[((?:[^][])*)\]")
+_LINK_URL_RE = re.compile(r"\([ ]*([^)'\"]*?)(?:[ ]+['\"](.+?)['\"])?[ ]*\)")
+_LINK_REF_RE = re.compile(r"\s*\[([^\]<]*?)\]")
+_CODE_RE = re.compile(r"(`+)([^`]+?)\1(?!`)")
 
-            if closest_marker == "" or marker_position < closest_marker_position:
-                closest_marker = marker
-                closest_marker_index = i
-                closest_marker_position = marker_position
 
-        closest_marker_index  # pyflakes
+def _get_span_marker_re(markers):
+    """Returns a regex matching any of the markers"""
 
-        if closest_marker_position >= 0:
-            text_marker = text[closest_marker_position:]
+    try:
+        return _SPAN_MARKER_RES[markers]
+    except KeyError:
+        # longest first, so "![" wins over "[" in case of a shared prefix
+        alternatives = sorted(markers, key=len, reverse=True)
+        regex = re.compile("|".join(re.escape(m) for m in alternatives))
+        _SPAN_MARKER_RES[markers] = regex
+        return regex
 
-        if text_marker == "":
-            markup += text
-            text = ""
-            continue
 
-        markup += text[:closest_marker_position]
-        text = text[closest_marker_position:]
-        markers_rest = {k: v for k, v in markers.items() if v and k != closest_marker}
+def MarkDownParseSpanElementsInner(text, markersref):
+    # PYTHONTODO: this no longer follows the gtk-doc code closely. Instead
+    # of searching for each marker on each iteration and slicing the text
+    # we move a cursor through it and search for all markers at once.
+
+    markers = tuple(markersref)
+    marker_re = _get_span_marker_re(markers)
+    markup = []
+    pos = 0
+    # any search for link text starting at or after this will fail
+    no_link_text = len(text) + 1
+
+    while True:
+        match = marker_re.search(text, pos)
+        if match is None:
+            markup.append(text[pos:])
+            break
+
+        closest_marker = match.group()
+        markup.append(text[pos : match.start()])
+        pos = match.start()
+        offset = 0
 
         if closest_marker == "![" or closest_marker == "[":
             element = None
 
             # PYTHONTODO: Python doesn't support recursive regexp. I just
             # removed it from the pattern; not sure what it breaks
-            match = re.search(r"\[((?:[^][])*)\]", text)
-            if "]" in text and match:
+            match = None
+            if pos < no_link_text:
+                match = _LINK_TEXT_RE.search(text, pos)
+                if match is None:
+                    no_link_text = pos
+            if match:
                 element = {
-                    "!": text[:1] == "!",
+                    "!": closest_marker == "![",
                     "a": match.group(1),
                 }
 
+                # XXX: the match doesn't have to start at the marker, but
+                # the offset is the length of the match in either case
                 offset = len(match.group())
                 if element["!"]:
                     offset += 1
 
-                remaining_text = text[offset:]
-                remaining_match = re.search(
-                    r"^\([ ]*([^)'\"]*?)(?:[ ]+['\"](.+?)['\"])?[ ]*\)", remaining_text
-                )
-                remaining_match2 = re.search(r"^\s*\[([^\]<]*?)\]", remaining_text)
+                remaining_match = _LINK_URL_RE.match(text, pos + offset)
+                remaining_match2 = _LINK_REF_RE.match(text, pos + offset)
                 if remaining_match is not None:
                     element["»"] = remaining_match.group(1)
-                    try:
-                        element["#"] = remaining_match.group(2)
-                    except IndexError:
-                        pass
+                    element["#"] = remaining_match.group(2)
                     offset += len(remaining_match.group())
                 elif remaining_match2 is not None:
                     element["ref"] = remaining_match2.group(1)
@@ -510,50 +565,54 @@ def MarkDownParseSpanElementsInner(text, markersref):
                     element["»"] = element["»"].replace("&", "&amp;")
                     element["»"] = element["»"].replace("<", "&lt;")
 
+                # the link text can't contain "[", so don't look for it
+                markers_rest = tuple(m for m in markers if m != closest_marker)
+
                 if element.get("!"):
-                    markup += f'<inlinemediaobject><imageobject><imagedata fileref="{element["»"]}"></imagedata></imageobject>'
+                    markup.append(
+                        f'<inlinemediaobject><imageobject><imagedata fileref="{element["»"]}"></imagedata></imageobject>'
+                    )
                     if "a" in element:
-                        markup += "<textobject><phrase>" + element["a"] + "</phrase></textobject>"
-                    markup += "</inlinemediaobject>"
+                        markup.append("<textobject><phrase>" + element["a"] + "</phrase></textobject>")
+                    markup.append("</inlinemediaobject>")
                 elif element.get("ref"):
                     element["a"] = MarkDownParseSpanElementsInner(element["a"], markers_rest)
-                    markup += '<link linkend="' + element["ref"] + '"'
+                    markup.append('<link linkend="' + element["ref"] + '"')
                     if "#" in element:
                         # title attribute not supported
                         pass
-                    markup += ">" + element["a"] + "</link>"
+                    markup.append(">" + element["a"] + "</link>")
                 else:
                     element["a"] = MarkDownParseSpanElementsInner(element["a"], markers_rest)
-                    markup += '<ulink url="' + element.get("»", "") + '"'
+                    markup.append('<ulink url="' + element.get("»", "") + '"')
                     if "#" in element:
                         # title attribute not supported
                         pass
-                    markup += ">" + element["a"] + "</ulink>"
+                    markup.append(">" + element["a"] + "</ulink>")
             else:
-                markup += closest_marker
+                markup.append(closest_marker)
                 if closest_marker == "![":
                     offset = 2
                 else:
                     offset = 1
         elif closest_marker == "`":
-            match = re.search(r"^(`+)([^`]+?)\1(?!`)", text)
+            match = _CODE_RE.match(text, pos)
             if match:
                 element_text = match.group(2)
-                markup += "<literal>" + element_text + "</literal>"
+                markup.append("<literal>" + element_text + "</literal>")
                 offset = len(match.group())
             else:
-                markup += "`"
+                markup.append("`")
                 offset += 1
         else:
             # PYTHONTODO: we handle inline references when parsing docbook
             # so just skip anything we don't handle
-            markup += closest_marker
+            markup.append(closest_marker)
             offset += len(closest_marker)
 
-        if offset > 0:
-            text = text[offset:]
+        pos += offset
 
-    return markup
+    return "".join(markup)
 
 
 def MarkDownParseSpanElements(text):
@@ -572,10 +631,10 @@ def MarkDownOutputDocBook(blocksref, symbol, context):
     blocks = blocksref
 
     for block in blocks:
-        if block["type"] == "paragraph":
-            text = MarkDownParseSpanElements(block["text"])
+        if block.type == "paragraph":
+            text = MarkDownParseSpanElements(block.text)
             if context == "li" and output == "":
-                if block.get("interrupted"):
+                if block.interrupted:
                     output += "\n<para>" + text + "</para>\n"
                 else:
                     output += "<para>" + text + "</para>"
@@ -583,62 +642,62 @@ def MarkDownOutputDocBook(blocksref, symbol, context):
                         output += "\n"
             else:
                 output += "<para>" + text + "</para>\n"
-        elif block["type"] == "heading":
-            title = MarkDownParseSpanElements(block["text"])
-            if block["level"] == 1:
+        elif block.type == "heading":
+            title = MarkDownParseSpanElements(block.text)
+            if block.level == 1:
                 tag = "refsect2"
             else:
                 tag = "refsect3"
 
-            text = MarkDownParseLines(block["lines"], symbol, "heading")
-            if block.get("id"):
-                output += ('<%s id="' % tag) + block["id"] + '">'
+            text = MarkDownParseLines(block.lines, symbol, "heading")
+            if block.id:
+                output += ('<%s id="' % tag) + block.id + '">'
             else:
                 output += "<%s>" % tag
 
             output += "<title>%s</title>%s</%s>\n" % (title, text, tag)
-        elif block["type"] == "li":
+        elif block.type == "li":
             tag = "itemizedlist"
 
-            if block["first"]:
-                if block["ordered"]:
+            if block.first:
+                if block.ordered:
                     tag = "orderedlist"
                 output += "<%s>\n" % tag
 
-            if block.get("interrupted"):
-                block["lines"].append("")
+            if block.interrupted:
+                block.lines.append("")
 
-            text = MarkDownParseLines(block["lines"], symbol, "li")
+            text = MarkDownParseLines(block.lines, symbol, "li")
             output += "<listitem>%s</listitem>\n" % text
 
-            if block["last"]:
-                if block["ordered"]:
+            if block.last:
+                if block.ordered:
                     tag = "orderedlist"
                 output += "</%s>\n" % tag
 
-        elif block["type"] == "quote":
-            text = MarkDownParseLines(block["lines"], symbol, "quote")
+        elif block.type == "quote":
+            text = MarkDownParseLines(block.lines, symbol, "quote")
             output += "<blockquote>\n%s</blockquote>\n" % text
-        elif block["type"] == "code":
+        elif block.type == "code":
             tag = "programlisting"
 
-            if block["language"]:
-                if block["language"] == "plain":
+            if block.language:
+                if block.language == "plain":
                     output += "<informalexample><screen><![CDATA[\n"
                     tag = "screen"
                 else:
-                    output += '<informalexample><programlisting language="%s"><![CDATA[\n' % block["language"]
+                    output += '<informalexample><programlisting language="%s"><![CDATA[\n' % block.language
             else:
                 output += "<informalexample><programlisting><![CDATA[\n"
 
-            for line in block["lines"]:
+            for line in block.lines:
                 output += ReplaceEntities(line, symbol) + "\n"
 
             output += "]]></%s></informalexample>\n" % tag
-        elif block["type"] == "markup":
-            text = ExpandAbbreviations(symbol, block["text"])
+        elif block.type == "markup":
+            text = ExpandAbbreviations(symbol, block.text)
             output += text + "\n"
         else:
-            output += block["text"] + "\n"
+            output += block.text + "\n"
 
     return output
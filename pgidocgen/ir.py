@@ -0,0 +1,198 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+"""An on-disk intermediate representation of a docobj.Module.
+
+The docobj tree gets stored as gzipped JSON, so the generators and stubs
+can run from it without introspecting the namespace again.
+"""
+
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+
+from . import docobj
+from .girdata.summary import ProjectSummary
+from .namespace import get_dependencies, get_namespace_cache_key
+from .repo import Repository
+
+# increase if the format or the docobj attributes change
+IR_VERSION = 3
+
+_TYPES = {
+    cls.__name__: cls
+    for cls in [
+        docobj.Module,
+        docobj.Class,
+        docobj.ClassNode,
+        docobj.PyClass,
+        docobj.PyProperty,
+        docobj.Property,
+        docobj.Signal,
+        docobj.Field,
+        docobj.Function,
+        docobj.Structure,
+        docobj.Union,
+        docobj.Flags,
+        docobj.Constant,
+        docobj.SymbolMapping,
+        docobj.DocInfo,
+        ProjectSummary,
+    ]
+}
+
+
+def _get_state(obj):
+    """Returns a dict of all set attributes, also for __slots__ classes"""
+
+    if isinstance(obj, docobj.DocInfo):
+        # converts all lazy texts
+        return {key: getattr(obj, key) for key in obj.FIELDS}
+    elif hasattr(obj, "__dict__"):
+        return vars(obj)
+
+    state = {}
+    for cls in type(obj).__mro__:
+        for key in getattr(cls, "__slots__", ()):
+            if hasattr(obj, key):
+                state[key] = getattr(obj, key)
+    return state
+
+
+def _encode(obj):
+    if obj is None or isinstance(obj, (str, bool, float)):
+        return obj
+    elif isinstance(obj, int):
+        return int(obj)
+    elif isinstance(obj, list):
+        return [_encode(v) for v in obj]
+    elif isinstance(obj, tuple):
+        return {"@tuple": [_encode(v) for v in obj]}
+    elif isinstance(obj, dict):
+        return {"@dict": [[_encode(k), _encode(v)] for k, v in obj.items()]}
+
+    name = type(obj).__name__
+    if _TYPES.get(name) is not type(obj):
+        raise TypeError("Can't store %r" % obj)
+    data = {"@type": name}
+    for key, value in _get_state(obj).items():
+        data[key] = _encode(value)
+    return data
+
+
+def _decode(data):
+    if isinstance(data, list):
+        return [_decode(v) for v in data]
+    elif not isinstance(data, dict):
+        return data
+    elif "@tuple" in data:
+        return tuple(_decode(v) for v in data["@tuple"])
+    elif "@dict" in data:
+        return {_decode(k): _decode(v) for k, v in data["@dict"]}
+
+    # skip __init__, the attributes are all there
+    cls = _TYPES[data["@type"]]
+    obj = cls.__new__(cls)
+    for key, value in data.items():
+        if key != "@type":
+            setattr(obj, key, _decode(value))
+    return obj
+
+
+def get_module_key(namespace, version, _cache={}):
+    """Returns a key which changes if anything the Module of a namespace
+    depends on changes: the gir files of it and its dependencies, pgi or
+    pgi-docgen besides the generators.
+    """
+
+    nick = "%s-%s" % (namespace, version)
+    if nick not in _cache:
+        deps = []
+        pending = [(namespace, version)]
+        while pending:
+            dep = pending.pop()
+            if dep in deps:
+                continue
+            deps.append(dep)
+            pending.extend(get_dependencies(*dep))
+
+        h = hashlib.sha256()
+        for dep in deps:
+            h.update(("%s\0" % get_namespace_cache_key(*dep)).encode("utf-8"))
+        base = os.path.dirname(os.path.abspath(__file__))
+        for sub in [base, os.path.join(base, "girdata")]:
+            for name in sorted(os.listdir(sub)):
+                if name.endswith(".py"):
+                    with open(os.path.join(sub, name), "rb") as f:
+                        h.update(f.read())
+        _cache[nick] = "%s-%d-%s" % (nick, IR_VERSION, h.hexdigest())
+    return _cache[nick]
+
+
+def get_ir_path(dir_, namespace, version):
+    return os.path.join(dir_, "%s-%s.json.gz" % (namespace, version))
+
+
+def dump_module(module, path, key=""):
+    """Stores the docobj.Module in path, key is passed to load_module()"""
+
+    data = {"version": IR_VERSION, "key": key, "module": _encode(module)}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = path + ".tmp"
+    with gzip.open(temp_path, "wt", encoding="utf-8") as h:
+        json.dump(data, h, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def load_module(path, key=None):
+    """Returns the docobj.Module stored by dump_module().
+
+    Raises OSError or EOFError if it can't be read and ValueError if it
+    was written using another IR version or, if key is not None, for
+    another key.
+    """
+
+    with gzip.open(path, "rt", encoding="utf-8") as h:
+        data = json.load(h)
+
+    if data.get("version") != IR_VERSION:
+        raise ValueError("unsupported IR version: %r" % data.get("version"))
+    if key is not None and data["key"] != key:
+        raise ValueError("IR is outdated")
+    return _decode(data["module"])
+
+
+@contextlib.contextmanager
+def open_module(namespace, version, ir_dir=None, jobs=1):
+    """A context manager returning the docobj.Module for a namespace.
+
+    If ir_dir is given the module gets loaded from there if it is still
+    current, otherwise it gets parsed and stored there for the next time.
+    If parsed, Repository.finish() gets called at the end, as docs get
+    converted while the module is used.
+    """
+
+    if ir_dir is not None:
+        path = get_ir_path(ir_dir, namespace, version)
+        key = get_module_key(namespace, version)
+        try:
+            module = load_module(path, key)
+        except (OSError, EOFError, ValueError):
+            pass
+        else:
+            print("%s-%s: using %s" % (namespace, version, path))
+            yield module
+            return
+
+    repo = Repository(namespace, version)
+    module = repo.parse(jobs)
+    if ir_dir is not None:
+        dump_module(module, path, key)
+    yield module
+    repo.finish()
@@ -10,7 +10,7 @@
 import argparse
 import sys
 
-from . import build, create, stubs, update
+from . import build, cache, create, stubs, update
 
 
 def main(argv=sys.argv):
@@ -21,6 +21,7 @@ def main(argv=sys.argv):
     build.add_parser(subparser)
     stubs.add_parser(subparser)
     update.add_parser(subparser)
+    cache.add_parser(subparser)
 
     args = parser.parse_args(argv[1:])
     if not hasattr(args, "func"):
@@ -7,68 +7,515 @@
 
 import collections
 import ctypes
-import gc
+import hashlib
 import inspect
+import io
 import os
 import re
-import shelve
-from xml.dom import minidom
+from xml.etree import ElementTree
+
+import pgi
 
 from . import util
-from .girdata import load_doc_references
+from .cache import Cache
+from .girdata import get_docref_path, load_doc_references
 from .overrides import parse_override_docs
 
-SHELVE_CACHE = None
+# Bump when the content of the Namespace object changes in a way not
+# covered by _get_code_digest(), so old cache entries don't get used anymore
+CACHE_VERSION = 1
+
+NAMESPACE_CACHE = None
 
 
 def set_cache_prefix_path(path):
-    global SHELVE_CACHE
+    """Sets the directory used for caching parsed namespaces"""
+
+    global NAMESPACE_CACHE
+
+    NAMESPACE_CACHE = Cache(path)
+
 
-    path = os.path.abspath(path)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    SHELVE_CACHE = path
+def _get_code_digest(_cache=[]):
+    """A digest of the code the content of a Namespace instance depends on"""
+
+    if not _cache:
+        h = hashlib.sha256()
+        base = os.path.dirname(os.path.abspath(__file__))
+        for name in ["namespace.py", "overrides.py", "util.py", os.path.join("girdata", "util.py")]:
+            with open(os.path.join(base, name), "rb") as f:
+                h.update(f.read())
+        _cache.append(h.hexdigest())
+    return _cache[0]
+
+
+def get_namespace_cache_key(namespace, version, _cache={}):
+    """Returns a key which changes if anything the Namespace instance
+    depends on changes: the gir file, pgi or pgi-docgen.
+
+    e.g. "Gtk-3.0-0a4b..."
+    """
+
+    name = "%s-%s" % (namespace, version)
+    path = util.get_gir_files()[name]
+
+    stat = os.stat(path)
+    mtime_key = (path, stat.st_mtime_ns, stat.st_size)
+    if _cache.get(name, (None,))[0] != mtime_key:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            h.update(f.read())
+        try:
+            with open(get_docref_path(namespace, version), "rb") as f:
+                h.update(f.read())
+        except IOError:
+            pass
+        h.update(("\0%s\0%d\0%s" % (pgi.__version__, CACHE_VERSION, _get_code_digest())).encode("utf-8"))
+        _cache[name] = (mtime_key, "%s-%s" % (name, h.hexdigest()))
+    return _cache[name][1]
 
 
 def get_namespace(namespace, version, _cache={}):
 
     key = str(namespace + "-" + version)
-    protocol = 3
 
     if key not in _cache:
-        if SHELVE_CACHE:
-            d = shelve.open(SHELVE_CACHE, protocol=protocol)
-            if key in d:
-                _cache[key] = d[key]
-                d.close()
-            else:
-                d.close()
+        if NAMESPACE_CACHE:
+
+            def create():
                 ns = Namespace(namespace, version)
                 # make sure we save a fully populated instance
                 for k, v in list(type(ns).__dict__.items()):
                     if isinstance(v, util.cached_property):
                         getattr(ns, k)
-                d = shelve.open(SHELVE_CACHE, protocol=protocol)
-                d[key] = ns
-                d.close()
-                _cache[key] = ns
+                return ns
+
+            cache_key = get_namespace_cache_key(namespace, version)
+            _cache[key] = NAMESPACE_CACHE.get_or_create(cache_key, create, key)
         else:
             _cache[key] = Namespace(namespace, version)
 
     return _cache[key]
 
 
-def _get_dom(path, _cache={}):
-    # caches the last dom
+@util.cache_calls
+def get_all_dependencies(namespace, version):
+    """A list of (namespace, version) tuples for all transitive
+    dependencies of a namespace.
+    """
+
+    loaded = []
+    to_load = list(get_dependencies(namespace, version))
+    while to_load:
+        key = to_load.pop()
+        if key in loaded:
+            continue
+        loaded.append(key)
+        to_load.extend(get_dependencies(*key))
+
+    return loaded
+
+
+@util.cache_calls
+def get_dependencies(namespace, version):
+    """A list of (namespace, version) tuples for all direct dependencies
+    of a namespace. Only reads the start of the gir file.
+    """
+
+    path = util.get_gir_files()["%s-%s" % (namespace, version)]
+    deps = list(util.parse_gir_header(path).includes)
+
+    # these are not always included, but we need them
+    # for base types
+    if not deps:
+        if namespace not in ("GObject", "GLib"):
+            deps.append(("GObject", "2.0"))
+
+    return deps
+
+
+_CORE_NS = "http://www.gtk.org/introspection/core/1.0"
+_C_NS = "http://www.gtk.org/introspection/c/1.0"
+_GLIB_NS = "http://www.gtk.org/introspection/glib/1.0"
+
+_C_TYPE = "{%s}type" % _C_NS
+_C_IDENTIFIER = "{%s}identifier" % _C_NS
+_GLIB_NAME = "{%s}name" % _GLIB_NS
+_GLIB_TYPE_NAME = "{%s}type-name" % _GLIB_NS
+_GLIB_IS_GTYPE_STRUCT_FOR = "{%s}is-gtype-struct-for" % _GLIB_NS
+
+# function like elements for which we collect the C symbol mapping
+_FUNCTION_TAGS = ("function", "constructor", "method")
+
+# toplevel types for which we collect the C symbol mapping
+_TOPLEVEL_TYPE_TAGS = ("class", "interface", "enumeration", "bitfield", "callback", "union")
+
+# (target, result key), see _parse_docs() for what they mean
+_DOC_TARGETS = [
+    (("glib:signal",), "signals"),
+    (("field",), "fields"),
+    (("property",), "properties"),
+    (("parameter", "glib:signal"), "signal-parameters"),
+    (("parameter", "function-macro"), "parameters"),
+    (("parameter", "function"), "parameters"),
+    (("parameter", "method"), "parameters"),
+    (("parameter", "callback"), "parameters"),
+    (("parameter", "constructor"), "parameters"),
+    (("instance-parameter", "method"), "parameters"),
+    (("return-value", "callback"), "returns"),
+    (("return-value", "method"), "returns"),
+    (("return-value", "function"), "returns"),
+    (("return-value", "constructor"), "returns"),
+    (("return-value", "glib:signal"), "signal-returns"),
+    (("interface",), "all"),
+    (("method",), "all"),
+    (("function",), "all"),
+    (("constant",), "all"),
+    (("record",), "all"),
+    (("enumeration",), "all"),
+    (("member",), "all"),
+    (("callback",), "all"),
+    (("alias",), "all"),
+    (("constructor",), "all"),
+    (("class",), "all"),
+    (("bitfield",), "all"),
+    # vfuncs last, since they replace normal onces in case of name clashes
+    (("virtual-method",), "all"),
+    (("parameter", "virtual-method"), "parameters"),
+    (("instance-parameter", "virtual-method"), "parameters"),
+    (("return-value", "virtual-method"), "returns"),
+]
+
+# {tag: [(target index, required ancestor tag or None, result key)]}
+_DOC_DISPATCH = {}
+for _i, (_target, _result) in enumerate(_DOC_TARGETS):
+    assert len(_target) <= 2
+    _DOC_DISPATCH.setdefault(_target[0], []).append((_i, _target[1] if len(_target) > 1 else None, _result))
+del _i, _target, _result
+
+# elements which need to be looked at when opened, see _handle_start()
+_START_TAGS = frozenset(["record"]) | frozenset(_DOC_DISPATCH)
+
+# elements which need to be looked at when closed, see _handle_end()
+_END_TAGS = (
+    frozenset(["member", "record", "constant"])
+    | frozenset(_FUNCTION_TAGS)
+    | frozenset(_TOPLEVEL_TYPE_TAGS)
+    | frozenset(_DOC_DISPATCH)
+)
+
+
+class _Element(object):
+    """An open element in the GIR while parsing, see _parse_gir()"""
+
+    __slots__ = [
+        "tag",
+        "attrib",
+        "doc",
+        "doc_deprecated",
+        "has_content",
+        "instance_param",
+        "doc_path",
+        "doc_entries",
+    ]
+
+    def __init__(self, tag, attrib):
+        self.tag = tag
+        self.attrib = attrib
+        self.doc = None
+        self.doc_deprecated = None
+        self.has_content = False
+        self.instance_param = None
+        # (key, tags, shadowed), see _get_doc_path()
+        self.doc_path = None
+        # entries in _GirData.doc_elements waiting for the DocEntry
+        self.doc_entries = None
+
+
+class _GirData(object):
+    """All the information we need from a GIR file"""
+
+    def __init__(self):
+        self.private = set()
+        # {tag: [tuple]} of the raw data needed for _parse_types()
+        self.type_elements = collections.defaultdict(list)
+        # [[[result, key, DocEntry, tags, matches]]] matching _DOC_TARGETS
+        self.doc_elements = [[] for t in _DOC_TARGETS]
+
+
+def _get_gir(path, _cache={}):
+    # caches the last parsed gir
     if path in _cache:
         return _cache[path]
     _cache.clear()
-    # reduce peak memory
-    gc.collect()
+    _cache[path] = _parse_gir(path)
+    return _cache[path]
+
+
+def _parse_gir(path):
+    """Parses a GIR file in one streaming pass and returns a _GirData
+    instance.
+
+    Elements get dropped as soon as they are closed, so the whole
+    document is never in memory at once. Everything which can nest is
+    recorded when the element gets opened, so the results are in
+    document order.
+    """
+
     with open(path, "rb") as h:
         data = h.read()
-        data = re.sub(b"(&#x1c;)", b"?", data)
-        _cache[path] = minidom.parseString(data)
-    return _cache[path]
+    data = re.sub(b"(&#x1c;)", b"?", data)
+
+    gir = _GirData()
+    # the prefixes used in the document: {uri: "prefix:"}
+    prefixes = {_CORE_NS: ""}
+    # {"{uri}local": "prefix:local"}
+    tag_names = {}
+    stack = []
+
+    for event, elem in ElementTree.iterparse(io.BytesIO(data), events=("start-ns", "start", "end")):
+        if event == "start":
+            tag = tag_names.get(elem.tag)
+            if tag is None:
+                if elem.tag.startswith("{"):
+                    uri, local = elem.tag[1:].split("}", 1)
+                    tag = prefixes.get(uri, "") + local
+                else:
+                    tag = elem.tag
+                tag_names[elem.tag] = tag
+            stack.append(_Element(tag, elem.attrib))
+            if tag in _START_TAGS:
+                _handle_start(gir, stack)
+        elif event == "end":
+            current = stack[-1]
+            tag = current.tag
+            if tag in _END_TAGS:
+                _handle_end(gir, stack)
+            stack.pop()
+            if stack:
+                parent = stack[-1]
+                if tag == "doc":
+                    if parent.doc is None:
+                        parent.doc = elem.text or ""
+                elif tag == "doc-deprecated":
+                    if parent.doc_deprecated is None:
+                        parent.doc_deprecated = elem.text or ""
+                elif tag == "instance-parameter":
+                    for e in stack:
+                        if e.tag in _FUNCTION_TAGS and e.instance_param is None:
+                            e.instance_param = current.attrib.get("name", "")
+                if tag != "source-position":
+                    parent.has_content = True
+            elem.clear()
+        else:
+            prefix, uri = elem
+            prefixes[uri] = prefix + ":" if prefix else ""
+
+    return gir
+
+
+def _handle_start(gir, stack):
+    """Collects everything needed from the innermost element on the stack
+    right after it got opened.
+    """
+
+    elm = stack[-1]
+    tag = elm.tag
+    attrib = elm.attrib
+
+    # C symbol mapping, see _parse_types()
+    if tag == "record":
+        gir.type_elements[tag].append(
+            (
+                attrib.get(_C_TYPE, ""),
+                bool(int(attrib.get("introspectable") or "1")),
+                attrib.get(_GLIB_IS_GTYPE_STRUCT_FOR, ""),
+                attrib.get("name", ""),
+            )
+        )
+
+    if tag in _DOC_DISPATCH:
+        _handle_doc_start(gir, stack)
+
+
+def _handle_end(gir, stack):
+    """Collects everything needed from the innermost element on the stack
+    right before it gets closed.
+    """
+
+    elm = stack[-1]
+    tag = elm.tag
+    attrib = elm.attrib
+    parent = stack[-2] if len(stack) > 1 else None
+
+    # C symbol mapping, see _parse_types()
+    if tag in _FUNCTION_TAGS:
+        c_name = attrib.get(_C_IDENTIFIER, "")
+        assert c_name
+
+        # glib:boxed toplevel in Farstream-0.1
+        if parent.attrib.get("name", ""):
+            full_name = attrib.get("name", "")
+            for e in reversed(stack[:-1]):
+                name = e.attrib.get("name", "")
+                if not name:
+                    break
+                full_name = name + "." + full_name
+
+            gir.type_elements[tag].append(
+                (
+                    c_name,
+                    attrib.get("name", ""),
+                    full_name,
+                    attrib.get("shadows", ""),
+                    attrib.get("shadowed-by", ""),
+                    bool(int(attrib.get("introspectable") or "1")),
+                    elm.instance_param or "",
+                )
+            )
+    elif tag == "member":
+        c_name = attrib.get(_C_IDENTIFIER, "")
+        assert c_name
+        gir.type_elements[tag].append((c_name, parent.attrib.get("name", ""), attrib.get("name", "")))
+    elif tag in _TOPLEVEL_TYPE_TAGS:
+        if parent.tag == "namespace":
+            gir.type_elements[tag].append(
+                (
+                    attrib.get(_C_TYPE, "") or attrib.get(_GLIB_TYPE_NAME, ""),
+                    bool(int(attrib.get("introspectable") or "1")),
+                    attrib.get("name", ""),
+                )
+            )
+    elif tag == "constant":
+        if parent.tag == "namespace":
+            gir.type_elements[tag].append(
+                (attrib.get(_C_TYPE, "") or attrib.get(_C_IDENTIFIER, ""), attrib.get("name", ""))
+            )
+
+    # if disguised and no record content... not perfect, but
+    # we have no other way
+    if tag == "record":
+        is_gtype_struct = bool(attrib.get(_GLIB_IS_GTYPE_STRUCT_FOR, ""))
+        is_private = attrib.get("name", "").endswith("Private")
+        if is_private and not is_gtype_struct and not elm.has_content:
+            gir.private.add(attrib.get("name", ""))
+
+    if elm.doc_entries is not None:
+        _handle_doc_end(elm)
+
+
+def _get_doc_name(elm):
+    """Returns a string (maybe be empty) or None"""
+
+    attrib = elm.attrib
+
+    # if this entry shadows another one use its name
+    shadows = attrib.get("shadows", "")
+    if shadows:
+        n = shadows
+    else:
+        if "name" in attrib:
+            n = attrib["name"]
+        elif _GLIB_NAME in attrib:
+            n = attrib[_GLIB_NAME]
+        else:
+            return
+
+    if elm.tag == "virtual-method":
+        # pgi/pygobject escape before prefixing
+        n = "do_" + util.escape_identifier(n)
+    elif elm.tag == "member":
+        # enum/flag values
+        n = n.upper()
+
+    return n
+
+
+def _get_doc_path(stack, index):
+    """Returns (key, tags, shadowed) for the element at stack[index].
+
+    key is the dotted Python name, tags are the tag names from the element
+    up to the namespace and shadowed is True if the element or one of its
+    parents gets shadowed by another one. The result gets memoized in the
+    element, so the ancestors are only looked at once.
+    """
+
+    e = stack[index]
+    if e.doc_path is not None:
+        return e.doc_path
+
+    if e.tag == "repository":
+        e.doc_path = ("", (), False)
+        return e.doc_path
+
+    parent_key, parent_tags, parent_shadowed = _get_doc_path(stack, index - 1)
+    parent_tag = stack[index - 1].tag
+    # Tracker-0.16 includes <constant> outside of <namespace>
+    if parent_tag in ("namespace", "repository"):
+        parent_tags = ()
+        parent_shadowed = False
+
+    key = parent_key
+    name = _get_doc_name(e)
+    if name is not None:
+        name = util.escape_parameter(name)
+        key = key + "." + name if key else name
+
+    # this gets shadowed by another entry, bail out
+    shadowed = parent_shadowed or bool(e.attrib.get("shadowed-by", ""))
+
+    e.doc_path = (key, (e.tag,) + parent_tags, shadowed)
+    return e.doc_path
+
+
+def _handle_doc_start(gir, stack):
+    """Sends the innermost element on the stack to all matching doc
+    targets. The docs get filled in by _handle_doc_end().
+    """
+
+    e = stack[-1]
+    key, tags, shadowed = _get_doc_path(stack, len(stack) - 1)
+
+    entries = []
+    for i, needed, result in _DOC_DISPATCH[e.tag]:
+        # for shadowed function docs we save docs anyway since we
+        # can include them in the function docs for the replacement.
+        # This can be helpful since some replacements just reference
+        # the shadowed function, which we don't include.
+        if shadowed:
+            if result == "all":
+                result = "all_shadowed"
+            else:
+                continue
+
+        matches = needed is None or needed in tags
+        entry = [result, key, None, tags, matches]
+        gir.doc_elements[i].append(entry)
+        entries.append(entry)
+
+    e.doc_entries = entries
+
+
+def _handle_doc_end(e):
+    """Fills in the DocEntry for all targets the element was sent to"""
+
+    attrib = e.attrib
+
+    docs = e.doc or ""
+    version = attrib.get("version", "")
+
+    # old gir had the deprecation text in the attribute, new
+    # gir in the <doc-deprecated> tag
+    deprecated = attrib.get("deprecated", "")
+    if deprecated in "01":
+        deprecated = ""
+    deprecated = e.doc_deprecated or deprecated
+
+    deprecated_version = attrib.get("deprecated-version", "")
+
+    new = DocEntry(docs, version, deprecated_version, deprecated)
+    for entry in e.doc_entries:
+        entry[2] = new
 
 
 def fixup_since(text):
@@ -150,17 +597,14 @@ class Namespace(object):
     def _ensure_types(self):
         if self._types is not None:
             return
-        dom = _get_dom(self.path)
+        gir = _get_gir(self.path)
         self._types, self._type_structs, self._shadow_map, self._iparams = _parse_types(
-            dom, self.import_module(), self.namespace
+            gir, self.import_module(), self.namespace
         )
 
     @util.cached_property
     def shared_libraries(self):
-        dom = _get_dom(self.path)
-        namespace_elm = dom.getElementsByTagName("namespace")[0]
-        shared_library = namespace_elm.getAttribute("shared-library")
-        return shared_library.split(",") if shared_library else []
+        return util.parse_gir_header(self.path).shared_libraries
 
     @util.cached_property
     def shadow_map(self):
@@ -189,7 +633,8 @@ class Namespace(object):
 
     @util.cached_property
     def private(self):
-        return _parse_private(_get_dom(self.path), self.namespace)
+        gir = _get_gir(self.path)
+        return set(self.namespace + "." + name for name in gir.private)
 
     @util.cached_property
     def override_docs(self):
@@ -197,7 +642,7 @@ class Namespace(object):
 
     @util.cached_property
     def docs(self):
-        docs = _parse_docs(_get_dom(self.path))
+        docs = _parse_docs(_get_gir(self.path))
         _fixup_all_added_since(docs)
         return docs
 
@@ -238,22 +683,7 @@ class Namespace(object):
         of this namespace.
         """
 
-        dom = _get_dom(self.path)
-
-        # dependencies
-        deps = []
-        for include in dom.getElementsByTagName("include"):
-            name = include.getAttribute("name")
-            version = include.getAttribute("version")
-            deps.append((name, version))
-
-        # these are not always included, but we need them
-        # for base types
-        if not deps:
-            if self.namespace not in ("GObject", "GLib"):
-                deps.append(("GObject", "2.0"))
-
-        return deps
+        return list(get_dependencies(self.namespace, self.version))
 
     @util.cached_property
     def all_dependencies(self):
@@ -261,17 +691,7 @@ class Namespace(object):
         dependencies of this namespace.
         """
 
-        loaded = []
-        to_load = list(self.dependencies)
-        while to_load:
-            key = to_load.pop()
-            if key in loaded:
-                continue
-            sub_ns = get_namespace(*key)
-            loaded.append(key)
-            to_load.extend(sub_ns.dependencies)
-
-        return loaded
+        return list(get_all_dependencies(self.namespace, self.version))
 
     def __repr__(self):
         return "%s(%s, %s)" % (type(self).__name__, self.namespace, self.version)
@@ -329,7 +749,7 @@ def get_base_types():
     }
 
 
-def _parse_types(dom, module, namespace):
+def _parse_types(gir, module, namespace):
     """Create a mapping of various C names to python names"""
 
     type_structs = {}
@@ -355,31 +775,11 @@ def _parse_types(dom, module, namespace):
     # gtk_main -> Gtk.main
     # gtk_dialog_get_response_for_widget ->
     #     Gtk.Dialog.get_response_for_widget
-    elements = dom.getElementsByTagName("function")
-    elements += dom.getElementsByTagName("constructor")
-    elements += dom.getElementsByTagName("method")
+    elements = []
+    for tag in _FUNCTION_TAGS:
+        elements += gir.type_elements[tag]
     for t in elements:
-        shadows = t.getAttribute("shadows")
-        shadowed_by = t.getAttribute("shadowed-by")
-        introspectable = bool(int(t.getAttribute("introspectable") or "1"))
-        local_name = t.getAttribute("name")
-        c_name = t.getAttribute("c:identifier")
-        assert c_name
-
-        ip = t.getElementsByTagName("instance-parameter")
-        instance_param = ip[0].getAttribute("name") if ip else ""
-
-        # Copy escaping from gi: Foo.break -> Foo.break_
-        full_name = local_name
-        parent = t.parentNode
-
-        # glib:boxed toplevel in Farstream-0.1
-        if not parent.getAttribute("name"):
-            continue
-
-        while parent.getAttribute("name"):
-            full_name = parent.getAttribute("name") + "." + full_name
-            parent = parent.parentNode
+        c_name, local_name, full_name, shadows, shadowed_by, introspectable, instance_param = t
 
         if shadows:
             parent_name = full_name.rsplit(".", 1)[0]
@@ -404,33 +804,19 @@ def _parse_types(dom, module, namespace):
     del all_shadows
 
     # enums etc. GTK_SOME_FLAG_FOO -> Gtk.SomeFlag.FOO
-    for t in dom.getElementsByTagName("member"):
-        c_name = t.getAttribute("c:identifier")
-        assert c_name
+    for c_name, class_name, field_name in gir.type_elements["member"]:
         # only match constants
         if c_name != c_name.upper() or "_" not in c_name:
             continue
-        class_name = t.parentNode.getAttribute("name")
-        field_name = t.getAttribute("name").upper()
+        field_name = field_name.upper()
         local_name = namespace + "." + class_name + "." + field_name
         add(c_name, local_name)
 
     # classes
-    elements = dom.getElementsByTagName("class")
-    elements += dom.getElementsByTagName("interface")
-    elements += dom.getElementsByTagName("enumeration")
-    elements += dom.getElementsByTagName("bitfield")
-    elements += dom.getElementsByTagName("callback")
-    elements += dom.getElementsByTagName("union")
-    for t in elements:
-        # only top level
-        if t.parentNode.tagName != "namespace":
-            continue
-
-        c_name = t.getAttribute("c:type")
-        c_name = c_name or t.getAttribute("glib:type-name")
-        introspectable = bool(int(t.getAttribute("introspectable") or "1"))
-
+    elements = []
+    for tag in _TOPLEVEL_TYPE_TAGS:
+        elements += gir.type_elements[tag]
+    for c_name, introspectable, type_name in elements:
         # e.g. GObject _Value__data__union
         if not c_name:
             continue
@@ -439,37 +825,29 @@ def _parse_types(dom, module, namespace):
             skipped.add(c_name)
             continue
 
-        type_name = t.getAttribute("name")
         add(c_name, namespace + "." + type_name)
 
     # cairo_t -> cairo.Context
-    for t in dom.getElementsByTagName("record"):
-        c_name = t.getAttribute("c:type")
+    for c_name, introspectable, type_for, type_name in gir.type_elements["record"]:
         # Gee-0.8 HazardPointer
         if not c_name:
             continue
 
-        introspectable = bool(int(t.getAttribute("introspectable") or "1"))
         if not introspectable:
             skipped.add(c_name)
             continue
 
-        type_for = t.getAttribute("glib:is-gtype-struct-for")
         if type_for:
             type_structs[c_name] = namespace + "." + type_for
 
-        type_name = t.getAttribute("name")
         if type_name.startswith("_"):
             continue
         add(c_name, namespace + "." + type_name)
 
     # G_TIME_SPAN_MINUTE -> GLib.TIME_SPAN_MINUTE
-    for t in dom.getElementsByTagName("constant"):
-        c_name = t.getAttribute("c:type")
-        c_name = c_name or t.getAttribute("c:identifier")
-        if t.parentNode.tagName == "namespace" and c_name:
-            name = namespace + "." + t.getAttribute("name")
-            add(c_name, name)
+    for c_name, name in gir.type_elements["constant"]:
+        if c_name:
+            add(c_name, namespace + "." + name)
 
     # make c defs which are replaced point to the key of the replacement
     # so that: "gdk_threads_add_timeout_full" -> Gdk.threads_add_timeout
@@ -538,31 +916,7 @@ def _parse_types(dom, module, namespace):
     return types, type_structs, shadow_map, instance_params
 
 
-def _parse_private(dom, namespace):
-    private = set()
-
-    def is_empty(node):
-        for child in record.childNodes:
-            if child.nodeType == child.TEXT_NODE:
-                continue
-            if child.tagName == "source-position":
-                continue
-            return False
-        return True
-
-    # if disguised and no record content... not perfect, but
-    # we have no other way
-    for record in dom.getElementsByTagName("record"):
-        is_gtype_struct = bool(record.getAttribute("glib:is-gtype-struct-for"))
-        is_private = record.getAttribute("name").endswith("Private")
-        if is_private and not is_gtype_struct and is_empty(record):
-            name = namespace + "." + record.getAttribute("name")
-            private.add(name)
-
-    return private
-
-
-def _parse_docs(dom):
+def _parse_docs(gir):
     """Parse docs"""
 
     all_ = {}
@@ -587,149 +941,24 @@ def _parse_docs(dom):
         "fields": fields,
     }
 
-    tag_names = [
-        [("glib:signal",), signals],
-        [("field",), fields],
-        [("property",), properties],
-        [("parameter", "glib:signal"), sparas],
-        [("parameter", "function-macro"), parameters],
-        [("parameter", "function"), parameters],
-        [("parameter", "method"), parameters],
-        [("parameter", "callback"), parameters],
-        [("parameter", "constructor"), parameters],
-        [("instance-parameter", "method"), parameters],
-        [("return-value", "callback"), returns],
-        [("return-value", "method"), returns],
-        [("return-value", "function"), returns],
-        [("return-value", "constructor"), returns],
-        [("return-value", "glib:signal"), sreturns],
-        [("interface",), all_],
-        [("method",), all_],
-        [("function",), all_],
-        [("constant",), all_],
-        [("record",), all_],
-        [("enumeration",), all_],
-        [("member",), all_],
-        [("callback",), all_],
-        [("alias",), all_],
-        [("constructor",), all_],
-        [("class",), all_],
-        [("bitfield",), all_],
-        # vfuncs last, since they replace normal onces in case of name clashes
-        [("virtual-method",), all_],
-        [("parameter", "virtual-method"), parameters],
-        [("instance-parameter", "virtual-method"), parameters],
-        [("return-value", "virtual-method"), returns],
-    ]
-
-    def get_child_by_tag(node, tag_name):
-        for sub in node.childNodes:
-            try:
-                if sub.tagName == tag_name:
-                    return sub
-            except AttributeError:
-                continue
-
     path_seen = set()
     path_done = set()
 
-    all_elements = dom.getElementsByTagName("*")
-
-    def get_elements(name):
-        for elm in all_elements:
-            if elm.tagName == name:
-                yield elm
-
-    for target, result in tag_names:
-        tag = target[0]
-        needed = target[1:]
-
-        for e in get_elements(tag):
-            doc_elm = get_child_by_tag(e, "doc")
-            docs = (doc_elm and doc_elm.firstChild.nodeValue) or ""
-            version = e.getAttribute("version")
-
-            # old gir had the deprecation text in the attribute, new
-            # gir in the <doc-deprecated> tag
-            deprecated = e.getAttribute("deprecated")
-            if deprecated in "01":
-                deprecated = ""
-
-            dep_elm = get_child_by_tag(e, "doc-deprecated")
-            dep_elm_string = (dep_elm and dep_elm.firstChild.nodeValue) or ""
-            deprecated = dep_elm_string or deprecated
+    # The docs were collected per target while parsing, apply them in
+    # the order of _DOC_TARGETS so later ones (vfuncs) win
+    for (target, _), entries in zip(_DOC_TARGETS, gir.doc_elements):
+        for result_key, key, new, tags, matches in entries:
+            path_seen.add(tags)
 
-            deprecated_version = e.getAttribute("deprecated-version")
-
-            def get_name(elm):
-                """Returns a string (maybe be empty) or None"""
-
-                # if this entry shadows another one use its name
-                shadows = elm.getAttribute("shadows")
-                if shadows:
-                    n = shadows
-                else:
-                    if elm.hasAttribute("name"):
-                        n = elm.getAttribute("name")
-                    elif elm.hasAttribute("glib:name"):
-                        n = elm.getAttribute("glib:name")
-                    else:
-                        return
-
-                if elm.tagName == "virtual-method":
-                    # pgi/pygobject escape before prefixing
-                    n = "do_" + util.escape_identifier(n)
-                elif elm.tagName == "member":
-                    # enum/flag values
-                    n = n.upper()
-
-                return n
-
-            l = []
-            tags = []
-            current = e
-            name = get_name(current)
-            if name is not None:
-                l.append(name)
-            shadowed = False
-            while current.tagName != "namespace":
-                # this gets shadowed by another entry, bail out
-                if current.getAttribute("shadowed-by"):
-                    shadowed = True
-                tags.append(current.tagName)
-                current = current.parentNode
-                # Tracker-0.16 includes <constant> outside of <namespace>
-                if current.tagName == "repository":
-                    break
-                name = get_name(current)
-                if name is not None:
-                    l.insert(0, name)
-
-            # for shadowed function docs we save docs anyway since we
-            # can include them in the function docs for the replacement.
-            # This can be helpful since some replacements just reference
-            # the shadowed function, which we don't include.
-            if result is all_shadowed:
-                result = all_
-            if shadowed:
-                if result is all_:
-                    result = all_shadowed
-                else:
-                    continue
-
-            path_seen.add(tuple(tags))
-
-            if any(a for a in needed if a not in tags):
+            if not matches:
                 continue
 
-            path_done.add(tuple(tags))
-
-            key = ".".join(map(util.escape_parameter, l))
+            path_done.add(tags)
 
-            if tag in ("method", "constructor"):
-                assert len(l) > 2
+            if target[0] in ("method", "constructor"):
+                assert key.count(".") > 1
 
-            new = DocEntry(docs, version, deprecated_version, deprecated)
+            result = all_docs[result_key]
             # Atspi-2.0 has some things declared twice, so
             # don't be too strict here.
 
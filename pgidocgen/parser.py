@@ -7,9 +7,9 @@
 # version 2.1 of the License, or (at your option) any later version.
 
 import re
+import weakref
 from xml.sax.saxutils import escape
 
-from bs4 import BeautifulSoup, Tag
 from lxml import etree
 
 from . import util
@@ -17,50 +17,61 @@ from .docbook_escape import docbook_escape
 from .gtkdoc import ConvertMarkDown
 from .util import escape_rest, force_unindent
 
-_scanner = re.Scanner(  # type: ignore[attr-defined]
-    [
-        (r"\*?@[A-Za-z0-9_]+", lambda scanner, token: ("PARAM", token)),
-        (
-            r"[#%]?[A-Za-z0-9_:\-]+\.[A-Za-z0-9_:\-]+\(\)",
-            lambda scanner, token: ("VFUNC", token),
-        ),
-        (
-            r"[#%]?[A-Za-z0-9_:\-]+\.[A-Za-z0-9_:\-]+",
-            lambda scanner, token: ("FIELD", token),
-        ),
-        (
-            r"[#%]?[A-Za-z_]+[A-Za-z0-9_]*::[A-Za-z\-]+[A-Za-z0-9\-_]*",
-            lambda scanner, token: ("FULLSIG", token),
-        ),
-        (r"::[A-Za-z\-]+[A-Za-z0-9\-_]*", lambda scanner, token: ("SIG", token)),
-        (
-            r"[#%]?[A-Za-z_]+[A-Za-z0-9_]*:[A-Za-z\-]+[A-Za-z0-9\-_]*",
-            lambda scanner, token: ("FULLPROP", token),
-        ),
-        (r":[A-Za-z\-]+[A-Za-z0-9\-_]*", lambda scanner, token: ("PROP", token)),
-        (r"[#%]?[A-Za-z0-9_]+\**", lambda scanner, token: ("ID", token)),
-        (r"\s+", lambda scanner, token: ("SPACE", token)),
-        (r".", lambda scanner, token: ("OTHER", token)),
-    ]
+# Tokens in order of priority, the first one matching at a position wins.
+# Text which can't start any of the other tokens is skipped as a whole.
+_TOKEN_RE = re.compile(
+    "|".join(
+        "(?P<%s>%s)" % t
+        for t in [
+            ("TEXT", r"[^A-Za-z0-9_#%@*:\-]+"),
+            ("PARAM", r"\*?@[A-Za-z0-9_]+"),
+            ("VFUNC", r"[#%]?[A-Za-z0-9_:\-]+\.[A-Za-z0-9_:\-]+\(\)"),
+            ("FIELD", r"[#%]?[A-Za-z0-9_:\-]+\.[A-Za-z0-9_:\-]+"),
+            ("FULLSIG", r"[#%]?[A-Za-z_]+[A-Za-z0-9_]*::[A-Za-z\-]+[A-Za-z0-9\-_]*"),
+            ("SIG", r"::[A-Za-z\-]+[A-Za-z0-9\-_]*"),
+            ("FULLPROP", r"[#%]?[A-Za-z_]+[A-Za-z0-9_]*:[A-Za-z\-]+[A-Za-z0-9\-_]*"),
+            ("PROP", r":[A-Za-z\-]+[A-Za-z0-9\-_]*"),
+            ("ID", r"[#%]?[A-Za-z0-9_]+\**"),
+            ("OTHER", r"."),
+        ]
+    )
 )
 
 
-def _handle_data(repo, current_type, current_func, d):
-    global _scanner
+class _Resolver(object):
+    """Memoizes identifier lookups for one repository"""
+
+    def __init__(self, repo):
+        self._repo = repo
+        self._py_ids = {}
+        self._id_refs = {}
+
+    def lookup_py_id(self, c_id):
+        try:
+            return self._py_ids[c_id]
+        except KeyError:
+            py_id = self._py_ids[c_id] = self._repo.lookup_py_id(c_id)
+            return py_id
 
-    results, remainder = _scanner.scan(d)
-    assert not remainder, repr(remainder)
+    def id_ref(self, token):
+        """Returns the reST for a possible identifier reference or token
+        itself if it isn't one
+        """
 
-    def id_ref(token):
-        # possible identifier reference
+        try:
+            return self._id_refs[token]
+        except KeyError:
+            result = self._id_refs[token] = self._id_ref(token)
+            return result
 
+    def _id_ref(self, token):
         # strip pointer
         sub = token.rstrip("*")
 
         if sub.startswith(("#", "%")):
             sub = sub[1:]
 
-        pytype = repo.lookup_py_id(sub)
+        pytype = self.lookup_py_id(sub)
 
         if pytype is not None:
             return ":obj:`%s`" % pytype
@@ -69,25 +80,75 @@ def _handle_data(repo, current_type, current_func, d):
                 # if we are sure it's a reference and it ends with 's'
                 # like "a list of #GtkWindows", we also try "#GtkWindow"
                 sub = token[1:-1]
-                pytype = repo.lookup_py_id(sub)
+                pytype = self.lookup_py_id(sub)
                 if pytype is not None:
                     assert "." in pytype
                     return ":obj:`%s <%s>`" % (pytype + "s", pytype)
             else:
                 # also try to add "s", GdkFrameTiming(s)
                 sub = token[1:] + "s"
-                pytype = repo.lookup_py_id(sub)
+                pytype = self.lookup_py_id(sub)
                 if pytype is not None:
                     py_no_s = pytype[:-1] if pytype[-1] == "s" else pytype
                     return ":obj:`%s <%s>`" % (py_no_s, pytype)
 
         return token
 
+
+_resolvers = weakref.WeakKeyDictionary()
+
+
+def _get_resolver(repo):
+    try:
+        return _resolvers[repo]
+    except KeyError:
+        resolver = _resolvers[repo] = _Resolver(repo)
+        return resolver
+
+
+def _handle_data(repo, current_type, current_func, d):
+    resolver = _get_resolver(repo)
+    lookup_py_id = resolver.lookup_py_id
+    id_ref = resolver.id_ref
+
     out = []
+    # unchanged tokens since the last changed one, get escaped together
+    run = []
     need_space_at_start = False
-    for type_, token in results:
-        orig_token = token
-        if type_ == "PARAM":
+
+    def add(token, changed):
+        nonlocal need_space_at_start
+
+        # insert a space for the previous one
+        if need_space_at_start:
+            if not token:
+                pass
+            else:
+                if not token.startswith((" ", "\\", ",", ".", ":", "-", "\n", ")")):
+                    if changed:
+                        token = " " + token
+                    else:
+                        token = "\\" + token
+                need_space_at_start = False
+
+        if changed and token and escape_rest(token[-1]) != token[-1]:
+            # something changed, we have to make sure that
+            # the previous and next character is a space so
+            # docutils doesn't get confused wit references
+            need_space_at_start = True
+
+        out.append(token)
+
+    for match in _TOKEN_RE.finditer(d):
+        type_ = match.lastgroup
+        token = orig_token = match.group()
+
+        if type_ == "TEXT" or type_ == "OTHER":
+            run.append(token)
+            continue
+        elif type_ == "ID":
+            token = id_ref(token)
+        elif type_ == "PARAM":
             token = token.lstrip("*")
             # paremeter reference
             assert token[0] == "@"
@@ -110,7 +171,7 @@ def _handle_data(repo, current_type, current_func, d):
             pytype = repo.lookup_py_id_for_type_struct(class_id)
             if pytype is None:
                 # fall back to the class, for #GObject.constructed()
-                pytype = repo.lookup_py_id(class_id)
+                pytype = lookup_py_id(class_id)
             if pytype is not None:
                 token = ":obj:`%s.do_%s`\\()" % (pytype, field)
         elif type_ == "FIELD":
@@ -118,7 +179,7 @@ def _handle_data(repo, current_type, current_func, d):
             if field.startswith(("#", "%")):
                 field = field[1:]
             c_id, field_name = field.split(".", 1)
-            objtype = repo.lookup_py_id(c_id)
+            objtype = lookup_py_id(c_id)
             if objtype is not None:
                 token = ":ref:`%s.%s <%s.fields>`" % (objtype, field_name, objtype)
         elif type_ == "FULLPROP" or type_ == "PROP":
@@ -129,7 +190,7 @@ def _handle_data(repo, current_type, current_func, d):
             if not c_id:
                 py_id = current_type
             else:
-                py_id = repo.lookup_py_id(c_id)
+                py_id = lookup_py_id(c_id)
 
             if py_id and "_" not in prop_name:
                 prop_attr = prop_name.replace("-", "_")
@@ -153,7 +214,7 @@ def _handle_data(repo, current_type, current_func, d):
             if not c_id:
                 py_id = current_type
             else:
-                py_id = repo.lookup_py_id(c_id)
+                py_id = lookup_py_id(c_id)
 
             if py_id and "_" not in sig_name and not is_type_struct:
                 sig_attr = sig_name.replace("-", "_")
@@ -164,34 +225,19 @@ def _handle_data(repo, current_type, current_func, d):
 
                 rst_target = py_id + ".signals." + sig_attr
                 token += ":py:func:`::%s<%s>`" % (sig_name, rst_target)
-        elif type_ == "ID":
-            token = id_ref(token)
 
-        changed = orig_token != token
+        if orig_token == token:
+            run.append(token)
+            continue
 
-        # nothing changed, escape
-        if not changed:
-            token = escape_rest(token)
+        if run:
+            # nothing changed, escape
+            add(escape_rest("".join(run)), False)
+            del run[:]
+        add(token, True)
 
-        # insert a space for the previous one
-        if need_space_at_start:
-            if not token:
-                pass
-            else:
-                if not token.startswith((" ", "\\", ",", ".", ":", "-", "\n", ")")):
-                    if changed:
-                        token = " " + token
-                    else:
-                        token = "\\" + token
-                need_space_at_start = False
-
-        if changed and token and escape_rest(token[-1]) != token[-1]:
-            # something changed, we have to make sure that
-            # the previous and next character is a space so
-            # docutils doesn't get confused wit references
-            need_space_at_start = True
-
-        out.append(token)
+    if run:
+        add(escape_rest("".join(run)), False)
 
     return "".join(out)
 
@@ -232,6 +278,59 @@ def docref_to_pyref(repo, ref, text):
     return None
 
 
+# whitespace as defined by BeautifulSoup, which was used here before
+_ASCII_SPACES = dict.fromkeys(map(ord, "\x20\x0a\x09\x0c\x0d"))
+
+
+def _collapse_space(text):
+    """Replaces whitespace only text with a single newline or space"""
+
+    if text.translate(_ASCII_SPACES):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def _get_name(element):
+    """Returns the tag name without namespace or prefix"""
+
+    return element.tag.rsplit("}", 1)[-1].rsplit(":", 1)[-1]
+
+
+def _iter_contents(element):
+    """Yields the child elements and the text between them in document
+    order. Comments and processing instructions are returned as text.
+    """
+
+    if element.text:
+        yield _collapse_space(element.text)
+    for child in element:
+        tag = child.tag
+        if isinstance(tag, str):
+            yield child
+        elif tag is etree.ProcessingInstruction:
+            yield "%s %s" % (child.target, child.text) if child.text else child.target
+        elif child.text:
+            yield _collapse_space(child.text)
+        if child.tail:
+            yield _collapse_space(child.tail)
+
+
+def _get_text(element):
+    """Returns all text contained in element, excluding comments and
+    processing instructions
+    """
+
+    parts = []
+    if element.text:
+        parts.append(_collapse_space(element.text))
+    for child in element:
+        if isinstance(child.tag, str):
+            parts.append(_get_text(child))
+        if child.tail:
+            parts.append(_collapse_space(child.tail))
+    return "".join(parts)
+
+
 def _handle_xml(repo, current_type, current_func, out, item):
     def handle_next(out, item):
         return _handle_xml(repo, current_type, current_func, out, item)
@@ -239,16 +338,18 @@ def _handle_xml(repo, current_type, current_func, out, item):
     def handle_data(text):
         return _handle_data(repo, current_type, current_func, text)
 
-    if isinstance(item, Tag):
-        item_text = item.getText().strip()
-        if item.name == "literal" or item.name == "type":
-            if item.text:
+    if not isinstance(item, str):
+        name = _get_name(item)
+        text = _get_text(item)
+        item_text = text.strip()
+        if name == "literal" or name == "type":
+            if text:
                 # docutils doesn't like empty literals..
-                out.append("``%s``" % item.text)
-        elif item.name == "itemizedlist":
+                out.append("``%s``" % text)
+        elif name == "itemizedlist":
             lines = []
-            for item in item.contents:
-                if not isinstance(item, Tag):
+            for item in _iter_contents(item):
+                if isinstance(item, str):
                     continue
                 other_out = []
                 handle_next(other_out, item)
@@ -261,9 +362,9 @@ def _handle_xml(repo, current_type, current_func, out, item):
                         data += "  " + line + "\n"
                 lines.append(data.rstrip())
             out.append("\n" + "\n".join(lines) + "\n")
-        elif item.name == "ulink":
+        elif name == "ulink":
             out.append("`%s <%s>`__" % (item_text, item.get("url", "")))
-        elif item.name == "link":
+        elif name == "link":
             lines = []
             linked = item.get("linkend", "")
             if not linked:
@@ -280,7 +381,7 @@ def _handle_xml(repo, current_type, current_func, out, item):
                         lines.append("'%s [%s]'" % (item_text, linked))
                         repo.missed_links += 1
             out.extend(lines)
-        elif item.name == "programlisting" or item.name == "screen":
+        elif name == "programlisting" or name == "screen":
             if not item_text.count("\n"):
                 out.append("``%s``" % item_text)
             else:
@@ -290,11 +391,11 @@ def _handle_xml(repo, current_type, current_func, out, item):
                     util.indent(util.unindent(item_text, ignore_first_line=True)),
                 )
                 out.append(code)
-        elif item.name == "para":
-            for item in item.contents:
+        elif name == "para":
+            for item in _iter_contents(item):
                 handle_next(out, item)
             out.append("\n")
-        elif item.name == "title":
+        elif name == "title":
             # fake a title by creating a "Definition List". It can contain
             # inline markup and is bold in the default theme. Only restriction
             # is it doesn't allow newlines, but we can live with that for
@@ -302,24 +403,24 @@ def _handle_xml(repo, current_type, current_func, out, item):
             title_text = " ".join(handle_data(item_text).splitlines())
             code = "\n%s\n    ..\n        .\n\n" % title_text
             out.append(code)
-        elif item.name == "keycombo":
+        elif name == "keycombo":
             subs = []
-            for sub in item.contents:
-                if not isinstance(sub, Tag):
+            for sub in _iter_contents(item):
+                if isinstance(sub, str):
                     continue
-                subs.append(handle_data(sub.getText().strip()))
+                subs.append(handle_data(_get_text(sub).strip()))
             out.append(" + ".join(subs))
-        elif item.name == "varlistentry":
+        elif name == "varlistentry":
             terms = []
             listitem = None
-            for sub in item.contents:
-                if not isinstance(sub, Tag):
+            for sub in _iter_contents(item):
+                if isinstance(sub, str):
                     continue
 
-                if sub.name == "term":
-                    terms.append(sub.getText().strip())
-                elif sub.name == "listitem":
-                    listitem = sub.getText().strip()
+                if _get_name(sub) == "term":
+                    terms.append(_get_text(sub).strip())
+                elif _get_name(sub) == "listitem":
+                    listitem = _get_text(sub).strip()
                 else:
                     assert 0
 
@@ -337,13 +438,13 @@ def _handle_xml(repo, current_type, current_func, out, item):
             out.append("\n")
             out.extend(lines)
         else:
-            for sub in item.contents:
+            for sub in _iter_contents(item):
                 handle_next(out, sub)
     else:
         if not out or out[-1].endswith("\n"):
-            data = force_unindent(item.string, ignore_first_line=False)
+            data = force_unindent(item, ignore_first_line=False)
         else:
-            data = force_unindent(item.string, ignore_first_line=True)
+            data = force_unindent(item, ignore_first_line=True)
         out.append(handle_data(data))
 
 
@@ -373,25 +474,75 @@ def _docstring_to_docbook(docstring):
 
 def _docbook_to_rest(repo, docbook, current_type, current_func):
     dummy = "<dummy>" + docbook + "</dummy>"
-    dummy = etree.tostring(etree.fromstring(dummy, parser=etree.XMLParser(recover=True)))
-    soup = BeautifulSoup(dummy, "xml")
+    root = etree.fromstring(dummy, parser=etree.XMLParser(recover=True))
 
     out = []
-    for item in soup.contents:
-        _handle_xml(repo, current_type, current_func, out, item)
+    _handle_xml(repo, current_type, current_func, out, root)
+
+    return _join_rest(out)
+
+
+# Anything which docbook_escape(), ConvertMarkDown() or the XML parser
+# would change: tags, entities, links, inline code, headings, lists,
+# characters not allowed in XML and line endings which get normalized
+_MARKUP = re.compile(
+    r"[<>&\[`\x00-\x08\x0b-\x1f\ud800-\udfff\ufffe\uffff]"
+    r"|^(?:#|[ ]*[*+-][ ]|[ ]*\d+\.[ ]|[=-]{4})",
+    flags=re.MULTILINE,
+)
+
+
+def is_plain_docstring(docstring):
+    """Returns True if the docstring contains no markup besides references
+    to symbols and can take the fast path in docstring_to_rest()
+    """
+
+    return _MARKUP.search(docstring) is None
+
 
+def _plain_to_rest(repo, docstring, current_type, current_func):
+    """Like _docbook_to_rest(_docstring_to_docbook(docstring)) but only for
+    docstrings for which is_plain_docstring() returns True.
+
+    ConvertMarkDown() would only split them into paragraphs at blank lines,
+    so do that and skip the markup stages.
+    """
+
+    paras = []
+    lines = []
+    for line in docstring.split("\n"):
+        if line.strip():
+            lines.append(line)
+        elif lines:
+            paras.append("\n".join(lines))
+            lines = []
+    if lines:
+        paras.append("\n".join(lines))
+
+    out = []
+    for para in paras:
+        # <para>text</para>\n
+        _handle_xml(repo, current_type, current_func, out, para)
+        out.append("\n")
+        _handle_xml(repo, current_type, current_func, out, "\n")
+
+    return _join_rest(out)
+
+
+def _join_rest(out):
     # make sure to insert spaces between special reST chars
-    rst = ""
-    while out:
-        c = out.pop(0)
-        if rst and c:
-            last = rst[-1]
-            first = c[0]
-            if escape_rest(last) != last and escape_rest(first) != first:
-                rst += " "
-        rst += c
+    parts = []
+    last = ""
+    for c in out:
+        if not c:
+            continue
+        first = c[0]
+        if last and escape_rest(last) != last and escape_rest(first) != first:
+            parts.append(" ")
+        parts.append(c)
+        last = c[-1]
 
-    return rst
+    return "".join(parts)
 
 
 def docstring_to_rest(repo, docstring, current_type=None, current_func=None):
@@ -421,19 +572,25 @@ def docstring_to_rest(repo, docstring, current_type=None, current_func=None):
         assert current_func.count(".") in (1, 2)
 
     def esc_xml(text):
+        # nothing escape() would change, so no need to check
+        if "<" not in text and ">" not in text and "&" not in text:
+            return text
         # in case it's not valid xml, assume markdown and escape
         try:
-            etree.tostring(etree.fromstring("<dummy>%s</dummy>" % text.replace("&nbsp;", "&#160;")))
+            etree.fromstring("<dummy>%s</dummy>" % text.replace("&nbsp;", "&#160;"))
         except etree.XMLSyntaxError:
             text = escape(text)
         return text
 
-    # skip inline code when escaping xml
-    reg = re.compile(r"(\|\[.*?\]\|)", flags=re.MULTILINE | re.DOTALL)
-    docstring = "".join([p if reg.match(p) else esc_xml(p) for p in reg.split(docstring)])
+    if is_plain_docstring(docstring):
+        rst = _plain_to_rest(repo, docstring, current_type, current_func)
+    else:
+        # skip inline code when escaping xml
+        reg = re.compile(r"(\|\[.*?\]\|)", flags=re.MULTILINE | re.DOTALL)
+        docstring = "".join([p if reg.match(p) else esc_xml(p) for p in reg.split(docstring)])
 
-    docbook = _docstring_to_docbook(docstring)
-    rst = _docbook_to_rest(repo, docbook, current_type, current_func)
+        docbook = _docstring_to_docbook(docstring)
+        rst = _docbook_to_rest(repo, docbook, current_type, current_func)
 
     if not docstring.endswith("\n"):
         rst = rst.rstrip("\n")
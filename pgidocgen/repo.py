@@ -6,17 +6,337 @@
 # License as published by the Free Software Foundation; either
 # version 2.1 of the License, or (at your option) any later version.
 
+import hashlib
+import multiprocessing
+import os
+
 import jinja2
+from lxml import etree
 
+from . import namespace as namespace_
 from .docobj import Module
-from .namespace import get_namespace
-from .parser import docstring_to_rest
+from .namespace import get_all_dependencies, get_namespace, get_namespace_cache_key
+from .parser import docstring_to_rest, is_plain_docstring
+from .util import get_gir_files
+
+
+class LookupIndex(object):
+    """The lookup tables of multiple namespaces merged into one.
+
+    If a key is contained in multiple namespaces the first one wins, like
+    when asking each namespace in order.
+    """
+
+    def __init__(self, namespaces):
+        def merge(get_mapping):
+            merged = {}
+            for ns in reversed(namespaces):
+                merged.update(get_mapping(ns))
+            return merged
+
+        self.types = merge(lambda ns: ns.types)
+        self.type_structs = merge(lambda ns: ns.type_structs)
+        self.instance_params = merge(lambda ns: ns.instance_params)
+        self.shadow_map = merge(lambda ns: ns.shadow_map)
+        self.override_docs = merge(lambda ns: ns.override_docs)
+        self.doc_references = merge(lambda ns: ns.doc_references)
+        self.docs = {}
+        for type_ in namespaces[0].docs:
+            self.docs[type_] = merge(lambda ns: ns.docs[type_])
+        self.private = set()
+        for ns in namespaces:
+            self.private.update(ns.private)
+
+
+def get_lookup_index(namespaces, cached=False):
+    """Returns a LookupIndex for the namespaces.
+
+    If cached is True and the namespace cache is enabled the index gets
+    stored there as well. Note that loading it is usually slower than
+    merging the already loaded namespaces again.
+    """
+
+    cache = namespace_.NAMESPACE_CACHE
+    if not cached or not cache:
+        return LookupIndex(namespaces)
+
+    keys = [get_namespace_cache_key(ns.namespace, ns.version) for ns in namespaces]
+    return cache.get_or_create(_get_index_key(keys), lambda: LookupIndex(namespaces))
+
+
+class FrozenRepository(object):
+    """The lookups of a Repository docstring_to_rest() needs, using only
+    a LookupIndex. Can be pickled, for converting docstrings in other
+    processes.
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self.missed_links = 0
+
+    def lookup_py_id(self, c_id, shadowed=True):
+        if shadowed:
+            c_id = self._index.shadow_map.get(c_id, c_id)
+        py_id = self._index.types.get(c_id)
+        if py_id:
+            return py_id[0]
+
+    def lookup_gtkdoc_ref(self, doc_ref):
+        if doc_ref in self._index.doc_references:
+            assert self.lookup_py_id(doc_ref) is None
+            return self._index.doc_references[doc_ref]
+
+    def lookup_py_id_for_type_struct(self, struct_c_id):
+        return self._index.type_structs.get(struct_c_id)
+
+    def lookup_instance_param(self, py_id):
+        return self._index.instance_params.get(py_id)
+
+
+def _guess_doc_context(type_, key, docstring):
+    """Returns the (current_type, current_func) docobj most likely passes
+    to lookup_docs() for an entry of Namespace.docs, or None
+    """
+
+    parent = key.rsplit(".", 1)[0]
+    if type_ in ("parameters", "signal-parameters", "returns", "signal-returns"):
+        # see FuncSignature.to_rest_listing()
+        func = key if type_.endswith("returns") else parent
+        if func.count(".") == 2:
+            return func.rsplit(".", 1)[0], func
+        elif func.count(".") == 1:
+            return None, func
+    elif type_ in ("properties", "signals", "fields"):
+        if parent.count(".") == 1:
+            return parent, None
+    elif type_ in ("all", "all_shadowed"):
+        name = key.rsplit(".", 1)[-1]
+        if name.isupper():
+            # constants and enum/flags values
+            return None, None
+        elif key.count(".") == 2:
+            # methods
+            return parent, key
+        elif key.count(".") == 1:
+            # functions only take parameters, types are the rest
+            if "@" in docstring:
+                return None, key
+            return key, None
+
+
+_worker_repo = None
+
+
+def _init_worker(repo):
+    global _worker_repo
+
+    _worker_repo = repo
+
+
+def _convert_in_worker(args):
+    repo = _worker_repo
+    before = repo.missed_links
+    rst = docstring_to_rest(repo, *args)
+    return rst, repo.missed_links - before
+
+
+def _get_converter_digest(_cache=[]):
+    """A digest of everything besides the lookup tables that can change
+    the output of docstring_to_rest()
+    """
+
+    if not _cache:
+        h = hashlib.sha256()
+        h.update(("%s\0" % (etree.LXML_VERSION,)).encode("utf-8"))
+        base = os.path.dirname(os.path.abspath(__file__))
+        for name in ["parser.py", "gtkdoc.py", "docbook_escape.py", "util.py"]:
+            with open(os.path.join(base, name), "rb") as f:
+                h.update(f.read())
+        _cache.append(h.hexdigest())
+    return _cache[0]
+
+
+def _get_index_key(keys):
+    """The namespace cache key of the LookupIndex of the namespaces with
+    the passed namespace cache keys
+    """
+
+    digest = hashlib.sha256("\0".join(keys).encode("utf-8")).hexdigest()
+    return "%s-index-%s" % (keys[0], digest)
+
+
+def _get_rest_key(keys):
+    """The namespace cache key of the RestCache results of the namespaces
+    with the passed namespace cache keys
+    """
+
+    digest = hashlib.sha256("\0".join(keys + [_get_converter_digest()]).encode("utf-8")).hexdigest()
+    return "%s-rest-%s" % (keys[0], digest)
+
+
+def _get_class_manifest_key(namespace, version):
+    """The namespace cache key of the class manifests of a namespace, see
+    Repository.save_class_manifests()
+    """
+
+    keys = [get_namespace_cache_key(namespace, version)]
+    keys.extend(get_namespace_cache_key(*dep) for dep in get_all_dependencies(namespace, version))
+    h = hashlib.sha256("\0".join(keys).encode("utf-8"))
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in ["docobj.py", "util.py"]:
+        with open(os.path.join(base, name), "rb") as f:
+            h.update(f.read())
+    return "%s-classes-%s" % (keys[0], h.hexdigest())
+
+
+def is_current_cache_key(key, _cache={}):
+    """If the namespace cache key is one a namespace or a Repository would
+    use with the current gir files and versions. Everything else is
+    outdated and never used again.
+    """
+
+    name = "-".join(key.split("-", 2)[:2])
+    if name not in _cache:
+        current = set()
+        if name in get_gir_files():
+            nick = tuple(name.split("-", 1))
+            current.add(get_namespace_cache_key(*nick))
+            try:
+                keys = [get_namespace_cache_key(*dep) for dep in [nick] + get_all_dependencies(*nick)]
+            except KeyError:
+                # a dependency is missing, so nothing derived can be current
+                pass
+            else:
+                current.update([_get_index_key(keys), _get_rest_key(keys), _get_class_manifest_key(*nick)])
+        _cache[name] = current
+    return key in _cache[name]
+
+
+class RestCache(object):
+    """Memoizes docstring_to_rest() results for one repository and,
+    if the namespace cache is enabled, stores them there between runs.
+
+    The cache key includes the keys of all namespaces the lookup tables
+    are made of and the converter itself, so a changed gir file, pgi or
+    pgi-docgen results in a new one.
+    """
+
+    def __init__(self, namespaces):
+        self.hits = 0
+        self.misses = 0
+        # converted docstrings which took the fast path for plain text
+        self.plain = 0
+        # converted by prefill()
+        self.prefilled = 0
+        self._changed = False
+        self._cache = namespace_.NAMESPACE_CACHE
+        self._key = None
+        self._results = {}
+
+        if self._cache:
+            keys = [get_namespace_cache_key(ns.namespace, ns.version) for ns in namespaces]
+            self._key = _get_rest_key(keys)
+            try:
+                self._results = self._cache.get(self._key)
+            except KeyError:
+                pass
+
+    @staticmethod
+    def _get_key(docstring, current_type, current_func):
+        # The current type is only used for properties and signals without
+        # a type (":foo", "::foo") and the current function only for
+        # parameters ("@foo"), so leave them out if they can't matter.
+        # Entities could expand to both.
+        if "&" not in docstring:
+            if ":" not in docstring:
+                current_type = None
+            if "@" not in docstring:
+                current_func = None
+
+        return hashlib.sha1(
+            ("%s\0%s\0%s" % (docstring, current_type, current_func)).encode("utf-8", "surrogatepass")
+        ).digest()
+
+    def convert(self, repo, docstring, current_type=None, current_func=None):
+        """Like docstring_to_rest()"""
+
+        key = self._get_key(docstring, current_type, current_func)
+
+        if key in self._results:
+            self.hits += 1
+            rst, missed_links = self._results[key]
+            # the links are counted while converting, so replay them
+            repo.missed_links += missed_links
+            return rst
+
+        self.misses += 1
+        if is_plain_docstring(docstring):
+            self.plain += 1
+        before = repo.missed_links
+        rst = docstring_to_rest(repo, docstring, current_type, current_func)
+        self._results[key] = (rst, repo.missed_links - before)
+        self._changed = True
+        return rst
+
+    def prefill(self, repo, requests, jobs):
+        """Converts the (docstring, current_type, current_func) requests
+        not converted yet using a pool of jobs processes.
+
+        repo has to be picklable, like FrozenRepository.
+        """
+
+        todo = {}
+        for docstring, current_type, current_func in requests:
+            key = self._get_key(docstring, current_type, current_func)
+            if key not in self._results:
+                todo[key] = (docstring, current_type, current_func)
+
+        if not todo:
+            return
+
+        keys = list(todo.keys())
+        with multiprocessing.Pool(jobs, _init_worker, (repo,)) as pool:
+            results = pool.map(_convert_in_worker, [todo[k] for k in keys], chunksize=64)
+
+        for key, result in zip(keys, results):
+            self._results[key] = result
+            if is_plain_docstring(todo[key][0]):
+                self.plain += 1
+        self.prefilled += len(keys)
+        self._changed = True
+
+    def save(self):
+        """Stores new results in the namespace cache, if enabled"""
+
+        if self._cache and self._changed:
+            self._cache.set(self._key, self._results)
+            self._changed = False
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        converted = self.misses + self.prefilled
+        return "%d hits, %d misses (%.0f%% hit rate), converted %d plain, %d with markup, %d in advance" % (
+            self.hits,
+            self.misses,
+            rate,
+            self.plain,
+            converted - self.plain,
+            self.prefilled,
+        )
 
 
 class Repository(object):
     """Produces and provides information for documentation objects"""
 
-    def __init__(self, namespace, version):
+    def __init__(self, namespace, version, merged=True, cache_index=False):
+        """If merged is False all lookups go through the namespaces one by
+        one instead of using a merged index. Useful for verification.
+
+        If cache_index is True the merged index is stored in the
+        namespace cache.
+        """
+
         self.namespace = namespace
         self.version = version
         self.missed_links = 0
@@ -25,26 +345,119 @@ class Repository(object):
 
         loaded = [ns] + [get_namespace(*x) for x in ns.all_dependencies]
         self._namespaces = loaded
+        self._index = get_lookup_index(loaded, cache_index) if merged else None
+        self.rest_cache = RestCache(loaded)
+        self._class_manifests = {}
+        # docobj.DocInfo texts waiting for their conversion and how many
+        # of them got converted, see finish()
+        self.lazy_docs = 0
+        self.lazy_docs_converted = 0
 
         self._rst_env = jinja2.Environment(undefined=jinja2.StrictUndefined)
 
+    def docstring_to_rest(self, docstring, current_type=None, current_func=None):
+        """Like parser.docstring_to_rest() but memoized, see RestCache"""
+
+        return self.rest_cache.convert(self, docstring, current_type, current_func)
+
     def get_cache_key(self, obj):
         # If you want to cache a docobj, use this key
         return (self.namespace, self.version, obj)
 
-    def parse(self):
-        """Returns a Module instance containing the whole documentation tree"""
+    def parse(self, jobs=1):
+        """Returns a Module instance containing the whole documentation tree.
+        Call finish() once done with it.
+
+        If jobs is larger than 1 the docstrings get converted using that
+        many processes first, see convert_docs().
+        """
 
         # import the right versions first so we don't have to pass the version
         # in from now on
 
         self.import_module()
+        if jobs > 1:
+            self.convert_docs(jobs)
         return Module.from_repo(self)
 
+    def finish(self):
+        """Stores the converted docstrings in the cache and prints some
+        statistics. As the docs of the docobj tree returned by parse() get
+        converted on first access, call this once the tree was used.
+        """
+
+        nick = "%s-%s" % (self.namespace, self.version)
+        print("%s: unresolved links: %d" % (nick, self.missed_links))
+        self.rest_cache.save()
+        print("%s: docstring cache: %s" % (nick, self.rest_cache.get_stats()))
+        print(
+            "%s: lazy docs: %d converted, %d skipped as unused"
+            % (nick, self.lazy_docs_converted, self.lazy_docs - self.lazy_docs_converted)
+        )
+
+    def convert_docs(self, jobs):
+        """Converts all docstrings of the namespace in jobs processes, so
+        lookup_docs() and lookup_meta() only have to look up the results.
+        """
+
+        requests = []
+        for type_, entries in self._ns.docs.items():
+            for key, entry in entries.items():
+                if entry.docs:
+                    context = _guess_doc_context(type_, key, entry.docs)
+                    if context is not None:
+                        requests.append((entry.docs, context[0], context[1]))
+                if entry.deprecated:
+                    requests.append((entry.deprecated, None, None))
+
+        index = self._index
+        if index is None:
+            index = LookupIndex(self._namespaces)
+        self.rest_cache.prefill(FrozenRepository(index), requests, jobs)
+
+    def save_class_manifests(self, classes):
+        """Stores the manifests of the docobj.Class instances of this
+        namespace in the namespace cache, if enabled, so namespaces
+        depending on this one don't have to parse them again.
+        """
+
+        cache = namespace_.NAMESPACE_CACHE
+        if not cache:
+            return
+
+        manifests = {}
+        for klass in classes:
+            manifests[klass.fullname] = klass.get_manifest()
+        cache.set(_get_class_manifest_key(self.namespace, self.version), manifests)
+
+    def lookup_class_manifest(self, fullname):
+        """Returns the manifest of a class of a dependency stored by
+        save_class_manifests() or None if there is none.
+
+        e.g. "GObject.Object" -> {"methods": ["bind_property", ...], ...}
+        """
+
+        namespace = fullname.split(".", 1)[0]
+        if namespace not in self._class_manifests:
+            manifests = {}
+            cache = namespace_.NAMESPACE_CACHE
+            for ns in self._namespaces[1:]:
+                if cache and ns.namespace == namespace:
+                    try:
+                        manifests = cache.get(_get_class_manifest_key(ns.namespace, ns.version))
+                    except KeyError:
+                        pass
+                    break
+            self._class_manifests[namespace] = manifests
+        return self._class_manifests[namespace].get(fullname)
+
     def render_override_docs(self, text, **kwargs):
         return self._rst_env.from_string(text).render(**kwargs)
 
     def lookup_override_docs(self, fullname):
+        if self._index is not None:
+            return self._index.override_docs.get(fullname, "")
+
         for ns in self._namespaces:
             if fullname in ns.override_docs:
                 return ns.override_docs[fullname]
@@ -78,6 +491,9 @@ class Repository(object):
             if shadowed_c_id is not None:
                 c_id = shadowed_c_id
 
+        if self._index is not None:
+            return self._index.types.get(c_id, [])
+
         for ns in self._namespaces:
             if c_id in ns.types:
                 return ns.types[c_id]
@@ -91,6 +507,12 @@ class Repository(object):
             "https://developer.gnome.org/gtk3/stable/gtk-x11.html#gtk-x11""
         """
 
+        if self._index is not None:
+            if doc_ref in self._index.doc_references:
+                assert self.lookup_py_id(doc_ref) is None
+                return self._index.doc_references[doc_ref]
+            return
+
         for ns in self._namespaces:
             if doc_ref in ns.doc_references:
                 # We don't want to give out URLs for things we should
@@ -105,47 +527,74 @@ class Repository(object):
         e.g. GObjectClass -> GObject.Object
         """
 
+        if self._index is not None:
+            return self._index.type_structs.get(struct_c_id)
+
         for ns in self._namespaces:
             if struct_c_id in ns.type_structs:
                 return ns.type_structs[struct_c_id]
 
-    def _lookup_docs(self, type_, name, current_type=None, current_func=None):
+    def _lookup_doc_entry(self, type_, name):
+        if self._index is not None:
+            return self._index.docs[type_].get(name)
+
         for ns in self._namespaces:
             source = ns.docs[type_]
             if name in source:
-                return docstring_to_rest(self, source[name].docs, current_type, current_func)
-        return ""
+                return source[name]
 
-    def lookup_docs(self, type_, *args, **kwargs):
-        docs = self._lookup_docs(type_, *args, **kwargs)
+    def lookup_raw_docs(self, type_, fullname):
+        """Like lookup_docs() but returns the docstrings without
+        converting them.
+        """
+
+        entry = self._lookup_doc_entry(type_, fullname)
+        docs = entry.docs if entry else ""
+        shadowed = ""
         if type_ == "all":
-            shadowed = self._lookup_docs("all_shadowed", *args, **kwargs)
-        else:
-            shadowed = ""
+            entry = self._lookup_doc_entry("all_shadowed", fullname)
+            shadowed = entry.docs if entry else ""
 
         return docs, shadowed
 
-    def lookup_meta(self, type_, fullname):
-        for ns in self._namespaces:
-            source = ns.docs[type_]
+    def lookup_raw_meta(self, type_, fullname):
+        """Like lookup_meta() but returns the deprecation docstring
+        without converting it.
+        """
 
-            if fullname in source:
-                docs, version_added, dep_version, dep = source[fullname]
-                dep = docstring_to_rest(self, dep)
-                return version_added, dep_version, dep
+        entry = self._lookup_doc_entry(type_, fullname)
+        if entry is None:
+            return "", "", ""
+        docs, version_added, dep_version, dep = entry
+        return version_added, dep_version, dep
 
-        return "", "", ""
+    def lookup_docs(self, type_, fullname, current_type=None, current_func=None):
+        docs, shadowed = self.lookup_raw_docs(type_, fullname)
+        docs = self.docstring_to_rest(docs, current_type, current_func)
+        if type_ == "all":
+            shadowed = self.docstring_to_rest(shadowed, current_type, current_func)
+        return docs, shadowed
+
+    def lookup_meta(self, type_, fullname):
+        version_added, dep_version, dep = self.lookup_raw_meta(type_, fullname)
+        return version_added, dep_version, self.docstring_to_rest(dep)
 
     def lookup_instance_param(self, py_id):
         """Returns the name of the instance parameter for the Python identifier
         or None.
         """
 
+        if self._index is not None:
+            return self._index.instance_params.get(py_id)
+
         for ns in self._namespaces:
             if py_id in ns.instance_params:
                 return ns.instance_params[py_id]
 
     def get_shadowed(self, c_id):
+        if self._index is not None:
+            return self._index.shadow_map.get(c_id)
+
         for ns in self._namespaces:
             if c_id in ns.shadow_map:
                 return ns.shadow_map[c_id]
@@ -157,6 +606,9 @@ class Repository(object):
         e.g. is_private('Gtk.ViewportPrivate') -> True
         """
 
+        if self._index is not None:
+            return py_id in self._index.private
+
         for ns in self._namespaces:
             if py_id in ns.private:
                 return True
@@ -9,8 +9,8 @@ import os
 import subprocess
 import sys
 
-from .namespace import get_namespace, set_cache_prefix_path
-from .repo import Repository
+from .ir import open_module
+from .namespace import get_dependencies, set_cache_prefix_path
 from .util import get_gir_files
 
 
@@ -18,12 +18,47 @@ def add_parser(subparsers):
     parser = subparsers.add_parser("stubs", help="Create a typing stubs")
     parser.add_argument("target", help="path to where the resulting stubs should be")
     parser.add_argument("namespace", nargs="+", help="namespace including version e.g. Gtk-3.0")
+    parser.add_argument("--ir", help="directory for storing and reusing the parsed namespaces")
     parser.set_defaults(func=main)
 
 
-def _main_many(target, namespaces):
+def _main_many(target, namespaces, ir_dir=None):
     for namespace in namespaces:
-        subprocess.check_call([sys.executable, sys.argv[0], "stubs", target, namespace])
+        args = [sys.executable, sys.argv[0], "stubs", target, namespace]
+        if ir_dir is not None:
+            args += ["--ir", ir_dir]
+        subprocess.check_call(args)
+
+
+def _write_stubs(module_path, mod):
+    types = mod.classes + mod.flags + mod.enums + mod.structures + mod.unions
+    with open(module_path, "w", encoding="utf-8") as h:
+        for cls in types:
+            h.write(
+                """\
+class {}: ...
+""".format(
+                    cls.name
+                )
+            )
+
+        for func in mod.functions:
+            h.write(
+                """\
+def {}(*args, **kwargs): ...
+""".format(
+                    func.name
+                )
+            )
+
+        for const in mod.constants:
+            h.write(
+                """\
+{} = ...
+""".format(
+                    const.name
+                )
+            )
 
 
 def main(args):
@@ -31,7 +66,7 @@ def main(args):
         print("No namespace given")
         raise SystemExit(1)
     elif len(args.namespace) > 1:
-        return _main_many(args.target, args.namespace)
+        return _main_many(args.target, args.namespace, args.ir)
     else:
         namespace = args.namespace[0]
 
@@ -62,40 +97,11 @@ def main(args):
             return mods
         mods.append((namespace, version))
 
-        ns = get_namespace(namespace, version)
-        for dep in ns.dependencies:
+        for dep in get_dependencies(namespace, version):
             mods.extend(get_to_write(dir_, *dep))
 
         return mods
 
     for namespace, version in get_to_write(args.target, namespace, version):
-        mod = Repository(namespace, version).parse()
-        module_path = os.path.join(args.target, namespace + ".pyi")
-        types = mod.classes + mod.flags + mod.enums + mod.structures + mod.unions
-        with open(module_path, "w", encoding="utf-8") as h:
-            for cls in types:
-                h.write(
-                    """\
-class {}: ...
-""".format(
-                        cls.name
-                    )
-                )
-
-            for func in mod.functions:
-                h.write(
-                    """\
-def {}(*args, **kwargs): ...
-""".format(
-                        func.name
-                    )
-                )
-
-            for const in mod.constants:
-                h.write(
-                    """\
-{} = ...
-""".format(
-                        const.name
-                    )
-                )
+        with open_module(namespace, version, args.ir) as mod:
+            _write_stubs(os.path.join(args.target, namespace + ".pyi"), mod)
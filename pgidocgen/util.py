@@ -6,6 +6,7 @@
 # License as published by the Free Software Foundation; either
 # version 2.1 of the License, or (at your option) any later version.
 
+import collections
 import csv
 import inspect
 import io
@@ -16,6 +17,7 @@ import subprocess
 import sys
 import warnings
 from contextlib import contextmanager
+from xml.etree import ElementTree
 
 from docutils.core import publish_parts
 
@@ -56,20 +58,60 @@ def shell(cmd):
     )
 
 
-def parse_gir_shared_libs(gir_path):
-    """Returns a list of shared libraries for a .gir file.
+GirHeader = collections.namedtuple("GirHeader", ["includes", "c_prefixes", "shared_libraries"])
+"""includes is a list of (namespace, version) tuples, c_prefixes and
+shared_libraries lists of strings
+"""
+
+
+def parse_gir_header(gir_path):
+    """Returns a GirHeader for a .gir file.
 
-    XXX: This doesn't parse the file properly.. but it's fast.
+    Only the start of the file up to the first element in <namespace> gets
+    parsed, so this is fast even for large gir files.
     """
 
-    shared_libs = []
+    core = "{http://www.gtk.org/introspection/core/1.0}"
+    c = "{http://www.gtk.org/introspection/c/1.0}"
+
+    includes = []
+    c_prefixes = []
+    shared_libraries = []
+
+    parser = ElementTree.XMLPullParser(events=("start",))
+    in_namespace = False
     with open(gir_path, "rb") as h:
-        for line in h.read().decode("utf-8").splitlines():
-            line = line.strip()
-            if line.startswith("shared-library="):
-                shared_libs.extend(line.split("=")[-1].strip('"').split(","))
+        while True:
+            chunk = h.read(16 * 1024)
+            if not chunk:
                 break
-    return list(filter(None, shared_libs))
+            parser.feed(chunk)
+            try:
+                for event, elem in parser.read_events():
+                    if in_namespace:
+                        return GirHeader(includes, c_prefixes, shared_libraries)
+                    if elem.tag == core + "include":
+                        includes.append((elem.get("name", ""), elem.get("version", "")))
+                    elif elem.tag == core + "namespace":
+                        in_namespace = True
+                        prefixes = elem.get(c + "identifier-prefixes", "") or elem.get(c + "prefix", "")
+                        c_prefixes = list(filter(None, prefixes.split(",")))
+                        shared_library = elem.get("shared-library", "")
+                        shared_libraries = shared_library.split(",") if shared_library else []
+            except ElementTree.ParseError:
+                # the docs can contain things like &#x1c; which expat
+                # doesn't like, but we are done at that point anyway
+                if in_namespace:
+                    break
+                raise
+
+    return GirHeader(includes, c_prefixes, shared_libraries)
+
+
+def parse_gir_shared_libs(gir_path):
+    """Returns a list of shared libraries for a .gir file."""
+
+    return list(filter(None, parse_gir_header(gir_path).shared_libraries))
 
 
 def cache_calls(func):
@@ -141,7 +183,7 @@ def get_style_properties(cls):
     return names.values()
 
 
-def iter_public_attr(obj):
+def _iter_public_attr(obj):
     for attr in sorted(dir(obj)):
         if attr.startswith("_") and not attr == "_":
             continue
@@ -157,6 +199,68 @@ def iter_public_attr(obj):
         yield attr, attr_obj
 
 
+PublicAttr = collections.namedtuple("PublicAttr", ["name", "obj", "kind", "is_owner"])
+
+
+class AttrSnapshot(object):
+    """The public attributes of an object, looked up once.
+
+    Contains a PublicAttr for each attribute, sorted by name. kind is one
+    of "method", "field", "property" or "value" and is_owner tells if the
+    class owns the attribute (see is_attribute_owner()), it is always
+    False for non-class objects.
+    """
+
+    def __init__(self, obj):
+        is_class = inspect.isclass(obj)
+        if is_class:
+            owners = [obj.__dict__]
+            ovr = get_overridden_class(obj)
+            if ovr:
+                owners.append(ovr.__dict__)
+
+        self._attrs = {}
+        for name, attr_obj in _iter_public_attr(obj):
+            if callable(attr_obj):
+                kind = "method"
+            elif is_field(attr_obj):
+                kind = "field"
+            elif is_property(attr_obj):
+                kind = "property"
+            else:
+                kind = "value"
+            is_owner = is_class and any(name in d for d in owners)
+            self._attrs[name] = PublicAttr(name, attr_obj, kind, is_owner)
+
+    def __iter__(self):
+        return iter(self._attrs.values())
+
+    def get(self, name):
+        """Returns the PublicAttr or None"""
+
+        return self._attrs.get(name)
+
+
+_attr_snapshots = {}
+
+
+def get_attr_snapshot(obj):
+    """Returns the AttrSnapshot for obj, shared for classes"""
+
+    if not inspect.isclass(obj):
+        return AttrSnapshot(obj)
+
+    snapshot = _attr_snapshots.get(obj)
+    if snapshot is None:
+        snapshot = _attr_snapshots[obj] = AttrSnapshot(obj)
+    return snapshot
+
+
+def iter_public_attr(obj):
+    for attr in get_attr_snapshot(obj):
+        yield attr.name, attr.obj
+
+
 def escape_identifier(text, reg=_KWD_RE):
     """Escape C identifiers (or a part of them)
     so they can be used as attributes/arguments
@@ -233,12 +337,19 @@ def is_attribute_owner(cls, attr_name):
     return False
 
 
+def _is_public_attr_owner(cls, attr_name):
+    attr = get_attr_snapshot(cls).get(attr_name)
+    if attr is None:
+        return is_attribute_owner(cls, attr_name)
+    return attr.is_owner
+
+
 def is_method_owner(cls, method_name):
-    return is_attribute_owner(cls, method_name)
+    return _is_public_attr_owner(cls, method_name)
 
 
 def is_field_owner(cls, field_name):
-    return is_attribute_owner(cls, field_name)
+    return _is_public_attr_owner(cls, field_name)
 
 
 def is_fundamental(obj):
@@ -364,12 +475,10 @@ def escape_rest(text):
     return text
 
 
-def fake_subclasses(cls):
-    """Gives a list of subclasses, replacing classes by their overrides"""
-
+def _get_fake_subclasses(cls):
     subs = []
     for sub in cls.__subclasses__():
-        for subsub in fake_subclasses(sub):
+        for subsub in get_class_graph(get_namespace(sub))._get_subclasses(sub):
             if get_overridden_class(subsub) is sub:
                 subs.append(subsub)
                 break
@@ -378,11 +487,7 @@ def fake_subclasses(cls):
     return subs
 
 
-def fake_bases(obj, ignore_redundant=False):
-    """If ignore_redundant=True any bases which are already implied by previous
-    bases are ignored.
-    """
-
+def _get_fake_bases(obj, ignore_redundant):
     # hide overrides by merging the bases in
     possible_bases = []
     known = set()
@@ -408,21 +513,99 @@ def fake_bases(obj, ignore_redundant=False):
     return mro_bases
 
 
-def fake_mro(obj):
-    def get_mro(obj):
-        mro = [obj]
-        for base in fake_bases(obj):
-            mro.extend(get_mro(base))
-        return mro
+class ClassGraph(object):
+    """The override aware class hierarchy of the types of one namespace.
 
-    possible_mro = get_mro(obj)
+    Bases, MRO and subclasses get computed once per type and are shared
+    by all users, see get_class_graph().
+    """
 
-    # preserve the real mro
-    mro_bases = []
-    for base in obj.__mro__:
-        if base in possible_mro:
-            mro_bases.append(base)
-    return mro_bases
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._bases = {}
+        self._mro = {}
+        self._subclasses = {}
+        self._complete = False
+
+    def complete(self):
+        """Creates all classes of the namespace, pgi only creates them on
+        first access and the subclasses would be incomplete otherwise.
+        """
+
+        if self._complete:
+            return
+        self._complete = True
+        try:
+            module = import_namespace(self.namespace)
+        except ImportError:
+            return
+        for name in dir(module):
+            getattr(module, name, None)
+
+    def get_bases(self, cls, ignore_redundant=False):
+        key = (cls, ignore_redundant)
+        if key not in self._bases:
+            self._bases[key] = _get_fake_bases(cls, ignore_redundant)
+        return self._bases[key]
+
+    def get_mro(self, cls):
+        if cls not in self._mro:
+            # merge the cached MROs of the bases, preserving the real MRO
+            possible = {cls}
+            for base in self.get_bases(cls):
+                possible.update(get_class_graph(get_namespace(base)).get_mro(base))
+            self._mro[cls] = [base for base in cls.__mro__ if base in possible]
+        return self._mro[cls]
+
+    def _get_subclasses(self, cls):
+        # other namespaces can still create new classes, so only
+        # remember the result once all of ours exist
+        if cls in self._subclasses:
+            return self._subclasses[cls]
+        subs = _get_fake_subclasses(cls)
+        if self._complete:
+            self._subclasses[cls] = subs
+        return subs
+
+    def get_subclasses(self, cls):
+        """All subclasses, including the ones of other namespaces"""
+
+        self.complete()
+        return self._get_subclasses(cls)
+
+    def get_namespace_subclasses(self, cls):
+        """The subclasses which are part of this namespace"""
+
+        return [s for s in self.get_subclasses(cls) if get_namespace(s) == self.namespace]
+
+
+_class_graphs: dict[str, ClassGraph] = {}
+
+
+def get_class_graph(namespace):
+    """Returns the shared ClassGraph for a namespace"""
+
+    if namespace not in _class_graphs:
+        _class_graphs[namespace] = ClassGraph(namespace)
+    return _class_graphs[namespace]
+
+
+def fake_subclasses(cls):
+    """Gives a list of subclasses, replacing classes by their overrides"""
+
+    return list(get_class_graph(get_namespace(cls)).get_subclasses(cls))
+
+
+def fake_bases(obj, ignore_redundant=False):
+    """If ignore_redundant=True any bases which are already implied by previous
+    bases are ignored.
+    """
+
+    return list(get_class_graph(get_namespace(obj)).get_bases(obj, ignore_redundant))
+
+
+def fake_mro(obj):
+    return list(get_class_graph(get_namespace(obj)).get_mro(obj))
 
 
 def is_staticmethod(parent, name):
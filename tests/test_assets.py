@@ -0,0 +1,49 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+import os
+
+from pgidocgen.assets import AssetStore, get_file_hash, link_duplicates
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as h:
+        h.write(data)
+
+
+def test_asset_store(tmp_path):
+    src = str(tmp_path / "theme")
+    _write(os.path.join(src, "layout.html"), "layout")
+    _write(os.path.join(src, "static", "a.css"), "css")
+    _write(os.path.join(src, "static", "b.css"), "css")
+    _write(os.path.join(src, "__pycache__", "x.pyc"), "")
+
+    store = AssetStore(str(tmp_path / "store"))
+    store.copytree(src, str(tmp_path / "Foo-1.0"))
+    store.copytree(src, str(tmp_path / "Bar-1.0"))
+
+    a = str(tmp_path / "Foo-1.0" / "static" / "a.css")
+    assert os.path.samefile(a, str(tmp_path / "Bar-1.0" / "static" / "a.css"))
+    assert os.path.samefile(a, str(tmp_path / "Foo-1.0" / "static" / "b.css"))
+    assert not os.path.exists(str(tmp_path / "Foo-1.0" / "__pycache__"))
+    assert get_file_hash(a) == get_file_hash(os.path.join(src, "static", "a.css"))
+    assert len(os.listdir(str(tmp_path / "store"))) == 2
+
+
+def test_link_duplicates(tmp_path):
+    dirs = [str(tmp_path / name) for name in ["a", "b", "c"]]
+    for path in dirs:
+        _write(os.path.join(path, "css", "theme.css"), "theme")
+    _write(os.path.join(dirs[2], "extra.js"), "js")
+    _write(os.path.join(dirs[1], "extra.js"), "other")
+
+    assert link_duplicates(dirs) == [(dirs[2], "extra.js")]
+    theme = [os.path.join(path, "css", "theme.css") for path in dirs]
+    assert os.path.samefile(theme[0], theme[1])
+    assert os.path.samefile(theme[0], theme[2])
+    assert link_duplicates(dirs) == [(dirs[2], "extra.js")]
@@ -0,0 +1,141 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+import json
+import os
+
+import pytest
+
+from pgidocgen import build
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as h:
+        h.write(data)
+
+
+def test_get_source_files(tmp_path):
+    source = str(tmp_path)
+    _write(os.path.join(source, "index.rst"), "foo")
+    _write(os.path.join(source, "classes", "Bar.rst"), "bar")
+    _write(os.path.join(source, "_ext", "__pycache__", "x.pyc"), "")
+
+    files = build.get_source_files(source)
+    assert sorted(files) == [os.path.join("classes", "Bar.rst"), "index.rst"]
+    assert files["index.rst"] != files[os.path.join("classes", "Bar.rst")]
+
+
+def test_build_stamp(tmp_path):
+    source = str(tmp_path / "src")
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    _write(os.path.join(source, "index.rst"), "foo")
+    _write(os.path.join(source, "other.rst"), "bar")
+
+    assert build.read_build_stamp(out) is None
+    files = build.get_source_files(source)
+    inventories = {"GLib-2.0": "abc"}
+    assert build.get_build_flags(None, files, inventories) == ["-a", "-E"]
+
+    build.write_build_stamp(out, source, files, inventories)
+    stamp = build.read_build_stamp(out)
+    assert build.get_build_flags(stamp, files, inventories) is None
+    assert build.get_build_flags(stamp, files, {"GLib-2.0": "def"}) == ["-a"]
+
+    # everything written again, but only one file changed
+    mtime = os.stat(os.path.join(source, "index.rst")).st_mtime_ns
+    _write(os.path.join(source, "index.rst"), "foo")
+    _write(os.path.join(source, "other.rst"), "changed")
+    os.utime(os.path.join(source, "index.rst"), ns=(mtime + 10**9, mtime + 10**9))
+    files = build.get_source_files(source)
+    assert build.get_build_flags(stamp, files, inventories) == []
+    assert build.restore_mtimes(source, stamp, files) == 1
+    assert os.stat(os.path.join(source, "index.rst")).st_mtime_ns == mtime
+
+    build.remove_build_stamp(out)
+    build.remove_build_stamp(out)
+    assert build.read_build_stamp(out) is None
+
+    # the right version but not the expected content
+    for broken in [{}, {"files": {"a": "b"}, "inventories": {}}, {"files": [], "inventories": {}}]:
+        broken["version"] = build.BUILD_STAMP_VERSION
+        _write(os.path.join(out, build.BUILD_STAMP), json.dumps(broken))
+        assert build.read_build_stamp(out) is None
+
+
+def test_build_scheduler_priorities():
+    mib = 1024**2
+    packages = {
+        "GLib-2.0": (2 * mib, set()),
+        "GObject-2.0": (1 * mib, {"GLib-2.0"}),
+        "Gtk-3.0": (8 * mib, {"GObject-2.0", "cairo-1.0"}),
+        "Json-1.0": (1 * mib, {"GLib-2.0"}),
+        "Foo-1.0": (4 * mib, set()),
+    }
+    scheduler = build.BuildScheduler(packages, 8)
+    assert scheduler.priorities["GLib-2.0"] == 11 * mib
+    assert scheduler.priorities["Gtk-3.0"] == 8 * mib
+    assert scheduler.get_critical_path() == 11 * mib
+
+    # GLib first, the rest of the cores shared by size
+    assert scheduler.get_next() == [("GLib-2.0", 4), ("Foo-1.0", 4)]
+    assert scheduler.get_next() == []
+    scheduler.finish("GLib-2.0")
+    assert scheduler.get_next() == [("GObject-2.0", 2), ("Json-1.0", 2)]
+    scheduler.finish("GObject-2.0")
+    scheduler.finish("Json-1.0")
+    assert scheduler.get_next() == [("Gtk-3.0", 4)]
+    scheduler.finish("Foo-1.0")
+    assert scheduler.get_next() == []
+    assert scheduler.has_running()
+    scheduler.finish("Gtk-3.0")
+    assert not scheduler.has_running()
+
+
+def test_build_scheduler_budget():
+    packages = {"P%d" % i: (i * 1024**2, set()) for i in range(10)}
+    scheduler = build.BuildScheduler(packages, 3)
+    started = scheduler.get_next()
+    assert [name for name, workers in started] == ["P9", "P8", "P7"]
+    assert sum(workers for name, workers in started) == 3
+    scheduler.finish("P8")
+    assert scheduler.get_next() == [("P6", 1)]
+
+    with pytest.raises(ValueError):
+        build.BuildScheduler({"A": (1, {"B"}), "B": (1, {"A"})}, 2)
+
+
+def test_build_packages_failed(monkeypatch, tmp_path):
+    def do_build(package, incremental=False, jobs=1):
+        if package.name == "A-1.0":
+            raise KeyError("files")
+
+    monkeypatch.setattr(build, "do_build", do_build)
+    monkeypatch.setattr(build, "get_package_weight", lambda package: 1)
+    to_build = {
+        "A-1.0": build.Package("A-1.0", "1.0", str(tmp_path), None, set()),
+        "B-1.0": build.Package("B-1.0", "1.0", str(tmp_path), None, {"A-1.0"}),
+    }
+    with pytest.raises(SystemExit) as excinfo:
+        build._build_packages(to_build, 2, True)
+    assert "A-1.0" in str(excinfo.value)
+
+
+def test_share_static(tmp_path):
+    main = str(tmp_path)
+    for name in ["GLib-2.0", "Gtk-3.0"]:
+        _write(os.path.join(main, name, "_static", "css", "theme.css"), "theme")
+        _write(os.path.join(main, name, "index.html"), "")
+    _write(os.path.join(main, "Gtk-3.0", "_static", "gtk.js"), "js")
+    _write(os.path.join(main, "Gtk-3.0", "_static", "pygments.css"), "old")
+    _write(os.path.join(main, "_static", "pygments.css"), "new")
+
+    assert build.share_static(main) == [(os.path.join(main, "Gtk-3.0"), "pygments.css")]
+    assert sorted(os.listdir(os.path.join(main, "_static"))) == ["css", "gtk.js", "pygments.css"]
+    assert not os.path.exists(os.path.join(main, "GLib-2.0", "_static"))
+    assert os.listdir(os.path.join(main, "Gtk-3.0", "_static")) == ["pygments.css"]
@@ -0,0 +1,77 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+import multiprocessing
+import os
+
+import pytest
+
+from pgidocgen.cache import Cache, parse_size
+
+
+def test_get_set(tmp_path):
+    cache = Cache(str(tmp_path / "cache"))
+    with pytest.raises(KeyError):
+        cache.get("foo")
+    cache.set("foo", [1, 2])
+    assert cache.get("foo") == [1, 2]
+    assert cache.keys() == ["foo"]
+    cache.remove("foo")
+    with pytest.raises(KeyError):
+        cache.get("foo")
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = Cache(str(tmp_path), max_size=2**30)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.set(key, b"x" * 1000)
+        os.utime(cache._get_path(key), (i, i))
+    cache.get("a")
+
+    size = cache.size()
+    assert cache.prune(size - 1) == ["b"]
+    assert sorted(cache.keys()) == ["a", "c"]
+
+
+def test_prune_keep(tmp_path):
+    cache = Cache(str(tmp_path))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.prune(keep=lambda key: key != "a") == ["a"]
+    assert cache.keys() == ["b"]
+
+
+def test_parse_size():
+    assert parse_size("100") == 100
+    assert parse_size("1K") == 1024
+    assert parse_size("1.5M") == 1024 * 1024 * 3 // 2
+    assert parse_size("2GB") == 2 * 1024**3
+    with pytest.raises(ValueError):
+        parse_size("foo")
+
+
+def _create_in_process(args):
+    path, log = args
+
+    def create():
+        with open(log, "a") as h:
+            h.write("x")
+        return list(range(1000))
+
+    return Cache(path).get_or_create("key", create)
+
+
+def test_get_or_create_concurrent(tmp_path):
+    path = str(tmp_path / "cache")
+    log = str(tmp_path / "log")
+    with multiprocessing.Pool(8) as pool:
+        results = pool.map(_create_in_process, [(path, log)] * 16)
+
+    assert all(r == list(range(1000)) for r in results)
+    with open(log) as h:
+        assert h.read() == "x"
+    assert Cache(path).keys() == ["key"]
@@ -0,0 +1,82 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+import argparse
+import threading
+import time
+
+import pytest
+
+from pgidocgen import create
+
+
+def _run_many(monkeypatch, tmp_path, graph, created, fail=()):
+    lock = threading.Lock()
+    in_use = [0]
+
+    def create_one(target, nick, convert_jobs, ir_dir=None):
+        with lock:
+            # never more processes than jobs in total
+            in_use[0] += convert_jobs
+            assert 1 <= convert_jobs and in_use[0] <= 4
+            # all dependencies have to be done before
+            assert graph[nick] <= set(created)
+            created.append(nick)
+        time.sleep(0.01)
+        with lock:
+            in_use[0] -= convert_jobs
+        return nick, int(nick in fail), 0.0
+
+    monkeypatch.setattr(create, "get_gir_files", lambda: dict.fromkeys(graph))
+    monkeypatch.setattr(
+        create, "get_create_graph", lambda target, namespaces: {k: set(v) for k, v in graph.items()}
+    )
+    monkeypatch.setattr(create, "_create_one", create_one)
+    create._main_many(str(tmp_path), ["Gtk-3.0"], 4)
+
+
+def test_main_many(monkeypatch, tmp_path):
+    graph = {
+        "GLib-2.0": set(),
+        "GObject-2.0": {"GLib-2.0"},
+        "Gio-2.0": {"GObject-2.0"},
+        "Pango-1.0": {"GObject-2.0"},
+        "Gdk-3.0": {"Gio-2.0", "Pango-1.0"},
+        "Gtk-3.0": {"Gdk-3.0", "Pango-1.0"},
+    }
+    created = []
+    _run_many(monkeypatch, tmp_path, graph, created)
+    assert sorted(created) == sorted(graph)
+
+
+def test_main_many_failed(monkeypatch, tmp_path):
+    graph = {
+        "GLib-2.0": set(),
+        "GObject-2.0": {"GLib-2.0"},
+        "Gtk-3.0": {"GObject-2.0"},
+        "Foo-1.0": {"GLib-2.0"},
+    }
+    created = []
+    with pytest.raises(SystemExit):
+        _run_many(monkeypatch, tmp_path, graph, created, fail=["GObject-2.0"])
+    assert sorted(created) == ["Foo-1.0", "GLib-2.0", "GObject-2.0"]
+
+
+def test_create_one_error(monkeypatch, tmp_path):
+    def call(args):
+        raise OSError("no such file")
+
+    monkeypatch.setattr(create.subprocess, "call", call)
+    nick, returncode, duration = create._create_one(str(tmp_path), "GLib-2.0")
+    assert nick == "GLib-2.0"
+    assert returncode != 0
+
+
+def test_positive_int():
+    assert create.positive_int("3") == 3
+    with pytest.raises(argparse.ArgumentTypeError):
+        create.positive_int("0")
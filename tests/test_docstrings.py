@@ -9,6 +9,12 @@
 import pytest
 
 from pgidocgen.namespace import get_base_types
+from pgidocgen.parser import (
+    _docbook_to_rest,
+    _docstring_to_docbook,
+    _plain_to_rest,
+    is_plain_docstring,
+)
 from pgidocgen.repo import docstring_to_rest
 
 
@@ -76,6 +82,35 @@ def check(repo):
     return _check
 
 
+def test_plain(repo):
+    for text in [
+        "",
+        "foo",
+        "Returns %TRUE if @foo is a #GtkWidget.\n\n  \nSee ::sig and foo()",
+        "a\n \t\nb \\ *c* 1.5\n\n\n",
+        " -foo\n-foo:bar\n\tx",
+    ]:
+        assert is_plain_docstring(text)
+        expected = _docbook_to_rest(repo, _docstring_to_docbook(text), None, None)
+        assert _plain_to_rest(repo, text, None, None) == expected
+
+    for text in [
+        "a < b",
+        "a & b",
+        "`foo`",
+        "[foo](bar)",
+        "|[ x ]|",
+        "# Title",
+        "foo\n- item",
+        "foo\n * item",
+        "1. item",
+        "Title\n====",
+        "a\r\nb",
+        "a\x01",
+    ]:
+        assert not is_plain_docstring(text)
+
+
 def test_invalid_xml(check):
     check("bla 1 < 3", "bla 1 < 3")
     check("bla 1 << 3", "bla 1 << 3")
@@ -578,3 +613,19 @@ frame
     ╰── <child>
 """,
     )
+
+
+def test_lookups_memoized(repo):
+    calls = []
+    lookup_py_id = repo.lookup_py_id
+
+    def counting_lookup_py_id(c_id):
+        calls.append(c_id)
+        return lookup_py_id(c_id)
+
+    repo.lookup_py_id = counting_lookup_py_id
+    text = "a #GtkWidget and a #GtkWidget"
+    expected = "a :obj:`Gtk.Widget` and a :obj:`Gtk.Widget`"
+    assert docstring_to_rest(repo, text) == expected
+    assert docstring_to_rest(repo, text) == expected
+    assert sorted(calls) == ["GtkWidget", "a", "and"]
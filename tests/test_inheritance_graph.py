@@ -0,0 +1,85 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+import os
+import sys
+
+from pgidocgen.gen.data.ext import inheritance_graph as ig
+
+FAKE_DOT = """\
+import sys
+with open(sys.argv[0] + ".log", "a") as h:
+    h.write("call\\n")
+for path in sys.argv[1:]:
+    if path.endswith(".dot"):
+        with open(path) as f:
+            code = f.read().strip()
+        if code == "FAIL":
+            continue
+        with open(path + ".svg", "w") as out:
+            out.write('<?xml version="1.0"?>\\n<svg>%s</svg>' % code)
+"""
+
+
+class Config(object):
+    graphviz_dot_args = []
+    inheritance_graph_cache = "cache"
+
+
+class App(object):
+    def __init__(self, path, dot):
+        self.confdir = path
+        self.outdir = os.path.join(path, "out")
+        self.doctreedir = os.path.join(path, "doctrees")
+        self.config = Config()
+        self.config.graphviz_dot = dot
+
+
+def test_render_pending(tmp_path):
+    script = str(tmp_path / "dot.py")
+    with open(script, "w") as h:
+        h.write(FAKE_DOT)
+    dot = str(tmp_path / "dot")
+    with open(dot, "w") as h:
+        h.write("#!/bin/sh\nexec %s %s \"$@\"\n" % (sys.executable, script))
+    os.chmod(dot, 0o755)
+
+    app = App(str(tmp_path), dot)
+    os.makedirs(app.outdir)
+    pending_dir = ig.get_pending_dir(app)
+    graphs = [("a", "A"), ("b", "B"), ("c", "FAIL")]
+    for name, code in graphs:
+        key = ig.get_graph_key(app.config, code)
+        ig.write_atomic(os.path.join(pending_dir, key + ".dot"), code)
+        ig.write_atomic(os.path.join(pending_dir, key + ".pages"), name + ".html\n")
+        with open(os.path.join(app.outdir, name + ".html"), "w") as h:
+            h.write("<p>" + ig.PENDING_START % key + code + ig.PENDING_END + "</p>")
+    # not listed as containing a graph, so not touched
+    unrelated = os.path.join(app.outdir, "d.html")
+    with open(unrelated, "w") as h:
+        h.write(ig.PENDING_END)
+
+    ig.render_pending(app, None)
+
+    with open(script + ".log") as h:
+        assert h.read() == "call\n"
+    for name, code in graphs[:2]:
+        with open(os.path.join(app.outdir, name + ".html")) as h:
+            assert h.read() == "<p><svg>%s</svg></p>" % code
+    assert ig.read_cached_svg(ig.get_cache_dir(app), ig.get_graph_key(app.config, "A")) == "<svg>A</svg>"
+    with open(unrelated) as h:
+        assert h.read() == ig.PENDING_END
+
+    # the failed one stays pending and gets retried by the next build
+    key = ig.get_graph_key(app.config, "FAIL")
+    assert sorted(os.listdir(pending_dir)) == [key + ".dot", key + ".pages"]
+    assert ig.read_pending_pages(pending_dir, key) == {"c.html"}
+    with open(os.path.join(app.outdir, "c.html")) as h:
+        assert ig.PENDING_END in h.read()
+    ig.render_pending(app, None)
+    with open(script + ".log") as h:
+        assert h.read() == "call\ncall\n"
@@ -0,0 +1,67 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+import gzip
+import json
+
+import pytest
+
+from pgidocgen import ir
+from pgidocgen.docobj import Class, ClassNode, DocInfo, Function, Module, SymbolMapping
+
+
+def _get_module():
+    mod = Module("Foo")
+    mod.dependencies = [("GObject", "2.0")]
+    mod.hierarchy = [("GObject.Object", [("Foo.Bar", [])])]
+    mod.symbol_mapping = SymbolMapping([("foo_bar_new", "", "Foo.Bar.new", "")], {"Foo.Bar": "http://x"})
+
+    klass = Class("Foo", "Bar")
+    klass.info = DocInfo.EMPTY.replace(desc="Some *docs*")
+    klass.base_tree = [(ClassNode("Foo.Bar", False, True), [(ClassNode("GObject.Object", False, False), [])])]
+    klass.methods_inherited = [("GObject.Object", 42)]
+    func = Function(klass.fullname, "new", False, True, False)
+    func.info = DocInfo.EMPTY
+    klass.methods.append(func)
+    mod.classes.append(klass)
+    return mod
+
+
+def test_roundtrip(tmp_path):
+    path = str(tmp_path / "Foo-1.0.json.gz")
+    ir.dump_module(_get_module(), path, "key")
+    mod = ir.load_module(path, "key")
+
+    assert isinstance(mod, Module)
+    assert mod.dependencies == [("GObject", "2.0")]
+    assert mod.hierarchy == [("GObject.Object", [("Foo.Bar", [])])]
+    assert mod.symbol_mapping.source_map == {"Foo.Bar": "http://x"}
+    klass = mod.classes[0]
+    assert klass.info.desc == "Some *docs*"
+    assert klass.bases == [ClassNode("GObject.Object", False, False)]
+    assert klass.methods_inherited == [("GObject.Object", 42)]
+    assert klass.get_methods(static=True)[0].fullname == "Foo.Bar.new"
+
+
+def test_load_outdated(tmp_path):
+    path = str(tmp_path / "Foo-1.0.json.gz")
+    ir.dump_module(_get_module(), path, "key")
+    with pytest.raises(ValueError):
+        ir.load_module(path, "other")
+    assert ir.load_module(path).name == "Foo"
+
+    with gzip.open(path, "wt", encoding="utf-8") as h:
+        json.dump({"version": ir.IR_VERSION + 1}, h)
+    with pytest.raises(ValueError):
+        ir.load_module(path)
+
+
+def test_unknown_type():
+    mod = _get_module()
+    mod.project_summary = object()
+    with pytest.raises(TypeError):
+        ir.dump_module(mod, "unused")
@@ -5,12 +5,24 @@
 # License as published by the Free Software Foundation; either
 # version 2.1 of the License, or (at your option) any later version.
 
+import pickle
+import tracemalloc
+import types
 
 import pytest
 
-from pgidocgen.docobj import Class, Constant, Flags, Function, PyClass, get_hierarchy
+from pgidocgen import repo as repo_module
+from pgidocgen.cache import Cache
+from pgidocgen.docobj import Class, Constant, DocInfo, Flags, Function, PyClass, get_hierarchy
 from pgidocgen.overrides import parse_override_docs
-from pgidocgen.repo import Repository
+from pgidocgen.repo import (
+    FrozenRepository,
+    LookupIndex,
+    Repository,
+    RestCache,
+    _guess_doc_context,
+    is_current_cache_key,
+)
 
 
 def find(l, name):
@@ -202,6 +214,42 @@ def test_gobject():
     assert klass.base == "GLib.Flags"
 
 
+def test_class_manifests(tmp_path, monkeypatch):
+    monkeypatch.setattr(repo_module.namespace_, "NAMESPACE_CACHE", Cache(str(tmp_path)))
+    Repository("GObject", "2.0").parse()
+
+    repo = Repository("Atk", "1.0")
+    manifest = repo.lookup_class_manifest("GObject.Object")
+    assert "bind_property" in manifest["methods"]
+    assert manifest["gtype_struct"][0] == "GObject.ObjectClass"
+    assert repo.lookup_class_manifest("Atk.Plug") is None
+
+    Atk = repo.import_module()
+    klass = Class.from_object(repo, Atk.Plug)
+    assert [x[0] for x in klass.methods_inherited] == ["Atk.Object", "GObject.Object", "Atk.Component"]
+
+
+def test_is_current_cache_key(tmp_path, monkeypatch):
+    cache = Cache(str(tmp_path))
+    monkeypatch.setattr(repo_module.namespace_, "NAMESPACE_CACHE", cache)
+    repo = Repository("GObject", "2.0")
+    repo.parse()
+    repo.finish()
+
+    keys = cache.keys()
+    assert any("-rest-" in key for key in keys)
+    assert any("-classes-" in key for key in keys)
+    assert all(is_current_cache_key(key) for key in keys)
+
+    # derived from a current namespace key, but with outdated inputs
+    current = repo_module.get_namespace_cache_key("GObject", "2.0")
+    assert is_current_cache_key(current)
+    assert not is_current_cache_key(current + "-rest-" + "0" * 64)
+    assert not is_current_cache_key(current + "-classes-" + "0" * 64)
+    assert not is_current_cache_key("GObject-2.0-" + "0" * 64)
+    assert not is_current_cache_key("Foo-1.0-" + "0" * 64)
+
+
 def test_atk():
     repo = Repository("Atk", "1.0")
     Atk = repo.import_module()
@@ -227,3 +275,167 @@ def test_atk():
     klass = Flags.from_object(repo, Atk.Role)
     info = find(klass.values, "APPLICATION").info
     assert info.version_added == "1.1.4"
+
+
+def test_merged_index():
+    repo = Repository("Gtk", "3.0")
+    linear = Repository("Gtk", "3.0", merged=False)
+
+    for c_id in ["GtkWidget", "GObject", "g_idle_add", "gtk_list_store_new", "GtkWidgetClass", "nope"]:
+        assert repo.lookup_all_py_id(c_id) == linear.lookup_all_py_id(c_id)
+        assert repo.lookup_all_py_id(c_id, shadowed=False) == linear.lookup_all_py_id(c_id, shadowed=False)
+        assert repo.lookup_py_id_for_type_struct(c_id) == linear.lookup_py_id_for_type_struct(c_id)
+        assert repo.get_shadowed(c_id) == linear.get_shadowed(c_id)
+
+    for py_id in [
+        "Gtk.Widget",
+        "Gtk.Widget.show",
+        "GObject.Object",
+        "Gtk.ViewportPrivate",
+        "Gdk.Window.begin_paint_region",
+    ]:
+        assert repo.is_private(py_id) == linear.is_private(py_id)
+        assert repo.lookup_instance_param(py_id) == linear.lookup_instance_param(py_id)
+        assert repo.lookup_meta("all", py_id) == linear.lookup_meta("all", py_id)
+        assert repo.lookup_docs("all", py_id) == linear.lookup_docs("all", py_id)
+
+
+def test_rest_cache(monkeypatch):
+    calls = []
+
+    def docstring_to_rest(repo, docstring, current_type=None, current_func=None):
+        calls.append(docstring)
+        repo.missed_links += 1
+        return docstring.upper()
+
+    class FakeRepo(object):
+        missed_links = 0
+
+    monkeypatch.setattr(repo_module, "docstring_to_rest", docstring_to_rest)
+    monkeypatch.setattr(repo_module.namespace_, "NAMESPACE_CACHE", None)
+
+    repo = FakeRepo()
+    cache = RestCache([])
+    assert cache.convert(repo, "foo") == "FOO"
+    assert cache.convert(repo, "foo") == "FOO"
+    # the context only matters for parameters, properties and signals
+    assert cache.convert(repo, "foo", "Gtk.Widget") == "FOO"
+    assert cache.convert(repo, "@foo", "Gtk.Widget", "Gtk.Widget.show") == "@FOO"
+    assert cache.convert(repo, "@foo", "Gtk.Widget", "Gtk.Widget.hide") == "@FOO"
+    assert cache.convert(repo, "`foo`") == "`FOO`"
+    assert calls == ["foo", "@foo", "@foo", "`foo`"]
+    assert (cache.hits, cache.misses, cache.plain) == (2, 4, 3)
+    assert repo.missed_links == 6
+
+
+def _get_frozen_repo():
+    ns = types.SimpleNamespace(
+        types={"GtkWidget": ["Gtk.Widget"], "gtk_widget_show": ["Gtk.Widget.show"]},
+        type_structs={"GtkWidgetClass": "Gtk.Widget"},
+        instance_params={"Gtk.Widget.show": "widget"},
+        shadow_map={},
+        override_docs={},
+        doc_references={"gtk-x11": "https://example.com"},
+        docs={"all": {}},
+        private=set(),
+    )
+    return FrozenRepository(LookupIndex([ns]))
+
+
+def test_rest_cache_prefill(monkeypatch):
+    monkeypatch.setattr(repo_module.namespace_, "NAMESPACE_CACHE", None)
+
+    frozen = pickle.loads(pickle.dumps(_get_frozen_repo()))
+    requests = [
+        ("#GtkWidget and @widget", "Gtk.Widget", "Gtk.Widget.show"),
+        ("#GtkWidget, [X11][gtk-x11]", None, None),
+    ]
+    cache = RestCache([])
+    cache.prefill(frozen, requests, 2)
+    assert cache.prefilled == 2
+
+    def docstring_to_rest(*args):
+        raise AssertionError
+
+    monkeypatch.setattr(repo_module, "docstring_to_rest", docstring_to_rest)
+
+    repo = _get_frozen_repo()
+    assert cache.convert(repo, *requests[0]) == ":obj:`Gtk.Widget` and `self`"
+    # the context doesn't matter without parameters or properties
+    assert cache.convert(repo, requests[1][0], "Gtk.Widget") == ":obj:`Gtk.Widget`, `X11 <https://example.com>`__"
+    assert (cache.hits, cache.misses) == (2, 0)
+
+
+def test_docobj_memory():
+    # guards the compact layout, see benchmarks/parse_memory.py
+    assert not hasattr(Function("Foo.Bar", "baz", True, False, False), "__dict__")
+
+    tracemalloc.start()
+    funcs = [Function("Foo.Bar", "method_%d" % (i % 100), True, False, False) for i in range(10000)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert size < len(funcs) * 150
+    assert funcs[0].fullname == "Foo.Bar.method_0"
+    assert funcs[0].name is funcs[100].name
+
+
+def test_doc_info_empty():
+    class Repo(object):
+        lazy_docs = 0
+        lazy_docs_converted = 0
+
+        def lookup_raw_docs(self, type_, fullname):
+            return ("foo" if fullname == "Foo.bar" else "", "")
+
+        def lookup_raw_meta(self, type_, fullname):
+            return ("", "", "")
+
+        def docstring_to_rest(self, docstring, current_type=None, current_func=None):
+            return docstring.upper()
+
+    func = Function("Foo", "baz", False, False, False)
+    assert DocInfo.from_object(Repo(), "all", func) is DocInfo.EMPTY
+
+    func = Function("Foo", "bar", False, False, False)
+    info = DocInfo.from_object(Repo(), "all", func)
+    new = info.replace(deprecated=True)
+    assert new.deprecated and not info.deprecated
+    assert new.desc == "FOO"
+
+
+def test_doc_info_lazy():
+    class Repo(object):
+        lazy_docs = 0
+        lazy_docs_converted = 0
+
+        def lookup_raw_docs(self, type_, fullname):
+            return ("foo", "")
+
+        def lookup_raw_meta(self, type_, fullname):
+            return ("", "", "bar")
+
+        def docstring_to_rest(self, docstring, current_type=None, current_func=None):
+            return "%s %s %s" % (docstring, current_type, current_func)
+
+    repo = Repo()
+    func = Function("Foo", "bar", False, False, False)
+    info = DocInfo.from_object(repo, "all", func, "Foo", "Foo.bar")
+    assert (repo.lazy_docs, repo.lazy_docs_converted) == (2, 0)
+    assert info.desc == "foo Foo Foo.bar"
+    assert info.desc == "foo Foo Foo.bar"
+    assert info.shadowed_desc == ""
+    assert repo.lazy_docs_converted == 1
+    assert info.deprecated
+    assert repo.lazy_docs_converted == 1
+    assert info.deprecation_desc == "bar None None"
+    assert repo.lazy_docs_converted == 2
+
+
+def test_guess_doc_context():
+    assert _guess_doc_context("parameters", "Gtk.Widget.show.widget", "") == ("Gtk.Widget", "Gtk.Widget.show")
+    assert _guess_doc_context("returns", "Gtk.main", "") == (None, "Gtk.main")
+    assert _guess_doc_context("properties", "Gtk.Widget.name", "") == ("Gtk.Widget", None)
+    assert _guess_doc_context("all", "Gtk.Widget.show", "") == ("Gtk.Widget", "Gtk.Widget.show")
+    assert _guess_doc_context("all", "Gtk.Widget", "") == ("Gtk.Widget", None)
+    assert _guess_doc_context("all", "Gtk.main", "@foo") == (None, "Gtk.main")
+    assert _guess_doc_context("all", "Gtk.Align.FILL", "") == (None, None)
@@ -0,0 +1,42 @@
+# Copyright 2026 Christoph Reiter
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+from pgidocgen.gen.data.ext.shared_static import shared_static_pathto
+
+
+class Config(object):
+    pgi_shared_static = True
+
+
+class App(object):
+    config = Config()
+
+
+def pathto(otheruri, resource=False, baseuri=None):
+    return "local:" + otheruri
+
+
+def test_shared_static_pathto():
+    context = {"pathto": pathto}
+    shared_static_pathto(App(), "classes/Object", "page.html", context, None)
+    shared = context["pathto"]
+    assert shared("_static/css/theme.css", 1) == "../../_static/css/theme.css"
+    assert shared("_static/css/theme.css") == "local:_static/css/theme.css"
+    assert shared("index") == "local:index"
+
+    context = {"pathto": pathto}
+    shared_static_pathto(App(), "index", "page.html", context, None)
+    assert context["pathto"]("_static/pygments.css", resource=True) == "../_static/pygments.css"
+
+
+def test_shared_static_disabled():
+    app = App()
+    app.config = Config()
+    app.config.pgi_shared_static = False
+    context = {"pathto": pathto}
+    shared_static_pathto(app, "index", "page.html", context, None)
+    assert context["pathto"] is pathto
@@ -15,8 +15,11 @@ pgi.require_version("Gtk", "3.0")
 
 from pgidocgen.util import (
     fake_bases,
+    fake_mro,
     fake_subclasses,
+    get_attr_snapshot,
     get_child_properties,
+    get_class_graph,
     get_csv_line,
     get_signature_string,
     get_style_properties,
@@ -26,6 +29,7 @@ from pgidocgen.util import (
     is_method_owner,
     is_object,
     is_staticmethod,
+    parse_gir_header,
     sanitize_instance_repr,
     unescape_parameter,
     unindent,
@@ -85,6 +89,24 @@ def test_is_attribute_owner():
     assert not is_attribute_owner(GdkPixbuf.PixbufAnimation, "ref")
 
 
+def test_attr_snapshot():
+    from pgi.repository import GObject, Gtk
+
+    snapshot = get_attr_snapshot(Gtk.Viewport)
+    assert get_attr_snapshot(Gtk.Viewport) is snapshot
+    attr = snapshot.get("get_vadjustment")
+    assert attr.kind == "method"
+    assert attr.is_owner == is_method_owner(Gtk.Viewport, "get_vadjustment")
+    assert not snapshot.get("get_has_tooltip").is_owner
+    assert snapshot.get("_private") is None
+
+    names = [a.name for a in get_attr_snapshot(GObject.Value)]
+    assert names == sorted(names)
+    attr = get_attr_snapshot(GObject.Value).get("g_type")
+    assert attr.kind == "field"
+    assert attr.is_owner
+
+
 def test_class_checks():
     from pgi.repository import GLib, GObject
 
@@ -175,6 +197,18 @@ def test_fake_bases_ignore_redundant():
     assert fake_bases(Gtk.Dialog, ignore_redundant=True) == [Gtk.Window]
 
 
+def test_class_graph():
+    from pgi.repository import GObject
+
+    graph = get_class_graph("GObject")
+    assert get_class_graph("GObject") is graph
+    assert graph.get_mro(GObject.Binding) is graph.get_mro(GObject.Binding)
+    assert fake_mro(GObject.Binding) == graph.get_mro(GObject.Binding)
+    subclasses = graph.get_namespace_subclasses(GObject.Object)
+    assert GObject.Binding in subclasses
+    assert all(c.__module__.endswith("GObject") for c in subclasses)
+
+
 def test_sanitize_instance_repr():
     san = sanitize_instance_repr
     assert san("") == ""
@@ -185,3 +219,32 @@ def test_sanitize_instance_repr():
     )
 
     assert san("<GType EvdConnection (31362256)>") == "<GType EvdConnection>"
+
+
+def test_parse_gir_header(tmp_path):
+    path = tmp_path / "Foo-1.0.gir"
+    path.write_text(
+        """<?xml version="1.0"?>
+<repository version="1.2"
+            xmlns="http://www.gtk.org/introspection/core/1.0"
+            xmlns:c="http://www.gtk.org/introspection/c/1.0"
+            xmlns:glib="http://www.gtk.org/introspection/glib/1.0">
+  <include name="GObject" version="2.0"/>
+  <include name="Gio" version="2.0"/>
+  <c:include name="foo.h"/>
+  <namespace name="Foo"
+             version="1.0"
+             shared-library="libfoo.so.0,libbar.so.1"
+             c:identifier-prefixes="Foo,Bar"
+             c:symbol-prefixes="foo">
+    <include name="Nope" version="1.0"/>
+    <constant name="X" value="&#x1c;" c:type="FOO_X"/>
+  </namespace>
+</repository>
+"""
+    )
+
+    header = parse_gir_header(str(path))
+    assert header.includes == [("GObject", "2.0"), ("Gio", "2.0")]
+    assert header.c_prefixes == ["Foo", "Bar"]
+    assert header.shared_libraries == ["libfoo.so.0", "libbar.so.1"]